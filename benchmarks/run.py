@@ -0,0 +1,396 @@
+"""
+Offline benchmarks of the scrape, parse and analyze pipeline.
+
+Every benchmark runs against the recorded fixtures in tests/fixtures, served by a local stand-in for
+basketball-reference (see benchmarks.server), so results do not depend on the network or the site.
+
+    fetch       pages per second fetched at several concurrency levels, with a fixed latency per request
+    replay      pages per second served from a page archive, as when reprocessing seasons offline
+    parse       milliseconds to parse a box score with each parser backend, and a schedule page
+    entropy     seconds per season for calc_entropy, gain over every stat, and gain_all
+    rebuild     seconds for an end-to-end rebuild of a season (scrape, outcomes, aggregates, tables), cold and warm
+    service     p50 and p99 latency of the query service under many concurrent clients, and its requests per second
+
+Results are saved to benchmarks/results/<commit>.json and compared with the results of the commit benchmarked
+before, so regressions show up between commits:
+
+    python -m benchmarks.run                        # run every benchmark
+    python -m benchmarks.run parse entropy          # run some of them
+    python -m benchmarks.run --compare 48f3efa      # compare with the results of a given commit
+"""
+import argparse
+import glob
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.server import FIXTURES_DIR, FixtureServer
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# results which got worse by more than this fraction are reported as regressions.
+THRESHOLD = 0.1
+
+
+def best_of(func, repeat=5):
+    """
+    Return the fastest of several timed runs of func, in seconds.
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.time()
+        func()
+        timings.append(time.time() - start)
+    return min(timings)
+
+
+def result(value, unit, better='lower'):
+    return {'value': value, 'unit': unit, 'better': better}
+
+
+def bench_fetch(pages=200, workers=(1, 2, 4, 8, 16), latency=0.02):
+    """
+    Fetch box scores from the stand-in server at each concurrency level, without rate limiting or caching.
+    """
+    from scraper.fetch import Fetcher
+    from scraper.transport import HttpTransport
+
+    urls = ['http://www.basketball-reference.com/boxscores/2016{0:06d}GSW.html'.format(i) for i in range(pages)]
+    results = {}
+    with FixtureServer(latency=latency) as server:
+        for count in workers:
+            fetcher = server.install(Fetcher(workers=count, rate=0, retries=0, cache=None,
+                                             transport=HttpTransport(count)))
+            fetcher.get(urls[0])
+
+            start = time.time()
+            sent = server.bytes_sent
+            fetcher.map(fetcher.get, urls)
+            elapsed = time.time() - start
+
+            results['fetch.workers_{0}.pages_per_sec'.format(count)] = result(pages / elapsed, 'pages/s', 'higher')
+            results['fetch.workers_{0}.mb_per_sec'.format(count)] = result(
+                (server.bytes_sent - sent) / elapsed / 2 ** 20, 'MB/s', 'higher')
+    return results
+
+
+def bench_replay(pages=500, workers=8):
+    """
+    Record box scores from the stand-in server into a page archive, then replay them from it.
+    """
+    from scraper.archive import PageArchive
+    from scraper.fetch import Fetcher
+    from scraper.transport import HttpTransport, RecordTransport, ReplayTransport
+
+    urls = ['http://www.basketball-reference.com/boxscores/2016{0:06d}GSW.html'.format(i) for i in range(pages)]
+    directory = tempfile.mkdtemp()
+    try:
+        path = os.path.join(directory, 'pages.archive')
+        with FixtureServer() as server:
+            recorder = Fetcher(workers=workers, rate=0, transport=RecordTransport(PageArchive(path), HttpTransport()))
+            server.install(recorder).map(recorder.get, urls)
+
+        replayer = Fetcher(workers=workers, transport=ReplayTransport(PageArchive(path)))
+        seconds = best_of(lambda: replayer.map(replayer.get, urls), 3)
+    finally:
+        shutil.rmtree(directory)
+
+    return {'replay.pages_per_sec': result(pages / seconds, 'pages/s', 'higher')}
+
+
+def bench_parse(repeat=20):
+    """
+    Parse every recorded box score with every parser backend, and every recorded schedule page.
+    """
+    from scraper.parsers import PARSERS, parse_game_links
+
+    box_scores = _read_pages(os.path.join(FIXTURES_DIR, 'boxscores'))
+    schedules = _read_pages(os.path.join(FIXTURES_DIR, 'schedules'))
+
+    results = {}
+    for backend, parser in sorted(PARSERS.items()):
+        seconds = best_of(lambda: [parser(html) for html in box_scores], repeat)
+        results['parse.box_score.{0}.ms'.format(backend)] = result(1000 * seconds / len(box_scores), 'ms/page')
+
+    seconds = best_of(lambda: [parse_game_links(html) for html in schedules], repeat)
+    results['parse.schedule.ms'] = result(1000 * seconds / len(schedules), 'ms/page')
+    return results
+
+
+def _read_pages(directory):
+    pages = []
+    for path in sorted(glob.glob(os.path.join(directory, '*.html'))):
+        with open(path) as f:
+            pages.append(f.read().decode('utf-8'))
+    return pages
+
+
+def bench_entropy(seasons=(2015, 2016, 2017), repeat=3):
+    """
+    Time entropy and information gain of every stat over whole seasons of the raw game data.
+    """
+    from pandas import read_csv
+
+    from entropy import calc_entropy, gain, gain_all
+    from scraper.config import RAW_GAME_DATA
+
+    totals = {'calc_entropy': 0.0, 'gain': 0.0, 'gain_all': 0.0}
+    for year in seasons:
+        frame = read_csv(RAW_GAME_DATA.format(year), index_col=0)
+        stats = [column for column in frame.columns if column not in ('team', 'win')]
+        data = frame.drop('team', axis=1).to_dict('records')
+        outcomes, target = frame[stats].values, frame['win'].values
+
+        totals['calc_entropy'] += best_of(lambda: calc_entropy(data, 'win'), repeat)
+        totals['gain'] += best_of(lambda: [gain(data, stat, 'win') for stat in stats], 1)
+        totals['gain_all'] += best_of(lambda: gain_all(outcomes, target), repeat)
+
+    return {'entropy.{0}.seconds_per_season'.format(name): result(total / len(seasons), 's/season')
+            for name, total in totals.items()}
+
+
+def bench_rebuild(year=2017, processes=2, latency=0.005):
+    """
+    Rebuild a season end to end from the stand-in server: a cold rebuild, then a warm one with nothing to redo.
+    """
+    from scraper.fetch import Fetcher, get_fetcher, set_fetcher
+    from scraper.rebuild import rebuild
+    from scraper.transport import HttpTransport
+
+    directory = tempfile.mkdtemp()
+    previous = get_fetcher()
+    try:
+        paths = {name: os.path.join(directory, name) for name in ('build', 'tables', 'store', 'margins', 'players')}
+        os.makedirs(paths['tables'])
+        raw_game_data = os.path.join(directory, 'raw_game_data_{0}')
+        # seeds the stat columns of the rebuild's counters.
+        shutil.copy(os.path.join(ROOT_DIR, 'raw_game_data_{0}'.format(year)), raw_game_data.format(year))
+
+        with FixtureServer(latency=latency) as server:
+            # the rebuild's worker processes inherit the fetcher when they are forked.
+            set_fetcher(server.install(Fetcher(rate=0, cache=None, transport=HttpTransport())))
+
+            def _rebuild():
+                return rebuild([year], scrape=True, processes=processes, build_dir=paths['build'],
+                               tables_dir=paths['tables'], store_dir=paths['store'], raw_game_data=raw_game_data,
+                               margin_dir=paths['margins'], player_dir=paths['players'])
+
+            start = time.time()
+            _rebuild()
+            cold = time.time() - start
+            pages = server.requests
+
+            start = time.time()
+            _rebuild()
+            warm = time.time() - start
+    finally:
+        set_fetcher(previous)
+        shutil.rmtree(directory)
+
+    return {
+        'rebuild.cold.seconds': result(cold, 's'),
+        'rebuild.cold.pages': result(pages, 'pages', 'equal'),
+        'rebuild.warm.seconds': result(warm, 's'),
+    }
+
+
+def _load_test(url, paths, clients, requests_per_client):
+    """
+    Send requests from several clients at once, each on its own keep-alive connection.
+
+    :return: The latency of every request in seconds, and the seconds taken by all of them.
+    """
+    import httplib
+    import threading
+    from urlparse import urlparse
+
+    address = urlparse(url).netloc
+    latencies = [[] for _ in range(clients)]
+
+    def _client(index):
+        connection = httplib.HTTPConnection(address)
+        for i in range(requests_per_client):
+            path = paths[(index * requests_per_client + i) % len(paths)]
+            start = time.time()
+            connection.request('GET', path)
+            response = connection.getresponse()
+            response.read()
+            latencies[index].append(time.time() - start)
+            if response.status != 200:
+                raise RuntimeError('{0} answered {1}'.format(path, response.status))
+        connection.close()
+
+    threads = [threading.Thread(target=_client, args=(index,)) for index in range(clients)]
+    start = time.time()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return [latency for client in latencies for latency in client], time.time() - start
+
+
+def bench_service(clients=(1, 16, 64), requests_per_client=100, seasons=(2015, 2016, 2017)):
+    """
+    Load test the query service with clients sending a mix of stats and importance queries of every team and season,
+    once every query is cached, and time a query answered from the counters.
+    """
+    import numpy as np
+
+    from scraper.service import QueryService, ServiceServer
+    from scraper.store import convert_csvs
+
+    directory = tempfile.mkdtemp()
+    try:
+        service = QueryService(convert_csvs(seasons, os.path.join(directory, 'store')))
+        paths = []
+        for team in service.store.teams:
+            for year in seasons:
+                paths.append('/stats?team={0}&seasons={1}'.format(team, year))
+                paths.append('/importance?team={0}&seasons={1}'.format(team, year))
+        paths.append('/stats?seasons={0}-{1}'.format(seasons[0], seasons[-1]))
+
+        uncached = best_of(lambda: [service.cache.clear(), service.query('stats', {'team': service.store.teams[0]})])
+        results = {'service.uncached.ms': result(1000 * uncached, 'ms')}
+        with ServiceServer(service) as server:
+            # the latency of the counters is service.uncached.ms; the load test measures serving itself.
+            _load_test(server.url, paths, 1, len(paths))
+            for count in clients:
+                latencies, seconds = _load_test(server.url, paths, count, requests_per_client)
+                p50, p99 = np.percentile(latencies, [50, 99])
+                results['service.clients_{0}.p50_ms'.format(count)] = result(1000 * p50, 'ms')
+                results['service.clients_{0}.p99_ms'.format(count)] = result(1000 * p99, 'ms')
+                results['service.clients_{0}.requests_per_sec'.format(count)] = result(
+                    len(latencies) / seconds, 'requests/s', 'higher')
+    finally:
+        shutil.rmtree(directory)
+    return results
+
+
+BENCHMARKS = [
+    ('fetch', bench_fetch),
+    ('replay', bench_replay),
+    ('parse', bench_parse),
+    ('entropy', bench_entropy),
+    ('rebuild', bench_rebuild),
+    ('service', bench_service),
+]
+
+
+def _git(*args):
+    return subprocess.check_output(('git',) + args, cwd=ROOT_DIR).strip()
+
+
+def current_commit():
+    """
+    Return the commit being benchmarked, suffixed with '-dirty' if the tree has uncommitted changes to tracked files.
+    """
+    commit = _git('rev-parse', '--short', 'HEAD')
+    if _git('status', '--porcelain', '--untracked-files=no'):
+        commit += '-dirty'
+    return commit
+
+
+def save(results, commit, directory=RESULTS_DIR):
+    """
+    Save results under the given commit, merged into any results already saved for it.
+    """
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+
+    path = os.path.join(directory, '{0}.json'.format(commit))
+    saved = load(path) or {'results': {}}
+    saved['results'].update(results)
+    saved.update({'commit': commit, 'time': time.time(), 'python': platform.python_version(),
+                  'machine': platform.node()})
+
+    with open(path, 'w') as f:
+        json.dump(saved, f, indent=2, sort_keys=True)
+    return path
+
+
+def load(path):
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def previous_results(commit, directory=RESULTS_DIR):
+    """
+    Return the most recently saved results of a commit other than the given one, or None.
+    """
+    paths = [path for path in glob.glob(os.path.join(directory, '*.json'))
+             if os.path.basename(path) != '{0}.json'.format(commit)]
+    if not paths:
+        return None
+    return load(max(paths, key=lambda path: load(path).get('time', 0)))
+
+
+def compare(results, baseline, threshold=THRESHOLD):
+    """
+    Compare results with a baseline.
+
+    :return: A list of (name, baseline value, value, relative change, regressed) tuples, one per result in both.
+    """
+    rows = []
+    for name in sorted(results):
+        if name not in baseline:
+            continue
+        before, after = baseline[name]['value'], results[name]['value']
+        change = (after - before) / float(before) if before else 0.0
+        better = results[name]['better']
+        if better == 'lower':
+            regressed = change > threshold
+        elif better == 'higher':
+            regressed = change < -threshold
+        else:
+            regressed = after != before
+        rows.append((name, before, after, change, regressed))
+    return rows
+
+
+def report(results, baseline=None, out=sys.stdout):
+    rows = {row[0]: row for row in compare(results, baseline['results'])} if baseline else {}
+    if baseline:
+        out.write('compared with {0}\n'.format(baseline['commit']))
+
+    for name in sorted(results):
+        line = '{0:<40} {1:>12.4f} {2}'.format(name, results[name]['value'], results[name]['unit'])
+        if name in rows:
+            _, before, _, change, regressed = rows[name]
+            line += '   was {0:.4f} ({1:+.1%}){2}'.format(before, change, '  REGRESSION' if regressed else '')
+        out.write(line + '\n')
+
+    return [name for name, row in rows.items() if row[4]]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run the offline benchmarks.')
+    parser.add_argument('benchmarks', nargs='*', help='benchmarks to run, defaults to all of them: {0}'.format(
+        ', '.join(name for name, _ in BENCHMARKS)))
+    parser.add_argument('--compare', help='commit to compare with, defaults to the last one benchmarked')
+    parser.add_argument('--no-save', dest='save', action='store_false', help='do not save the results')
+    args = parser.parse_args()
+
+    commit = current_commit()
+    results = {}
+    for name, benchmark in BENCHMARKS:
+        if not args.benchmarks or name in args.benchmarks:
+            print 'running {0}...'.format(name)
+            results.update(benchmark())
+
+    if args.compare:
+        baseline = load(os.path.join(RESULTS_DIR, '{0}.json'.format(args.compare)))
+    else:
+        baseline = previous_results(commit)
+
+    regressions = report(results, baseline)
+    if args.save:
+        print 'saved to {0}'.format(save(results, commit))
+    sys.exit(1 if regressions else 0)
@@ -0,0 +1,153 @@
+"""
+A local stand-in for basketball-reference, serving the recorded fixtures in tests/fixtures.
+
+The server answers both plain requests and proxy requests (with the full url in the request line), so pointing a
+fetcher's session at it as an http proxy runs the scraper unchanged, with every basketball-reference url answered
+locally:
+
+    with FixtureServer(latency=0.02) as server:
+        fetcher = Fetcher(rate=0, cache=None)
+        server.install(fetcher)
+        links = get_season_links(2017, fetcher)
+
+Schedule pages are served from tests/fixtures/schedules, using the recorded season's page for the same month when the
+requested season was not recorded. Box scores are served from tests/fixtures/boxscores, and box scores which were not
+recorded are answered with one of the recorded ones, picked by the box score's id.
+"""
+import BaseHTTPServer
+import os
+import re
+import threading
+import time
+import zlib
+from SocketServer import ThreadingMixIn
+from urlparse import urlparse
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'tests', 'fixtures')
+
+SCHEDULE_RE = re.compile(r'^/leagues/NBA_(\d+)_games-(\w+)\.html$')
+BOX_SCORE_RE = re.compile(r'^/boxscores/(\w+)\.html$')
+
+
+class Fixtures(object):
+    """
+    The recorded pages, read into memory once so serving them costs no disk reads.
+    """
+    def __init__(self, directory=FIXTURES_DIR):
+        self.schedules = self._read(os.path.join(directory, 'schedules'))
+        self.box_scores = self._read(os.path.join(directory, 'boxscores'))
+        self._box_score_names = sorted(self.box_scores)
+
+    @staticmethod
+    def _read(directory):
+        pages = {}
+        for name in os.listdir(directory):
+            with open(os.path.join(directory, name), 'rb') as f:
+                pages[name] = f.read()
+        return pages
+
+    def page(self, path):
+        """
+        Return the recorded page answering the given path, or None.
+        """
+        match = SCHEDULE_RE.match(path)
+        if match:
+            year, month = match.groups()
+            name = 'NBA_{0}_games-{1}.html'.format(year, month)
+            if name not in self.schedules:
+                name = next((other for other in sorted(self.schedules) if other.endswith('-{0}.html'.format(month))), None)
+            return self.schedules.get(name)
+
+        match = BOX_SCORE_RE.match(path)
+        if match:
+            name = match.group(1) + '.html'
+            if name not in self.box_scores:
+                name = self._box_score_names[zlib.crc32(name) % len(self._box_score_names)]
+            return self.box_scores[name]
+
+        return None
+
+
+class FixtureHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    # keep-alive, so fetchers reuse their pooled connections as they do against the real site.
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        server = self.server
+        if server.latency:
+            time.sleep(server.latency)
+
+        page = server.fixtures.page(urlparse(self.path).path)
+        with server.lock:
+            server.requests += 1
+            server.bytes_sent += len(page or '')
+
+        if page is None:
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(page)))
+        self.end_headers()
+        self.wfile.write(page)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _Server(ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+
+
+class FixtureServer(object):
+    """
+    Serve the recorded fixtures on a local port, in a background thread.
+
+    :param float latency: Seconds to wait before answering each request, standing in for the network.
+    """
+    def __init__(self, latency=0.0, port=0, fixtures=None):
+        self.httpd = _Server(('127.0.0.1', port), FixtureHandler)
+        self.httpd.fixtures = fixtures or Fixtures()
+        self.httpd.latency = latency
+        self.httpd.lock = threading.Lock()
+        self.httpd.requests = 0
+        self.httpd.bytes_sent = 0
+        self._thread = None
+
+    @property
+    def url(self):
+        return 'http://{0}:{1}'.format(*self.httpd.server_address)
+
+    @property
+    def requests(self):
+        return self.httpd.requests
+
+    @property
+    def bytes_sent(self):
+        return self.httpd.bytes_sent
+
+    def install(self, fetcher):
+        """
+        Route every http request made by the fetcher through this server.
+        """
+        fetcher.session.proxies = {'http': self.url}
+        return fetcher
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
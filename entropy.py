@@ -1,6 +1,18 @@
 from collections import defaultdict
 import math
 
+import numpy as np
+
+def _column(data, attr):
+    """
+    Return the values of an attribute over the records of data, a list of dictionaries or a table of records with a
+    to_array method (e.g. scraper.records.OutcomeTable).
+    """
+    if hasattr(data, 'to_array'):
+        return data.to_array([attr])[:, 0]
+    return [r[attr] for r in data]
+
+
 def calc_entropy(data, target_attr):
     """
     Calculates the entropy of the given data set for the target attribute.
@@ -9,12 +21,12 @@ def calc_entropy(data, target_attr):
     data_entropy = 0.0
 
     # filter out ties
-    data = [r for r in data if r[target_attr] != 0.5]
-    for record in data:
-        if (val_freq.has_key(record[target_attr])):
-            val_freq[record[target_attr]] += 1.0
+    data = [v for v in _column(data, target_attr) if v != 0.5]
+    for value in data:
+        if (val_freq.has_key(value)):
+            val_freq[value] += 1.0
         else:
-            val_freq[record[target_attr]]  = 1.0
+            val_freq[value]  = 1.0
 
     print_freq = {}
     for val in val_freq:
@@ -52,10 +64,15 @@ def gain(data, segment_attr, target_attr):
     Calculates the information gain (reduction in entropy) that would
     result by splitting the data on the chosen attribute (attr).
 
-    :param list data: A list of dictionaries mapping attributes to values.
+    :param list data: A list of dictionaries mapping attributes to values, or a table of records with a to_array
+        method (e.g. scraper.records.OutcomeTable), whose gain is calculated in one vectorized pass.
     :param str attr: The attribute to segment by.
     :param str target_attr: The attribute to predict.
     """
+    if hasattr(data, 'to_array'):
+        _, gains = gain_all(data.to_array([segment_attr]), data.to_array([target_attr])[:, 0])
+        return gains[0]
+
     outcome_frequency = defaultdict(int)
     # filter out ties
     data = [r for r in data if r[segment_attr] != 0.5]
@@ -79,3 +96,148 @@ def gain(data, segment_attr, target_attr):
     gain = round(parent_entropy - entropy_of_segments, 4)
     # print 'parent entropy: {0}, total segment entry: {1}, gain: {2}'.format(parent_entropy, entropy_of_segments, gain)
     return gain
+
+
+def _round(values, digits=4):
+    """
+    Round half away from zero, as the built-in round does, so vectorized results match gain.
+    """
+    values = np.asarray(values, dtype=float)
+    scale = 10.0 ** digits
+    scaled = values * scale
+    rounded = np.where(scaled < 0, np.ceil(scaled - 0.5), np.floor(scaled + 0.5)) / scale
+
+    # scaling can carry a value across a rounding midpoint, so values close to one are
+    # rounded with the built-in round, which rounds the exact value.
+    near_midpoint = np.abs(np.abs(scaled) % 1 - 0.5) < 1e-6
+    if near_midpoint.any():
+        rounded[near_midpoint] = [round(value, digits) for value in values[near_midpoint]]
+    return rounded
+
+
+def _entropy(positive, negative):
+    """
+    Calculates the entropy of a two-valued attribute from arrays counting each value.
+    """
+    total = positive + negative
+    entropy = np.zeros(total.shape)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # summed in the same order as calc_entropy, negatives (0) then positives (1).
+        for count in (negative, positive):
+            proportion = count / total
+            entropy += np.where(count > 0, -proportion * np.log(proportion) / math.log(2), 0.0)
+    return entropy
+
+
+def outcome_matrix(data, attrs):
+    """
+    Convert a list of dictionaries, or a table of records with a to_array method, into a records x attrs array of
+    their values.
+    """
+    if hasattr(data, 'to_array'):
+        return data.to_array(attrs)
+    return np.array([[record[attr] for attr in attrs] for record in data], dtype=float)
+
+
+def count_outcomes(outcomes, target, groups=None, n_groups=None):
+    """
+    Counts the target outcomes when each segment attribute was won and lost, for every attribute at once.
+
+    :param numpy.ndarray outcomes: A records x attrs array of outcomes, 1 for won and 0 for lost. Any other value
+        (0.5 in the raw game data) is a tie.
+    :param numpy.ndarray target: The outcome of the attribute to predict for each record, e.g. the 'win' column.
+    :param numpy.ndarray groups: Optionally, an integer group (e.g. team or season code) for each record.
+        Counts are then made separately for each group.
+    :return: A dictionary of groups x attrs arrays:
+        won/lost: records where the attribute was won/lost.
+        won_wins/won_losses: records where the attribute was won and the target was won/lost.
+        lost_wins/lost_losses: records where the attribute was lost and the target was won/lost.
+    """
+    outcomes = np.asarray(outcomes)
+    target = np.asarray(target)
+    n_records, n_attrs = outcomes.shape
+
+    if groups is None:
+        groups = np.zeros(n_records, dtype=np.intp)
+        n_groups = 1
+    elif n_groups is None:
+        n_groups = int(groups.max()) + 1 if len(groups) else 0
+
+    # flat (group, attr) cell of every outcome, so that one bincount per count covers every group and attr.
+    cells = (np.asarray(groups, dtype=np.intp)[:, None] * n_attrs + np.arange(n_attrs)).ravel()
+    size = n_groups * n_attrs
+
+    won = (outcomes == 1).ravel()
+    lost = (outcomes == 0).ravel()
+    target_won = np.repeat(target == 1, n_attrs)
+    target_lost = np.repeat(target == 0, n_attrs)
+
+    def _count(mask):
+        return np.bincount(cells[mask], minlength=size).reshape(n_groups, n_attrs).astype(float)
+
+    return {
+        'won': _count(won),
+        'lost': _count(lost),
+        'won_wins': _count(won & target_won),
+        'won_losses': _count(won & target_lost),
+        'lost_wins': _count(lost & target_won),
+        'lost_losses': _count(lost & target_lost),
+    }
+
+
+def gain_from_counts(counts):
+    """
+    Calculates the entropy of the target and the information gain of every attribute from count_outcomes' counts.
+
+    Matches calc_entropy and gain: records where the segment attribute was tied are left out, and proportions and
+    entropies are rounded to 4 places at the same steps.
+
+    :return: A tuple of (parent entropy, gain) arrays, the same shape as the counts.
+    """
+    total = counts['won'] + counts['lost']
+
+    entropy_of_segments = np.zeros(total.shape)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for segment, wins, losses in (('lost', 'lost_wins', 'lost_losses'), ('won', 'won_wins', 'won_losses')):
+            proportion = _round(np.where(total > 0, counts[segment] / total, 0.0))
+            entropy = _round(_entropy(counts[wins], counts[losses]))
+            entropy_of_segments += proportion * entropy
+
+    parent_entropy = _round(_entropy(counts['won_wins'] + counts['lost_wins'],
+                                     counts['won_losses'] + counts['lost_losses']))
+    return parent_entropy, _round(parent_entropy - entropy_of_segments)
+
+
+def gain_all(outcomes, target):
+    """
+    Calculates the information gain of every attribute in one vectorized pass.
+
+    :param numpy.ndarray outcomes: A records x attrs array of outcomes, 1 for won, 0 for lost and 0.5 for tied.
+    :param numpy.ndarray target: The outcome of the attribute to predict for each record.
+    :return: A tuple of (parent entropy, gain) arrays with one value per attribute.
+    """
+    parent_entropy, gains = gain_from_counts(count_outcomes(outcomes, target))
+    return parent_entropy[0], gains[0]
+
+
+def gain_table(frame, attrs, target_attr='win', by=None):
+    """
+    Build a table of the information gain of each attribute, optionally separately for each value of a column.
+
+    :param pandas.DataFrame frame: Game data, one row per team per game, e.g. a raw_game_data_YYYY file.
+    :param list attrs: The attributes to segment by.
+    :param str target_attr: The attribute to predict.
+    :param str by: A column to group rows by, e.g. 'team' or 'season'.
+    :return: A DataFrame of gains with a column per attribute, and a row per group.
+    """
+    from pandas import DataFrame, factorize
+
+    outcomes = frame[list(attrs)].values
+    target = frame[target_attr].values
+    if by is None:
+        codes, labels = None, ['all']
+    else:
+        codes, labels = factorize(frame[by], sort=True)
+
+    _, gains = gain_from_counts(count_outcomes(outcomes, target, codes, len(labels)))
+    return DataFrame(gains, index=labels, columns=list(attrs))
@@ -0,0 +1,477 @@
+"""
+Per-season stat counters, and the season tables derived from them.
+
+Every season table (stat_breakdown_YYYY.csv, totals.csv, wins_when_stat_is_won.csv,
+total_stat_wins_for_winning_teams.csv, zscores.csv, statslope/all_year_data.csv and the trend page's
+statslope/data.json) is a function of a handful of counts per stat and season. The counts are kept alongside each
+season in the store and updated from the rows added since they were last made, so refreshing a season never rescans
+the games already counted.
+"""
+import os
+
+import numpy as np
+
+from config import BREAKDOWN_STATS, ROOT_DIR, STATS
+from entropy import _round, count_outcomes, gain_from_counts
+from metrics import get_metrics
+from statslope import write_bundle
+from store import save_array
+
+# rows: games counted, won/lost: games where the stat was won/lost (the rest are ties),
+# won_wins etc.: games where the stat was won/lost and the game was won/lost.
+COUNTS = ('rows', 'won', 'lost', 'won_wins', 'won_losses', 'lost_wins', 'lost_losses')
+
+
+def season_counts(outcomes, win_index):
+    """
+    Count the outcomes of a season.
+
+    :param numpy.ndarray outcomes: A games x stats array of outcomes.
+    :param int win_index: The column of outcomes holding the game result.
+    :return: A COUNTS x stats array of counts.
+    """
+    with get_metrics().timer('counts.seconds'):
+        counts = count_outcomes(outcomes, np.asarray(outcomes)[:, win_index])
+    rows = np.full(outcomes.shape[1], len(outcomes), dtype=float)
+    return np.vstack([rows] + [counts[name][0] for name in COUNTS[1:]]).astype(np.int64)
+
+
+def counts_by_stat(counts, stats):
+    """
+    Convert a COUNTS x stats array of counts into {stat: {count: value}}.
+    """
+    return {stat: dict(zip(COUNTS, (int(value) for value in counts[:, i]))) for i, stat in enumerate(stats)}
+
+
+class SeasonCounts(object):
+    """
+    The counters of every season in a store, kept in each season's directory as counts.npy.
+    """
+    def __init__(self, store):
+        self.store = store
+        self.win_index = store.stat_index('win')
+
+    def _path(self, year):
+        return os.path.join(self.store.season(year).directory, 'counts.npy')
+
+    def get(self, year):
+        """
+        Return the up to date COUNTS x stats array of counts for a season.
+
+        Counts are made once, and afterwards only rows appended to the season since they were last saved are added.
+        """
+        season = self.store.season(year)
+        path = self._path(year)
+        if os.path.exists(path):
+            counts = np.load(path)
+        else:
+            counts = np.zeros((len(COUNTS), len(self.store.stats)), dtype=np.int64)
+
+        counted = int(counts[0, 0])
+        if counted < len(season):
+            new_rows = np.asarray(season.row) >= counted
+            counts = counts + season_counts(season.outcomes[new_rows], self.win_index)
+            save_array(path, counts)
+
+        return counts
+
+    def by_stat(self, years=None):
+        """
+        Return the counts of the given seasons (defaulting to all of them) as {year: {stat: {count: value}}}.
+        """
+        return {year: counts_by_stat(self.get(year), self.store.stats) for year in years or self.store.seasons}
+
+    def tables(self, years=None):
+        """
+        Return the SeasonTables of the given seasons (defaulting to all of them), from their up to date counters.
+        """
+        years = years or self.store.seasons
+        return SeasonTables(years, self.store.stats, [self.get(year) for year in years])
+
+
+class TeamCounts(object):
+    """
+    An index of the counters of every team in every season of a store, kept in each season's directory as
+    team_counts.npy, a teams x COUNTS x stats array.
+
+    Counters are summed rather than rescanned, so win %, tie rates and gain of any team, range of seasons or the
+    whole league are answered without reading a game. Like SeasonCounts, a season's counters are made once, and
+    afterwards only updated from the rows appended to it.
+
+    Use it as:
+
+        index = TeamCounts(store)
+        index.summary('fg', team='gsw', years=range(2015, 2018))
+        index.table()                         # every stat, league-wide over every season
+    """
+    def __init__(self, store):
+        self.store = store
+        self.win_index = store.stat_index('win')
+        self._counts = {}
+
+    def _path(self, year):
+        return os.path.join(self.store.season(year).directory, 'team_counts.npy')
+
+    def get(self, year):
+        """
+        Return the up to date teams x COUNTS x stats array of counts for a season.
+        """
+        if year in self._counts:
+            return self._counts[year]
+
+        season = self.store.season(year)
+        path = self._path(year)
+        n_teams, n_stats = len(self.store.teams), len(self.store.stats)
+        if os.path.exists(path):
+            counts = np.load(path)
+        else:
+            counts = np.zeros((n_teams, len(COUNTS), n_stats), dtype=np.int64)
+        if len(counts) < n_teams:
+            # teams added to the store since the counters were saved.
+            counts = np.concatenate([counts, np.zeros((n_teams - len(counts),) + counts.shape[1:], dtype=np.int64)])
+
+        counted = int(counts[:, 0, 0].sum())
+        if counted < len(season):
+            new_rows = np.asarray(season.row) >= counted
+            counts = counts + team_counts(season.outcomes[new_rows], self.win_index, season.team[new_rows], n_teams)
+            save_array(path, counts)
+
+        self._counts[year] = counts
+        return counts
+
+    def counts(self, team=None, years=None):
+        """
+        Return the COUNTS x stats array of counts of a team, or of every team, summed over the given seasons
+        (defaulting to all of them).
+        """
+        years = self.store.seasons if years is None else years
+        if team is None:
+            return sum(self.get(year).sum(axis=0) for year in years)
+        code = self.store.team_code(team)
+        return sum(self.get(year)[code] for year in years)
+
+    def summary(self, stat, team=None, years=None):
+        """
+        Return the record of a team (or the league) when it won, lost and tied a stat over the given seasons.
+
+        :return: A dictionary of counts, and of win_pct (the win % when the stat was won), base_pct (the win % over
+            every game), adj_pct (win_pct less base_pct), tie_rate and gain.
+        """
+        return {name: column[0].item() for name, column in self.columns(team, years, [stat]).items()}
+
+    def columns(self, team=None, years=None, stats=None):
+        """
+        Return the summary of every stat (or the given ones) of a team or the league, as a dictionary of arrays with
+        a value per stat: the COUNTS, ties, win_pct, base_pct, adj_pct, tie_rate and gain.
+        """
+        stats = self.store.stats if stats is None else stats
+        return summarize(self.counts(team, years), [self.store.stat_index(stat) for stat in stats], self.win_index)
+
+    def table(self, team=None, years=None, stats=None):
+        """
+        Return a DataFrame of the summary of every stat (or the given ones) of a team or the league, one row per stat.
+        """
+        from pandas import DataFrame
+
+        stats = list(self.store.stats if stats is None else stats)
+        # built in one go: adding columns one by one costs more than the counting.
+        frame = DataFrame(self.columns(team, years, stats), index=stats,
+                          columns=list(COUNTS) + ['ties', 'win_pct', 'base_pct', 'adj_pct', 'tie_rate', 'gain'])
+        frame.index.name = 'stat'
+        return frame
+
+    def importance(self, team, years=None):
+        """
+        Return the importance of each stat to a team over the given seasons, in the format of
+        TeamScraper.stat_importance.
+        """
+        return importance(team, self.store.stats, self.columns(team, years))
+
+
+def summarize(counts, columns, win_index):
+    """
+    Summarize a COUNTS x stats array of counts.
+
+    :param list columns: The columns of the stats to summarize.
+    :param int win_index: The column of the game result.
+    :return: A dictionary of arrays with a value per stat: the COUNTS, ties, win_pct, base_pct, adj_pct, tie_rate
+        and gain.
+    """
+    counts = np.asarray(counts, dtype=float)
+    values = dict(zip(COUNTS, counts[:, columns]))
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        base_pct = counts[COUNTS.index('won'), win_index] / counts[0, 0]
+        win_pct = values['won_wins'] / values['won']
+    _, gains = gain_from_counts(values)
+
+    summary = {name: values[name].astype(np.int64) for name in COUNTS}
+    summary['ties'] = summary['rows'] - summary['won'] - summary['lost']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        tie_rate = summary['ties'] / values['rows']
+    summary.update({'win_pct': win_pct, 'base_pct': np.full(len(columns), base_pct), 'adj_pct': win_pct - base_pct,
+                    'tie_rate': tie_rate, 'gain': gains})
+    return summary
+
+
+def importance(team, stats, columns):
+    """
+    Put the summary of every stat of a team (see summarize) in the format of TeamScraper.stat_importance.
+    """
+    diffs = {'base_win_pct': round(columns['base_pct'][0], 3)}
+    for stat, win_pct, won in zip(stats, columns['win_pct'], columns['won']):
+        diffs[stat.replace('_pct', '%')] = {'pct_diff': round(win_pct, 3) if won else None, 'total': int(won)}
+    return {'team_name': team, 'diffs': diffs}
+
+
+def team_counts(outcomes, win_index, teams, n_teams):
+    """
+    Count the outcomes of a season separately for each team.
+
+    :param numpy.ndarray outcomes: A games x stats array of outcomes.
+    :param int win_index: The column of outcomes holding the game result.
+    :param numpy.ndarray teams: The team code of each game.
+    :param int n_teams: The number of team codes.
+    :return: A teams x COUNTS x stats array of counts.
+    """
+    teams = np.asarray(teams, dtype=np.intp)
+    with get_metrics().timer('counts.seconds'):
+        counts = count_outcomes(outcomes, np.asarray(outcomes)[:, win_index], teams, n_teams)
+    rows = np.repeat(np.bincount(teams, minlength=n_teams)[:, None], outcomes.shape[1], axis=1)
+    return np.stack([rows] + [counts[name] for name in COUNTS[1:]], axis=1).astype(np.int64)
+
+
+class SeasonTables(object):
+    """
+    Every season table, computed together from the counters of every season: a seasons x COUNTS x stats array.
+
+    Each table is a few array operations over every season and stat at once, so regenerating all of them takes
+    milliseconds. The counters themselves are either the saved counters of each season, or made from the outcome
+    matrices of every season in a single bincount by season (from_store).
+
+    Use it as:
+
+        tables = SeasonTables.from_store(store)
+        tables.zscores()
+        tables.write(ROOT_DIR, breakdown_years=[2017])
+
+    :param list years: The seasons, in the order of the first axis of counts.
+    :param list stats: The stats, in the order of the last axis of counts.
+    :param numpy.ndarray counts: A seasons x COUNTS x stats array of counts.
+    """
+    def __init__(self, years, stats, counts):
+        order = np.argsort(years, kind='mergesort')
+        self.years = [int(years[i]) for i in order]
+        self.stats = list(stats)
+        self.counts = np.asarray(counts, dtype=np.int64)[order]
+        self._stat_index = {stat: i for i, stat in enumerate(self.stats)}
+
+    @classmethod
+    def from_store(cls, store, years=None):
+        """
+        Count the given seasons of a store (defaulting to all of them) in a single pass over their outcomes.
+        """
+        seasons = [store.season(year) for year in (store.seasons if years is None else years)]
+        outcomes = np.concatenate([np.asarray(season.outcomes) for season in seasons])
+        codes = np.repeat(np.arange(len(seasons)), [len(season) for season in seasons])
+        return cls([season.year for season in seasons], store.stats,
+                   team_counts(outcomes, store.stat_index('win'), codes, len(seasons)))
+
+    @classmethod
+    def from_seasons(cls, seasons):
+        """
+        Make the tables of counts given as {year: {stat: {count: value}}}.
+        """
+        years = sorted(seasons)
+        stats = sorted(seasons[years[0]]) if years else []
+        counts = np.array([[[seasons[year][stat][name] for stat in stats] for name in COUNTS] for year in years],
+                          dtype=np.int64).reshape(len(years), len(COUNTS), len(stats))
+        return cls(years, stats, counts)
+
+    def count(self, name, stats):
+        """
+        Return a seasons x stats array of one of the COUNTS.
+        """
+        return self.counts[:, COUNTS.index(name), [self._stat_index[stat] for stat in stats]]
+
+    def _frame(self, values, columns):
+        from pandas import DataFrame
+
+        return DataFrame(values, index=self.years, columns=columns)
+
+    def _win_pct(self, stats):
+        return _round(self.count('won_wins', stats) / self.count('won', stats).astype(float))
+
+    def stat_breakdown(self, year, stats=BREAKDOWN_STATS):
+        """
+        How often each stat was won and tied in a season, and the win % of the teams which won it.
+        """
+        from pandas import DataFrame
+
+        season = self.years.index(year)
+        rows = self.count('rows', stats)[season].astype(float)
+        won = self.count('won', stats)[season]
+        ties = rows - won - self.count('lost', stats)[season]
+        return DataFrame({
+            'stat': stats,
+            'games': won,
+            'pct_of_games': _round(100 * _round(won / rows), 2),
+            'pct_of_ties': _round(ties / rows),
+            'win_pct': self._win_pct(stats)[season],
+        }, columns=['games', 'pct_of_games', 'pct_of_ties', 'stat', 'win_pct'])
+
+    def wins_when_stat_is_won(self, stats=STATS):
+        """
+        The number of games won by teams which won each stat, per season.
+        """
+        return self._frame(self.count('won_wins', stats), stats)
+
+    def totals(self, stats=BREAKDOWN_STATS):
+        """
+        The number of games won by teams which won each stat, per season, over the breakdown stats.
+        """
+        return self.wins_when_stat_is_won(stats)
+
+    def total_stat_wins(self, stats=BREAKDOWN_STATS):
+        """
+        The number of stats won by winning teams per season, in total and as a % of the stats available to win.
+        """
+        from pandas import DataFrame
+
+        total_win = self.count('won_wins', stats).sum(axis=1)
+        rows = self.count('rows', stats[:1])[:, 0]
+        return DataFrame({'total_win_pct': total_win.astype(float) / rows * len(stats), 'total_win': total_win},
+                         index=self.years, columns=['total_win_pct', 'total_win'])
+
+    def win_pcts(self, stats=STATS):
+        """
+        The win % of teams which won each stat, per season.
+        """
+        return self._frame(self._win_pct(stats), stats)
+
+    def all_year_data(self, stats=STATS):
+        """
+        The win % of teams which won each stat per season, with the season's total stat wins.
+        """
+        return self.win_pcts(stats).join(self.total_stat_wins(stats))
+
+    def zscores(self, stats=BREAKDOWN_STATS):
+        """
+        How far each season's win % for each stat is from that stat's mean over all seasons, in standard deviations.
+
+        The mean and variance are computed on every call, in one pass over the seasons (Welford's method). A stat
+        whose win % is the same in every season, as with a single season, has no spread, and its z-scores are NaN.
+        """
+        values = self._win_pct(stats)
+        mean = np.zeros(len(stats))
+        squares = np.zeros(len(stats))
+        for n, season in enumerate(values, 1):
+            delta = season - mean
+            mean += delta / n
+            squares += delta * (season - mean)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return self._frame((values - mean) / np.sqrt(squares / len(values)), stats)
+
+    def write(self, directory=ROOT_DIR, breakdown_years=()):
+        """
+        Write every season table.
+
+        :param str directory: The directory to write the tables to.
+        :param list breakdown_years: The seasons to write stat_breakdown_YYYY.csv for. The last of them is also
+            written to stat_breakdown.csv.
+        """
+        for year in breakdown_years:
+            breakdown = self.stat_breakdown(year)
+            breakdown.to_csv(os.path.join(directory, 'stat_breakdown_{0}.csv'.format(year)))
+        if breakdown_years:
+            breakdown.to_csv(os.path.join(directory, 'stat_breakdown.csv'))
+
+        self.totals().to_csv(os.path.join(directory, 'totals.csv'))
+        self.wins_when_stat_is_won().to_csv(os.path.join(directory, 'wins_when_stat_is_won.csv'))
+        self.total_stat_wins().to_csv(os.path.join(directory, 'total_stat_wins_for_winning_teams.csv'))
+        self.zscores().to_csv(os.path.join(directory, 'zscores.csv'))
+
+        statslope = os.path.join(directory, 'statslope')
+        if not os.path.isdir(statslope):
+            os.makedirs(statslope)
+        self.all_year_data().to_csv(os.path.join(statslope, 'all_year_data.csv'))
+        write_bundle(self, statslope)
+
+
+def _tables(seasons):
+    return seasons if isinstance(seasons, SeasonTables) else SeasonTables.from_seasons(seasons)
+
+
+def stat_breakdown(season, stats=BREAKDOWN_STATS):
+    """
+    How often each stat was won and tied in a season, and the win % of the teams which won it.
+
+    :param dict season: Counts of a single season, as {stat: {count: value}}.
+    """
+    return SeasonTables.from_seasons({0: season}).stat_breakdown(0, stats)
+
+
+def wins_when_stat_is_won(seasons, stats=STATS):
+    """
+    The number of games won by teams which won each stat, per season.
+
+    :param seasons: Counts of each season, as {year: {stat: {count: value}}}, or SeasonTables.
+    """
+    return _tables(seasons).wins_when_stat_is_won(stats)
+
+
+def totals(seasons, stats=BREAKDOWN_STATS):
+    """
+    The number of games won by teams which won each stat, per season, over the breakdown stats.
+
+    :param seasons: Counts of each season, as {year: {stat: {count: value}}}, or SeasonTables.
+    """
+    return _tables(seasons).totals(stats)
+
+
+def total_stat_wins(seasons, stats=BREAKDOWN_STATS):
+    """
+    The number of stats won by winning teams per season, in total and as a % of the stats available to win.
+
+    :param seasons: Counts of each season, as {year: {stat: {count: value}}}, or SeasonTables.
+    """
+    return _tables(seasons).total_stat_wins(stats)
+
+
+def win_pcts(seasons, stats=STATS):
+    """
+    The win % of teams which won each stat, per season.
+
+    :param seasons: Counts of each season, as {year: {stat: {count: value}}}, or SeasonTables.
+    """
+    return _tables(seasons).win_pcts(stats)
+
+
+def all_year_data(seasons, stats=STATS):
+    """
+    The win % of teams which won each stat per season, with the season's total stat wins.
+
+    :param seasons: Counts of each season, as {year: {stat: {count: value}}}, or SeasonTables.
+    """
+    return _tables(seasons).all_year_data(stats)
+
+
+def zscores(seasons, stats=BREAKDOWN_STATS):
+    """
+    How far each season's win % for each stat is from that stat's mean over all seasons, in standard deviations.
+
+    :param seasons: Counts of each season, as {year: {stat: {count: value}}}, or SeasonTables.
+    """
+    return _tables(seasons).zscores(stats)
+
+
+def write_tables(seasons, directory=ROOT_DIR, breakdown_years=()):
+    """
+    Write the season tables derived from the given counts.
+
+    :param seasons: Counts of each season, as {year: {stat: {count: value}}}, or SeasonTables.
+    :param str directory: The directory to write the tables to.
+    :param list breakdown_years: The seasons to write stat_breakdown_YYYY.csv for. The last of them is also written
+        to stat_breakdown.csv.
+    """
+    _tables(seasons).write(directory, breakdown_years)
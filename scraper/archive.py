@@ -0,0 +1,233 @@
+"""
+An append-only archive of fetched pages, indexed by url.
+
+The archive is a single file of records, each holding a url, the time it was fetched and the zlib-compressed page:
+
+    header      '>4sHId': magic 'PAGE', url length, compressed page length, fetch time
+    url         utf-8
+    page        zlib-compressed utf-8
+
+Records are only ever appended. A page fetched again is appended again, and the newest record of a url wins. The
+index lives alongside the archive in <archive>.idx, one 'offset url' line per record, and is rebuilt from the
+archive's records if it is missing or behind (e.g. after a crash between writing a record and its index line). A
+record cut short by a crash is truncated away when the archive is next opened for writing.
+
+Reads go through a memory map of the archive, so replaying pages runs at disk speed.
+
+Use it as:
+
+    archive = PageArchive('pages.archive')
+    archive.put(url, html)
+    html = archive.get(url)
+
+or, to list an archive:
+
+    python -m scraper.archive pages.archive
+"""
+import fcntl
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+import zlib
+
+MAGIC = b'PAGE'
+HEADER = struct.Struct('>4sHId')
+
+
+class ArchiveError(Exception):
+    pass
+
+
+class PageArchive(object):
+    """
+    An append-only, indexed archive of pages, safe to write from several threads and processes.
+
+    :param str path: The archive file, created if it does not exist.
+    :param int level: zlib compression level of archived pages.
+    """
+    def __init__(self, path, level=6):
+        self.path = path
+        self.index_path = path + '.idx'
+        self.level = level
+
+        self._index = {}
+        self._index_read = 0   # bytes of the index file read so far
+        self._end = 0          # end of the last indexed record
+        self._unindexed = []   # records found in the archive but missing from the index file
+        self._map = None
+        self._map_size = 0
+        self._lock = threading.Lock()
+
+        if not os.path.exists(path):
+            open(path, 'ab').close()
+        with self._lock:
+            self._refresh()
+
+    def __len__(self):
+        return len(self._index)
+
+    def __contains__(self, url):
+        with self._lock:
+            if url not in self._index:
+                self._refresh()
+            return url in self._index
+
+    def urls(self):
+        with self._lock:
+            self._refresh()
+            return list(self._index)
+
+    def _records(self, f, offset):
+        """
+        Yield (offset, url, end) of every complete record of the archive from the given offset.
+        """
+        size = os.fstat(f.fileno()).st_size
+        while offset + HEADER.size <= size:
+            f.seek(offset)
+            magic, url_length, page_length, _ = HEADER.unpack(f.read(HEADER.size))
+            if magic != MAGIC:
+                raise ArchiveError('corrupt record at offset {0} of {1}'.format(offset, self.path))
+            end = offset + HEADER.size + url_length + page_length
+            if end > size:
+                return
+            yield offset, f.read(url_length).decode('utf-8'), end
+            offset = end
+
+    def _add(self, url, offset):
+        # records are only appended, so the newest record of a url is the one furthest into the archive.
+        self._index[url] = max(offset, self._index.get(url, -1))
+
+    def _read_index(self, f):
+        """
+        Read index lines written since the index was last read, by this or another process.
+        """
+        if not os.path.exists(self.index_path):
+            return
+        with open(self.index_path, 'rb') as index:
+            index.seek(self._index_read)
+            for line in index:
+                if not line.endswith(b'\n'):
+                    # a line being written, or cut short by a crash. Its record is found by scanning the archive.
+                    break
+                self._index_read += len(line)
+                offset, url = line.rstrip(b'\n').split(b' ', 1)
+                self._add(url.decode('utf-8'), int(offset))
+                if int(offset) >= self._end:
+                    f.seek(int(offset))
+                    _, url_length, page_length, _ = HEADER.unpack(f.read(HEADER.size))
+                    self._end = int(offset) + HEADER.size + url_length + page_length
+
+    def _refresh(self):
+        """
+        Index records appended since the index was last read.
+        """
+        with open(self.path, 'rb') as f:
+            self._read_index(f)
+            for offset, url, end in self._records(f, self._end):
+                self._add(url, offset)
+                self._unindexed.append((offset, url))
+                self._end = end
+
+    def put(self, url, page, fetched=None):
+        """
+        Append a page to the archive.
+
+        :param str url: The url the page was fetched from.
+        :param unicode page: The text of the page.
+        :param float fetched: When the page was fetched, defaults to now.
+        """
+        url_bytes = url.encode('utf-8')
+        data = zlib.compress(page.encode('utf-8'), self.level)
+        record = HEADER.pack(MAGIC, len(url_bytes), len(data), fetched or time.time()) + url_bytes + data
+
+        with self._lock:
+            with open(self.path, 'r+b') as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    # catch up with other writers, index records a crash left out of the index file, and drop a
+                    # record cut short by a crash.
+                    self._refresh()
+                    f.truncate(self._end)
+                    lines, self._unindexed = self._unindexed, []
+
+                    f.seek(self._end)
+                    f.write(record)
+                    f.flush()
+                    lines.append((self._end, url))
+
+                    with open(self.index_path, 'ab') as index:
+                        # drop an index line cut short by a crash.
+                        index.truncate(self._index_read)
+                        index.write(b''.join(str(offset).encode('ascii') + b' ' + line_url.encode('utf-8') + b'\n'
+                                             for offset, line_url in lines))
+                        self._index_read = index.tell()
+                    self._index[url] = self._end
+                    self._end += len(record)
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _mapped(self, end):
+        # remap when records past the end of the current map are read.
+        if self._map is None or end > self._map_size:
+            if self._map is not None:
+                self._map.close()
+            with open(self.path, 'rb') as f:
+                self._map_size = os.fstat(f.fileno()).st_size
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._map
+
+    def get_entry(self, url):
+        """
+        Return a tuple of (page, fetch time) for the newest record of a url, or None if it is not archived.
+        """
+        with self._lock:
+            if url not in self._index:
+                self._refresh()
+            offset = self._index.get(url)
+            if offset is None:
+                return None
+
+            header_end = offset + HEADER.size
+            _, url_length, page_length, fetched = HEADER.unpack(self._mapped(header_end)[offset:header_end])
+            start = header_end + url_length
+            data = self._mapped(start + page_length)[start:start + page_length]
+
+        return zlib.decompress(data).decode('utf-8'), fetched
+
+    def get(self, url):
+        """
+        Return the newest archived page of a url, or None if it is not archived.
+        """
+        entry = self.get_entry(url)
+        return entry[0] if entry else None
+
+    def close(self):
+        with self._lock:
+            if self._map is not None:
+                self._map.close()
+                self._map = None
+
+
+_archives = {}
+_archives_lock = threading.Lock()
+
+
+def get_archive(path):
+    """
+    Return the shared archive at the given path, opening it on first use.
+    """
+    with _archives_lock:
+        if path not in _archives:
+            _archives[path] = PageArchive(path)
+        return _archives[path]
+
+
+if __name__ == '__main__':
+    archive = PageArchive(sys.argv[1])
+    urls = archive.urls()
+    print '{0} pages, {1} bytes'.format(len(urls), os.path.getsize(archive.path))
+    for url in sorted(urls):
+        print url
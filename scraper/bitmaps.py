@@ -0,0 +1,227 @@
+"""
+Bitmap index of the stat outcomes of every game in a season store, for queries conditioned on several stats at once.
+
+The index holds a bitmap per (stat, outcome) with a bit per row of every season, packed eight rows to a byte, and a
+bitmap per season and per team. Conditions on several stats are bitwise operations on the packed arrays, and counts
+are population counts, so a query never touches the games themselves:
+
+    index = BitmapIndex.from_store(SeasonStore())
+    index.query(won=['efg_pct', 'orb'], lost=['tov'])                   # win % when all three hold
+    index.query(won=['efg_pct'], seasons=range(2010, 2018), team='gsw')
+    games = index.won('efg_pct') & (index.won('orb') | ~index.lost('tov'))
+    index.win_pct(games)
+    index.rank(3, min_games=500)                                        # every triple of stats, by win %
+
+or, to rank combinations of stats from the command line:
+
+    python -m scraper.bitmaps 2 --min-games 500
+"""
+import argparse
+import itertools
+
+import numpy as np
+
+from store import LOST, TIED, WON
+
+# number of set bits of every byte value.
+POPCOUNT = np.array([bin(value).count('1') for value in range(256)], dtype=np.uint8)
+
+OUTCOMES = {'won': WON, 'lost': LOST, 'tied': TIED}
+
+
+def popcount(bits, axis=None):
+    """
+    Return the number of set bits of a packed array, in total or along an axis.
+    """
+    return POPCOUNT[bits].sum(axis=axis, dtype=np.int64)
+
+
+class Bitmap(object):
+    """
+    A set of rows of the index, as a packed array of bits.
+    """
+    __slots__ = ('bits', 'size')
+
+    def __init__(self, bits, size):
+        self.bits = bits
+        self.size = size
+
+    @classmethod
+    def from_mask(cls, mask):
+        mask = np.asarray(mask, dtype=bool)
+        return cls(np.packbits(mask), len(mask))
+
+    def __and__(self, other):
+        return Bitmap(self.bits & other.bits, self.size)
+
+    def __or__(self, other):
+        return Bitmap(self.bits | other.bits, self.size)
+
+    def __xor__(self, other):
+        return Bitmap(self.bits ^ other.bits, self.size)
+
+    def __invert__(self):
+        bits = ~self.bits
+        # clear the padding bits past the last row, so they are never counted.
+        if self.size % 8:
+            bits[-1] &= 0xff << (8 - self.size % 8) & 0xff
+        return Bitmap(bits, self.size)
+
+    def __len__(self):
+        return self.size
+
+    def count(self):
+        """
+        Return the number of rows in the set.
+        """
+        return int(popcount(self.bits))
+
+    def to_mask(self):
+        return np.unpackbits(self.bits)[:self.size].astype(bool)
+
+
+class BitmapIndex(object):
+    """
+    Bitmaps of every (stat, outcome), season and team over the rows of a season store.
+
+    :param list stats: The stat of each column of outcomes.
+    :param numpy.ndarray outcomes: A rows x stats array of outcome codes: LOST, WON or TIED.
+    :param numpy.ndarray seasons: The season of each row.
+    :param list teams: The team of each row.
+    """
+    def __init__(self, stats, outcomes, seasons, teams):
+        self.stats = list(stats)
+        self.size = len(outcomes)
+        self._stat_index = {stat: i for i, stat in enumerate(self.stats)}
+
+        outcomes = np.asarray(outcomes)
+        # stats x packed rows, one array per outcome, so combinations of stats are rows of a single array.
+        self._bits = {outcome: np.packbits(outcomes.T == outcome, axis=1) for outcome in (WON, LOST, TIED)}
+
+        seasons = np.asarray(seasons)
+        self.seasons = sorted(set(seasons.tolist()))
+        self._seasons = {year: Bitmap.from_mask(seasons == year) for year in self.seasons}
+
+        teams = np.asarray(teams)
+        self.teams = sorted(set(teams.tolist()))
+        self._teams = {team: Bitmap.from_mask(teams == team) for team in self.teams}
+
+        self.all = ~Bitmap(np.zeros_like(self._bits[WON][0]), self.size)
+        self.wins = self.won('win')
+
+    @classmethod
+    def from_store(cls, store, years=None):
+        """
+        Index the given seasons of a store, defaulting to all of them.
+        """
+        seasons = [store.season(year) for year in (store.seasons if years is None else years)]
+        outcomes = np.concatenate([np.asarray(season.outcomes) for season in seasons])
+        years = np.concatenate([np.full(len(season), season.year, dtype=np.int32) for season in seasons])
+        teams = np.asarray(store.teams)[np.concatenate([np.asarray(season.team) for season in seasons])]
+        return cls(store.stats, outcomes, years, teams)
+
+    def bitmap(self, stat, outcome):
+        """
+        Return the rows where a stat had the given outcome: WON, LOST or TIED.
+        """
+        return Bitmap(self._bits[outcome][self._stat_index[stat]], self.size)
+
+    def won(self, stat):
+        return self.bitmap(stat, WON)
+
+    def lost(self, stat):
+        return self.bitmap(stat, LOST)
+
+    def tied(self, stat):
+        return self.bitmap(stat, TIED)
+
+    def season(self, year):
+        return self._seasons[year]
+
+    def team(self, team):
+        return self._teams[team]
+
+    def where(self, won=(), lost=(), tied=(), seasons=None, team=None):
+        """
+        Return the rows where every stat of won was won, every stat of lost was lost and every stat of tied was tied,
+        optionally only those of the given seasons and team.
+        """
+        rows = self.all
+        for outcome, stats in ((WON, won), (LOST, lost), (TIED, tied)):
+            for stat in stats:
+                rows = rows & self.bitmap(stat, outcome)
+        if seasons is not None:
+            # no seasons match no rows.
+            rows = rows & reduce(lambda a, b: a | b, (self._seasons[year] for year in seasons), ~self.all)
+        if team is not None:
+            rows = rows & self._teams[team]
+        return rows
+
+    def win_pct(self, rows):
+        """
+        Return the win % of the given rows, or None if there are none.
+        """
+        games = rows.count()
+        if not games:
+            return None
+        return (rows & self.wins).count() / float(games)
+
+    def query(self, won=(), lost=(), tied=(), seasons=None, team=None):
+        """
+        Return the games, wins and win % of the rows matching the conditions, as described in where.
+        """
+        rows = self.where(won, lost, tied, seasons, team)
+        games = rows.count()
+        wins = (rows & self.wins).count()
+        return {'games': games, 'wins': wins, 'win_pct': wins / float(games) if games else None}
+
+    def rank(self, size=2, outcome=WON, stats=None, min_games=1, rows=None):
+        """
+        Rank every combination of stats by the win % of the games where all of them had the given outcome.
+
+        :param int size: The number of stats in each combination, e.g. 2 for pairs and 3 for triples.
+        :param int outcome: The outcome every stat of a combination had: WON, LOST or TIED.
+        :param list stats: The stats to combine, defaulting to every stat but the game result.
+        :param int min_games: Leave out combinations which held in fewer games.
+        :param Bitmap rows: Only count these rows, e.g. a season or a team.
+        :return: A DataFrame of stats, games, wins and win_pct, one row per combination, best first.
+        """
+        from pandas import DataFrame
+
+        stats = [stat for stat in self.stats if stat != 'win'] if stats is None else list(stats)
+        bits = self._bits[outcome][[self._stat_index[stat] for stat in stats]]
+        if rows is not None:
+            bits = bits & rows.bits
+        wins = self.wins.bits
+
+        results = []
+        # every combination is extended by all the later stats at once: one AND and population count per prefix.
+        for prefix in itertools.combinations(range(len(stats)), size - 1):
+            prefix_bits = np.bitwise_and.reduce(bits[list(prefix)], axis=0) if prefix else self.all.bits
+            rest = range(prefix[-1] + 1 if prefix else 0, len(stats))
+            if not rest:
+                continue
+            combined = bits[rest] & prefix_bits
+            games = popcount(combined, axis=1)
+            won_games = popcount(combined & wins, axis=1)
+            for stat, count, won_count in zip(rest, games, won_games):
+                if count >= min_games:
+                    results.append({'stats': tuple(stats[i] for i in prefix + (stat,)), 'games': int(count),
+                                    'wins': int(won_count), 'win_pct': won_count / float(count)})
+
+        frame = DataFrame(results, columns=['stats', 'games', 'wins', 'win_pct'])
+        return frame.sort_values(['win_pct', 'games'], ascending=False).reset_index(drop=True)
+
+
+if __name__ == '__main__':
+    from store import SeasonStore
+
+    parser = argparse.ArgumentParser(description='Rank combinations of stats by the win % when all are won.')
+    parser.add_argument('size', type=int, help='number of stats in each combination')
+    parser.add_argument('--outcome', choices=sorted(OUTCOMES), default='won', help='outcome of every stat')
+    parser.add_argument('--min-games', type=int, default=100, help='leave out combinations seen in fewer games')
+    parser.add_argument('--top', type=int, default=20, help='number of combinations to show')
+    args = parser.parse_args()
+
+    index = BitmapIndex.from_store(SeasonStore())
+    print index.rank(args.size, OUTCOMES[args.outcome], min_games=args.min_games).head(args.top).to_string()
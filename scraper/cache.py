@@ -0,0 +1,276 @@
+"""
+Two-tier local cache: an in-process LRU, bounded by size, in front of a compressed, content-addressed store on disk.
+
+Pages are stored as raw html bytes rather than parse trees, so entries stay small and parsing code can change
+without invalidating the cache. No external daemon is needed.
+"""
+import errno
+import hashlib
+import os
+import tempfile
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+from config import CACHE_DIR, CACHE_DISK_BYTES, CACHE_MEMORY_BYTES
+from metrics import get_metrics
+
+
+def _digest(data):
+    return hashlib.sha1(data).hexdigest()
+
+
+def _remove(path):
+    """
+    Remove a file, which another process may have removed already.
+
+    :return: Whether this call removed it.
+    """
+    try:
+        os.remove(path)
+        return True
+    except OSError as e:
+        if e.errno != errno.ENOENT:
+            raise
+        return False
+
+
+class LRUCache(object):
+    """
+    In-process cache mapping keys to byte strings, evicting the least recently used entries
+    once the total size of the stored values exceeds max_bytes.
+    """
+    def __init__(self, max_bytes=CACHE_MEMORY_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Return the value stored for key, or None if it is missing or expired.
+        """
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                return None
+
+            data, expires = entry
+            if expires < time.time():
+                self.size -= len(data)
+                return None
+
+            # re-insert to mark as most recently used.
+            self._entries[key] = entry
+            return data
+
+    def set(self, key, data, expires):
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= len(old[0])
+
+            if len(data) > self.max_bytes:
+                return
+
+            self._entries[key] = (data, expires)
+            self.size += len(data)
+            while self.size > self.max_bytes:
+                _, (evicted, _) = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+                self.evictions += 1
+                get_metrics().increment('cache.evictions', tier='memory')
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+
+class DiskStore(object):
+    """
+    On-disk cache of byte strings.
+
+    Values are zlib-compressed and stored once under the sha1 of their content in `objects/`,
+    so identical pages cached under different keys share a single file. Each key has a small
+    entry in `keys/` naming the content it maps to and when it expires.
+
+    Once the stored content grows past max_bytes, expired keys and the content only they referenced are pruned.
+    """
+    def __init__(self, directory=CACHE_DIR, level=6, max_bytes=CACHE_DISK_BYTES):
+        self.directory = directory
+        self.level = level
+        self.max_bytes = max_bytes
+        self._size = None
+        self._limit = max_bytes
+        self._lock = threading.Lock()
+
+    def _path(self, kind, digest):
+        return os.path.join(self.directory, kind, digest[:2], digest[2:])
+
+    def _write(self, path, data):
+        """
+        Atomically write data to path, so concurrent readers never see a partial file.
+        """
+        parent = os.path.dirname(path)
+        if not os.path.isdir(parent):
+            try:
+                os.makedirs(parent)
+            except OSError:
+                if not os.path.isdir(parent):
+                    raise
+
+        fd, tmp_path = tempfile.mkstemp(dir=parent)
+        with os.fdopen(fd, 'wb') as tmp:
+            tmp.write(data)
+        os.rename(tmp_path, path)
+
+    def get(self, key):
+        """
+        Return the value stored for key, or None if it is missing or expired.
+        """
+        entry = self.get_entry(key)
+        return entry[0] if entry is not None else None
+
+    def get_entry(self, key):
+        """
+        Return a (value, expiry time) tuple for key, or None if it is missing or expired.
+        """
+        key_path = self._path('keys', _digest(key))
+        try:
+            with open(key_path, 'rb') as f:
+                content, expires = f.read().split()
+            expires = float(expires)
+            if expires < time.time():
+                return None
+            with open(self._path('objects', content), 'rb') as f:
+                return zlib.decompress(f.read()), expires
+        except (IOError, OSError, ValueError, zlib.error):
+            return None
+
+    def set(self, key, data, expires):
+        content = _digest(data)
+        object_path = self._path('objects', content)
+        # prune removes content no key refers to, so the check and the key are written under the lock.
+        with self._lock:
+            if not os.path.exists(object_path):
+                compressed = zlib.compress(data, self.level)
+                self._write(object_path, compressed)
+                if self._size is not None:
+                    self._size += len(compressed)
+            self._write(self._path('keys', _digest(key)), '{0} {1!r}'.format(content, float(expires)))
+
+            if self.max_bytes is not None:
+                if self._size is None:
+                    self._size = self._usage()
+                if self._size > self._limit:
+                    self._prune()
+                    self._size = self._usage()
+                    # when live pages alone are over budget, wait for another tenth of it before pruning again.
+                    self._limit = max(self.max_bytes, self._size + self.max_bytes // 10)
+
+    def _usage(self):
+        """
+        Return the total size of the stored content, in bytes.
+        """
+        size = 0
+        for root, _, files in os.walk(os.path.join(self.directory, 'objects')):
+            for name in files:
+                try:
+                    size += os.path.getsize(os.path.join(root, name))
+                except OSError:
+                    continue
+        return size
+
+    def prune(self):
+        """
+        Remove expired keys, and any stored content no longer referenced by a key.
+
+        Files removed by another process while pruning are skipped.
+
+        :return: The number of content files removed.
+        """
+        with self._lock:
+            removed = self._prune()
+            if self._size is not None:
+                self._size = self._usage()
+            return removed
+
+    def _prune(self):
+        live = set()
+        now = time.time()
+        for root, _, files in os.walk(os.path.join(self.directory, 'keys')):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    with open(path, 'rb') as f:
+                        content, expires = f.read().split()
+                    expires = float(expires)
+                except (IOError, OSError, ValueError):
+                    continue
+                if expires < now:
+                    _remove(path)
+                else:
+                    live.add(content)
+
+        removed = 0
+        for root, _, files in os.walk(os.path.join(self.directory, 'objects')):
+            for name in files:
+                if os.path.basename(root) + name not in live:
+                    removed += _remove(os.path.join(root, name))
+        return removed
+
+
+class TieredCache(object):
+    """
+    An LRUCache in front of a DiskStore. Values found on disk are promoted into memory.
+    """
+    def __init__(self, memory=None, disk=None):
+        self.memory = memory if memory is not None else LRUCache()
+        self.disk = disk if disk is not None else DiskStore()
+
+    def get(self, key):
+        metrics = get_metrics()
+        data = self.memory.get(key)
+        if data is not None:
+            metrics.increment('cache.hits', tier='memory')
+            return data
+
+        entry = self.disk.get_entry(key)
+        if entry is None:
+            metrics.increment('cache.misses')
+            return None
+
+        metrics.increment('cache.hits', tier='disk')
+        data, expires = entry
+        self.memory.set(key, data, expires)
+        return data
+
+    def set(self, key, data, ttl):
+        expires = time.time() + ttl
+        self.memory.set(key, data, expires)
+        self.disk.set(key, data, expires)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """
+    Return the shared cache, creating it with the configured defaults on first use.
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = TieredCache()
+        return _cache
+
+
+def set_cache(cache):
+    global _cache
+    with _cache_lock:
+        _cache = cache
+
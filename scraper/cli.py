@@ -0,0 +1,353 @@
+"""
+Command line entry point of the scraper, the rebuild and the analyses of the season store.
+
+Each subcommand imports what it needs when it runs, so that queries of the data already in the store need neither
+pandas nor the scraping libraries, and start in a fraction of the time:
+
+    python -m scraper.cli scrape 2017                     stream a season into raw_game_data_2017 (scraper.stream)
+    python -m scraper.cli rebuild 2000 2017 --no-scrape   rebuild seasons, redoing only what changed (scraper.rebuild)
+    python -m scraper.cli gain --team gsw                 information gain of every stat, from the store's counters
+    python -m scraper.cli importance --seasons 2015-2017  win % when each stat was won, from the store's counters
+    python -m scraper.cli matchup gsw cle                 every stat's record of a team against an opponent, and
+                                                          against opponents by win %, from the store's counters
+    python -m scraper.cli leads jamesle01 ast             team win % when a player led the team in a stat, from the
+                                                          player store
+    python -m scraper.cli export tables                   write the season tables, the statslope bundle or a rolling
+                                                          series
+
+The output of gain and importance is cached in the queries directory of CACHE_DIR until the store changes, so a
+repeated query does not even import numpy. The first query of a store, or of a store which has changed, does:
+importing numpy alone takes 80-170 ms, and reading the counters of every season a few dozen more, so it takes
+150-200 ms (300 ms or more with a cold disk cache) however few seasons or stats are asked for.
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import sys
+
+
+def _years(value):
+    """
+    Parse seasons given as a season, a range first-last or a comma separated list.
+    """
+    try:
+        if '-' in value:
+            first, last = value.split('-')
+            years = range(int(first), int(last) + 1)
+        else:
+            years = [int(year) for year in value.split(',')]
+    except ValueError:
+        raise argparse.ArgumentTypeError('seasons must be a season, a range first-last or a list: {0}'.format(value))
+    if not years:
+        raise argparse.ArgumentTypeError('seasons must not be empty or a reversed range: {0}'.format(value))
+    return years
+
+
+def _bins(value):
+    """
+    Parse the increasing edges of bins, given as a comma separated list.
+    """
+    try:
+        edges = [float(edge) for edge in value.split(',')]
+    except ValueError:
+        raise argparse.ArgumentTypeError('bins must be numbers: {0}'.format(value))
+    if len(edges) < 2 or any(high <= low for low, high in zip(edges, edges[1:])):
+        raise argparse.ArgumentTypeError('bins must be at least two increasing edges: {0}'.format(value))
+    return edges
+
+
+def _store_dir(args):
+    from config import STORE_DIR
+
+    return args.store or STORE_DIR
+
+
+def _check_store(args):
+    """
+    Return what is wrong with the team, opponent and seasons asked of the season store, or None. Only the store's
+    meta.json is read, so checking needs no numpy.
+    """
+    directory = _store_dir(args)
+    try:
+        with open(os.path.join(directory, 'meta.json')) as f:
+            meta = json.load(f)
+    except (IOError, ValueError):
+        return 'no season store in {0}'.format(directory)
+
+    for team in (getattr(args, 'team', None), getattr(args, 'opponent', None)):
+        if team is not None and team not in meta['teams']:
+            return 'unknown team: {0}'.format(team)
+    if getattr(args, 'opponent', None) is not None and args.opponent == args.team:
+        return 'a team does not play itself: {0}'.format(args.team)
+    missing = [year for year in args.seasons or () if year not in meta['seasons']]
+    if missing:
+        return 'seasons not in the store: {0}'.format(missing)
+    return None
+
+
+def _check_players(args):
+    """
+    Return what is wrong with the stat and seasons asked of the player store, or None.
+    """
+    from config import PLAYER_DIR
+    from players import PlayerStore
+
+    try:
+        store = PlayerStore(args.store or PLAYER_DIR)
+    except OSError:
+        return 'no player store in {0}'.format(args.store or PLAYER_DIR)
+    missing = [year for year in args.seasons or () if year not in store.seasons]
+    if missing:
+        return 'seasons not in the player store: {0}'.format(missing)
+    for year in args.seasons or store.seasons:
+        if args.stat not in store.season(year).stats:
+            return 'unknown stat: {0}'.format(args.stat)
+    return None
+
+
+def _fingerprint(directory):
+    """
+    Return what changes whenever the counters of a store do: the size and modification time of its meta.json and of
+    every season's outcomes and counters.
+    """
+    paths = [os.path.join(directory, 'meta.json')]
+    with open(paths[0]) as f:
+        for year in json.load(f)['seasons']:
+            paths.extend(os.path.join(directory, str(year), name) for name in ('outcomes.npy', 'team_counts.npy'))
+    fingerprint = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            fingerprint.append([path, stat.st_size, stat.st_mtime])
+        except OSError:
+            fingerprint.append([path, None, None])
+    return fingerprint
+
+
+def _cached(args, query):
+    """
+    Print the output of a query of the store, from the query cache if the store has not changed since it was last
+    made. Answering from the cache needs no numpy, and makes a repeated query start and finish in a few dozen ms.
+
+    The query cache is kept in CACHE_DIR rather than in the store, so stores the user cannot write to are queried
+    all the same; if the cache cannot be written either, the output is printed uncached.
+
+    :param function query: Makes the output from the parsed arguments.
+    """
+    from config import CACHE_DIR
+
+    directory = _store_dir(args)
+    key = [os.path.abspath(directory), args.command, args.team, args.seasons, args.json]
+    path = os.path.join(CACHE_DIR, 'queries', hashlib.sha1(json.dumps(key)).hexdigest() + '.json')
+    fingerprint = _fingerprint(directory)
+
+    try:
+        with open(path) as f:
+            entry = json.load(f)
+        if entry['fingerprint'] == fingerprint:
+            print entry['output']
+            return
+    except (IOError, ValueError, KeyError):
+        pass
+
+    output = query(args)
+    try:
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        from store import write_json
+        # the counters are brought up to date by the query, so the store is fingerprinted again.
+        write_json(path, {'fingerprint': _fingerprint(directory), 'output': output})
+    except (IOError, OSError):
+        logging.warning('could not cache the query in %s', path)
+    print output
+
+
+def _summary(args):
+    from aggregates import TeamCounts
+    from store import SeasonStore
+
+    store = SeasonStore(_store_dir(args))
+    stats = [stat for stat in store.stats if stat != 'win']
+    return stats, TeamCounts(store).columns(args.team, args.seasons, stats)
+
+
+def _format(rows, columns, formats, as_json):
+    if as_json:
+        return json.dumps([dict(zip(columns, row)) for row in rows], indent=2)
+    lines = [' '.join('{0:>10}'.format(column) for column in columns)]
+    for row in rows:
+        lines.append(' '.join(('{0:' + fmt + '}').format(value) for value, fmt in zip(row, formats)))
+    return '\n'.join(lines)
+
+
+def _gain(args):
+    stats, columns = _summary(args)
+    rows = sorted(zip(stats, columns['gain'].tolist(), columns['won'].tolist()), key=lambda row: -row[1])
+    return _format(rows, ['stat', 'gain', 'won'], ['>10', '>10.4f', '>10d'], args.json)
+
+
+def _importance(args):
+    stats, columns = _summary(args)
+    rows = zip(stats, columns['win_pct'].tolist(), columns['adj_pct'].tolist(), columns['won'].tolist(),
+               columns['tie_rate'].tolist())
+    # best first, stats never won last.
+    rows = sorted(rows, key=lambda row: -row[1] if row[1] == row[1] else 0)
+    return _format(rows, ['stat', 'win_pct', 'adj_pct', 'won', 'tie_rate'],
+                   ['>10', '>10.3f', '>+10.3f', '>10d', '>10.3f'], args.json)
+
+
+def gain(args):
+    _cached(args, _gain)
+
+
+def importance(args):
+    _cached(args, _importance)
+
+
+def matchup(args):
+    from matchups import MatchupCounts
+    from store import SeasonStore
+
+    index = MatchupCounts(SeasonStore(_store_dir(args)))
+    stats = [stat for stat in index.store.stats if stat != 'win']
+    if args.opponent:
+        frame = index.head_to_head(args.team, args.opponent, args.seasons, stats)
+        rows = zip(stats, *[frame[column].tolist() for column in ('rows', 'won', 'win_pct', 'adj_pct')])
+        print _format(rows, ['stat', 'games', 'won', 'win_pct', 'adj_pct'], ['>10', '>10d', '>10d', '>10.3f', '>+10.3f'],
+                      args.json)
+    else:
+        frame = index.by_strength(args.team, args.bins, args.seasons, stats)
+        if args.json:
+            print frame.to_json(orient='records')
+        else:
+            print frame.to_string(index=False, float_format=lambda value: '{0:.3f}'.format(value))
+
+
+def leads(args):
+    from players import PlayerStore
+
+    store = PlayerStore(args.store) if args.store else PlayerStore()
+    frame = store.win_pct_when_leading(args.player, args.stat, args.seasons, shared=not args.alone)
+    columns = ['season', 'games', 'win_pct', 'led', 'led_win_pct']
+    rows = zip(frame.index.tolist(), *[frame[column].tolist() for column in columns[1:]])
+    print _format(rows, columns, ['>10d', '>10d', '>10.3f', '>10d', '>10.3f'], args.json)
+
+
+def scrape(args):
+    from stream import stream_seasons
+
+    logging.basicConfig(level=logging.INFO)
+    fetched = stream_seasons(range(args.first, (args.last or args.first) + 1), args.batch_size)
+    for year, games in sorted(fetched.items()):
+        print '{0}: fetched {1} games'.format(year, games)
+
+
+def rebuild(args):
+    from metrics import get_metrics
+    from rebuild import rebuild as run_rebuild
+
+    logging.basicConfig(level=logging.INFO)
+    kwargs = {name + '_dir': getattr(args, name) for name in ('store', 'tables', 'build') if getattr(args, name)}
+    runner = run_rebuild(range(args.first, args.last + 1), args.scrape, args.processes, **kwargs)
+    print 'ran {0} stages, skipped {1}'.format(len(runner.ran), len(runner.skipped))
+    if args.metrics:
+        get_metrics().write(args.metrics)
+
+
+def export(args):
+    from aggregates import SeasonCounts, write_tables
+    from config import ROOT_DIR
+    from store import SeasonStore
+
+    store = SeasonStore(_store_dir(args))
+    if args.what == 'tables':
+        write_tables(SeasonCounts(store).tables(args.seasons), args.out or ROOT_DIR)
+        print 'wrote the season tables to {0}'.format(args.out or ROOT_DIR)
+    elif args.what == 'statslope':
+        from statslope import write_bundle
+
+        kwargs = {'directory': args.out} if args.out else {}
+        print 'wrote {0}'.format(write_bundle(SeasonCounts(store).tables(args.seasons), **kwargs))
+    else:
+        from rolling import backfill
+
+        out = args.out or 'rolling_{0}.csv'.format(args.window)
+        series = backfill(store, args.window, args.seasons)
+        series.to_csv(out, index=False)
+        print 'wrote {0} rows to {1}'.format(len(series), out)
+
+
+def make_parser():
+    parser = argparse.ArgumentParser(prog='python -m scraper.cli', description=__doc__.strip().split('\n')[0])
+    commands = parser.add_subparsers(title='commands')
+
+    command = commands.add_parser('scrape', help='scrape seasons into raw_game_data_YYYY files')
+    command.add_argument('first', type=int, help='first season to scrape')
+    command.add_argument('last', type=int, nargs='?', help='last season to scrape')
+    command.add_argument('--batch-size', type=int, default=100, help='games written at a time')
+    command.set_defaults(func=scrape)
+
+    command = commands.add_parser('rebuild', help='rebuild seasons, redoing only what changed')
+    command.add_argument('first', type=int, help='first season to rebuild')
+    command.add_argument('last', type=int, help='last season to rebuild')
+    command.add_argument('--no-scrape', dest='scrape', action='store_false',
+                         help='start from the existing raw_game_data_YYYY files instead of scraping')
+    command.add_argument('--processes', type=int, default=None, help='size of the process pool')
+    command.add_argument('--metrics', help='write the metrics of the rebuild to this file, .prom or .json')
+    command.add_argument('--store', help='the season store, defaults to season_store')
+    command.add_argument('--tables', help='where to write the season tables, defaults to the repository root')
+    command.add_argument('--build', help='where to keep the intermediate files of the rebuild, defaults to build')
+    command.set_defaults(func=rebuild)
+
+    for name, func, description in (('gain', gain, 'information gain of every stat about the game result'),
+                                    ('importance', importance, 'win %% when each stat was won')):
+        command = commands.add_parser(name, help=description)
+        command.add_argument('--team', help='a team, defaults to the whole league')
+        command.add_argument('--seasons', type=_years, help='a season, first-last or a list, defaults to all')
+        command.add_argument('--store', help='the season store, defaults to season_store')
+        command.add_argument('--json', action='store_true', help='print JSON rather than a table')
+        command.set_defaults(func=func, command=name, check=_check_store)
+
+    command = commands.add_parser('matchup', help='stat importance against an opponent, or by opponent win %%')
+    command.add_argument('team', nargs='?', help='a team, defaults to the whole league')
+    command.add_argument('opponent', nargs='?', help='an opponent, defaults to every opponent by bin of win %%')
+    command.add_argument('--bins', type=_bins, default=[0, .4, .5, .6, 1],
+                         help='increasing edges of the bins of opponent win %%')
+    command.add_argument('--seasons', type=_years, help='a season, first-last or a list, defaults to all')
+    command.add_argument('--store', help='the season store, defaults to season_store')
+    command.add_argument('--json', action='store_true', help='print JSON rather than a table')
+    command.set_defaults(func=matchup, check=_check_store)
+
+    command = commands.add_parser('leads', help='team win %% when a player led the team in a stat')
+    command.add_argument('player', help='the player id, e.g. jamesle01')
+    command.add_argument('stat', help='a stat of the player store, e.g. ast')
+    command.add_argument('--seasons', type=_years, help='a season, first-last or a list, defaults to all')
+    command.add_argument('--alone', action='store_true', help='not counting games where the lead was shared')
+    command.add_argument('--store', help='the player store, defaults to player_store')
+    command.add_argument('--json', action='store_true', help='print JSON rather than a table')
+    command.set_defaults(func=leads, check=_check_players)
+
+    command = commands.add_parser('export', help='write tables and series derived from the store')
+    command.add_argument('what', choices=['tables', 'statslope', 'rolling'])
+    command.add_argument('--seasons', type=_years, help='a season, first-last or a list, defaults to all')
+    command.add_argument('--window', type=int, default=10, help='games in each window of a rolling series')
+    command.add_argument('--store', help='the season store, defaults to season_store')
+    command.add_argument('--out', help='where to write to')
+    command.set_defaults(func=export, check=_check_store)
+    return parser
+
+
+def main(argv=None):
+    parser = make_parser()
+    args = parser.parse_args(argv)
+    # bad teams and seasons are usage errors, reported before anything is queried.
+    problem = args.check(args) if getattr(args, 'check', None) else None
+    if problem:
+        parser.error(problem)
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
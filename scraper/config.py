@@ -1,3 +1,7 @@
+import os
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
 USED_STATS = {
     'fg',
     'fga',
@@ -22,3 +26,47 @@ USED_STATS = {
 ALL_TEAMS = ['sac', 'por', 'sas', 'brk', 'ind', 'mil', 'min', 'mia', 'cle', 'cho', 'nyk', 'hou', 'was', 'lal', 'phi', 'pho', 'dal', 'lac', 'orl', 'nop', 'uta', 'gsw', 'atl', 'bos', 'det', 'okc', 'tor', 'den', 'chi', 'mem']
 
 IGNORED_STATS = {'mp', 'plus_minus', 'usg_pct', 'off_rtg', 'def_rtg', 'win'}
+
+# Concurrent fetching of basketball-reference pages.
+FETCH_WORKERS = 8            # size of the worker pool, and of the keep-alive connection pool
+FETCH_RATE_LIMIT = 4.0       # maximum requests started per second, per host
+FETCH_RETRIES = 3            # attempts made after the first failure of a request
+FETCH_BACKOFF = 0.5          # seconds to wait before the first retry, doubled for each further retry
+FETCH_TIMEOUT = 30           # seconds to wait for a response
+
+# How pages are fetched, one of 'http', 'record' (fetch, and append every page to the page archive) or 'replay'
+# (serve pages from the page archive only). See scraper.transport.
+FETCH_TRANSPORT = os.environ.get('DATASCIENCE_TRANSPORT', 'http')
+PAGE_ARCHIVE = os.environ.get('DATASCIENCE_PAGE_ARCHIVE', os.path.join(ROOT_DIR, 'pages.archive'))
+
+# Local page cache.
+CACHE_DIR = os.environ.get('DATASCIENCE_CACHE_DIR', os.path.join(ROOT_DIR, '.cache'))
+CACHE_MEMORY_BYTES = 64 * 1024 * 1024   # size of the in-process tier in front of the on-disk store
+CACHE_DISK_BYTES = 1024 * 1024 * 1024   # size of the on-disk store past which expired pages are pruned
+PAGE_TTL = 3600 * 24 * 7                # seconds a fetched page is served from the cache
+
+# Box score parser, one of scraper.parsers.PARSERS: 'scan' (fast), 'lxml' or 'bs4' (reference).
+PARSER_BACKEND = 'scan'
+
+# Seasons of game data, and where they are kept.
+SEASONS = range(2000, 2018)
+RAW_GAME_DATA = os.path.join(ROOT_DIR, 'raw_game_data_{0}')
+DIFF_DATA = os.path.join(ROOT_DIR, 'all_diff_data.p')
+STORE_DIR = os.environ.get('DATASCIENCE_STORE_DIR', os.path.join(ROOT_DIR, 'season_store'))
+MARGIN_DIR = os.environ.get('DATASCIENCE_MARGIN_DIR', os.path.join(ROOT_DIR, 'margin_store'))
+PLAYER_DIR = os.environ.get('DATASCIENCE_PLAYER_DIR', os.path.join(ROOT_DIR, 'player_store'))
+
+# Columns of the player store (see scraper.players): the counting stats of the basic box score, mp in seconds.
+PLAYER_STATS = ['mp', 'fg', 'fga', 'fg3', 'fg3a', 'ft', 'fta', 'orb', 'drb', 'trb', 'ast', 'stl', 'blk', 'tov', 'pf', 'pts', 'plus_minus']
+
+# Read-only query service over the store (see scraper.service).
+SERVICE_PORT = int(os.environ.get('DATASCIENCE_SERVICE_PORT', 8040))
+SERVICE_CACHE_BYTES = 16 * 1024 * 1024  # size of the cache of encoded responses
+
+# Stats summarised in the season tables. wins_when_stat_is_won.csv and statslope/all_year_data.csv use STATS,
+# stat_breakdown_YYYY.csv, totals.csv, total_stat_wins_for_winning_teams.csv and zscores.csv use BREAKDOWN_STATS.
+STATS = ['fg', 'fga', 'fg_pct', 'fg3', 'fg3_pct', 'orb', 'drb', 'trb', 'ast', 'stl', 'blk', 'tov', 'ts_pct', 'efg_pct', 'fta', 'ft']
+BREAKDOWN_STATS = ['fg', 'fga', 'fg_pct', 'fg3', 'fg3_pct', 'orb', 'drb', 'trb', 'ast', 'stl', 'blk', 'tov', 'ts_pct', 'efg_pct', 'fg3a_per_fga_pct', 'fta_per_fga_pct']
+
+# Intermediate outputs of the season rebuild.
+BUILD_DIR = os.environ.get('DATASCIENCE_BUILD_DIR', os.path.join(ROOT_DIR, 'build'))
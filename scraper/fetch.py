@@ -0,0 +1,203 @@
+import copy
+import threading
+import time
+from collections import deque
+from urlparse import urlparse
+
+from concurrent.futures import ThreadPoolExecutor
+from requests.exceptions import ConnectionError, HTTPError, Timeout
+
+from cache import get_cache
+from metrics import get_metrics
+from config import FETCH_BACKOFF, FETCH_RATE_LIMIT, FETCH_RETRIES, FETCH_TIMEOUT, FETCH_WORKERS, PAGE_TTL
+from transport import make_transport
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class RateLimiter(object):
+    """
+    Spaces out requests so that no more than `rate` requests per second are started against any single host.
+    """
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0.0
+        self._next_slot = {}
+        self._lock = threading.Lock()
+
+    def wait(self, host):
+        """
+        Block until the next request slot for the given host is available.
+        """
+        if not self.interval:
+            return
+
+        with self._lock:
+            now = time.time()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.interval
+
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class Fetcher(object):
+    """
+    Fetches pages over a pool of keep-alive connections, with a bounded number of concurrent workers,
+    per-host rate limiting and retries with exponential backoff. When given a cache, pages are served from it
+    and only fetched over the network on a miss. Pages are fetched with a transport (see scraper.transport),
+    which defaults to the configured one, so fetches can be recorded to a page archive or replayed from one.
+
+    Use it as:
+
+        fetcher = Fetcher(workers=16)
+        html = fetcher.get(url)
+        results = fetcher.map(scrape_game_data, links)
+        for result in fetcher.imap(scrape_game_data, links):   # streamed, in order
+            ...
+    """
+    def __init__(self, workers=FETCH_WORKERS, rate=FETCH_RATE_LIMIT, retries=FETCH_RETRIES,
+                 backoff=FETCH_BACKOFF, timeout=FETCH_TIMEOUT, cache=None, ttl=PAGE_TTL, transport=None):
+        self.workers = workers
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.rate_limiter = RateLimiter(rate)
+        self.cache = cache
+        self.ttl = ttl
+        self.transport = transport or make_transport(pool_size=workers)
+
+    @property
+    def session(self):
+        """
+        The requests session of the transport, or None if it does not fetch over the network.
+        """
+        return getattr(self.transport, 'session', None)
+
+    def get(self, url):
+        """
+        Return the text of the page at the given url, from the cache if possible.
+        """
+        if self.cache is None:
+            return self._request(url)
+
+        key = 'page:' + url
+        data = self.cache.get(key)
+        if data is not None:
+            text = data.decode('utf-8')
+            self.transport.on_cache_hit(url, text)
+            return text
+
+        text = self._request(url)
+        self.cache.set(key, text.encode('utf-8'), self.ttl)
+        return text
+
+    def uncached(self):
+        """
+        Return a fetcher sharing this one's transport, rate limits and pool which never reads or writes the cache.
+        """
+        if self.cache is None:
+            return self
+        fetcher = copy.copy(self)
+        fetcher.cache = None
+        return fetcher
+
+    def _request(self, url):
+        """
+        Fetch the page at the given url, retrying on connection errors and retryable statuses.
+        """
+        host = urlparse(url).netloc
+        metrics = get_metrics()
+        transport = self.transport.name
+        attempt = 0
+        while True:
+            if self.transport.remote:
+                self.rate_limiter.wait(host)
+            try:
+                start = time.time()
+                response = self.transport.get(url, timeout=self.timeout)
+                metrics.observe('fetch.latency_seconds', time.time() - start, transport=transport)
+                metrics.increment('fetch.requests', transport=transport, status=response.status_code)
+                if response.status_code in RETRY_STATUSES:
+                    raise HTTPError('{0} for url: {1}'.format(response.status_code, url), response=response)
+                response.raise_for_status()
+                metrics.increment('fetch.bytes', len(response.content), transport=transport)
+                return response.text
+            except (ConnectionError, Timeout, HTTPError) as e:
+                metrics.increment('fetch.errors', transport=transport, error=type(e).__name__)
+                status = e.response.status_code if e.response is not None else None
+                if attempt >= self.retries or (status is not None and status not in RETRY_STATUSES):
+                    raise
+                metrics.increment('fetch.retries', transport=transport)
+                time.sleep(self.backoff * 2 ** attempt)
+                attempt += 1
+
+    def map(self, func, items):
+        """
+        Apply func to every item on the worker pool.
+
+        :param function func: A function taking one item, typically a url to fetch and parse.
+        :param list items: The items to apply func to.
+        :return: A list of results, in the same order as the input items.
+        """
+        items = list(items)
+        if self.workers <= 1 or len(items) <= 1:
+            return [func(item) for item in items]
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            return list(executor.map(func, items))
+
+    def imap(self, func, items, window=None):
+        """
+        Apply func to every item on the worker pool, yielding results in the order of the items as they are ready.
+
+        At most window items are in flight at once, so neither the items nor the results are all held in memory.
+
+        :param int window: Items submitted ahead of the result being yielded, defaults to twice the workers.
+        """
+        if self.workers <= 1:
+            for item in items:
+                yield func(item)
+            return
+
+        window = window or 2 * self.workers
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            pending = deque()
+            for item in items:
+                pending.append(executor.submit(func, item))
+                if len(pending) >= window:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+
+_fetcher = None
+_fetcher_lock = threading.Lock()
+
+
+def get_fetcher():
+    """
+    Return the shared fetcher, creating it with the configured defaults and transport on first use. Fetchers going
+    over the network use the shared page cache, and fetchers replaying an archive read it directly.
+    """
+    global _fetcher
+    with _fetcher_lock:
+        if _fetcher is None:
+            transport = make_transport()
+            _fetcher = Fetcher(cache=get_cache() if transport.remote else None, transport=transport)
+        return _fetcher
+
+
+def set_fetcher(fetcher):
+    """
+    Replace the shared fetcher, e.g. with one using a different concurrency limit.
+    """
+    global _fetcher
+    with _fetcher_lock:
+        _fetcher = fetcher
+
+
+def get_page(url):
+    """
+    Return the text of the page at the given url using the shared fetcher.
+    """
+    return get_fetcher().get(url)
@@ -0,0 +1,145 @@
+"""
+Incremental ingestion of a season into the season store.
+
+Only box scores which are not in the store yet are fetched. They are appended to the stored season (and their raw
+totals and players' rows to the margin and player stores), the season's counters (league-wide and per team) are
+updated from the new rows alone, and the season tables are rewritten from the counters.
+
+Use it as:
+
+    python -m scraper.ingest 2017
+"""
+import logging
+import os
+import sys
+
+from aggregates import SeasonCounts, TeamCounts, write_tables
+from config import MARGIN_DIR, PLAYER_DIR, ROOT_DIR, STORE_DIR
+from fetch import Fetcher, get_fetcher
+from parsers import parse_game_links
+from records import OutcomeTable
+from store import SeasonStore, StoreWriter
+from margins import write_season as write_margins
+from players import write_season as write_players
+from teamscrape import GAME_SCHEDULE_URL, MONTHS, game_outcomes, get_box_score
+
+
+def get_season_links(year, fetcher=None):
+    """
+    Return the box score links of every game played so far in the given season, in schedule order.
+
+    Schedule pages gain links as games are played, so they are always fetched rather than read from the cache.
+
+    :param Fetcher fetcher: The fetcher whose transport the pages are fetched with, bypassing its cache.
+    """
+    fetcher = fetcher.uncached() if fetcher else Fetcher(cache=None)
+
+    links = []
+    for month in MONTHS:
+        links.extend(parse_game_links(fetcher.get(GAME_SCHEDULE_URL.format(month, year))))
+    return links
+
+
+def ingested_links(store, year):
+    """
+    Return the links of the season which are already in the store.
+
+    :raises ValueError: If the season was converted from a raw_game_data csv, which does not record which games
+        it holds, so there is no telling which links are new.
+    """
+    if store is None or year not in store.seasons:
+        return []
+
+    season = store.season(year)
+    if season.links is None:
+        raise ValueError('season {0} does not record its links, so it cannot be ingested incrementally; '
+                         'rebuild it instead'.format(year))
+    return season.links
+
+
+def check_aligned(year, games, margin_directory=MARGIN_DIR, player_directory=PLAYER_DIR):
+    """
+    Check that the margin and player stores hold the same games of a season as the season store, so the games
+    appended to all three are numbered alike.
+
+    :param int games: The number of games of the season in the season store.
+    :raises ValueError: If either store holds a different number of games of the season.
+    """
+    from margins import MarginSeason
+    from players import PlayerSeason
+
+    for name, directory, count in (('margin', margin_directory, lambda path: len(MarginSeason(path)) / 2),
+                                   ('player', player_directory, lambda path: PlayerSeason(path).games)):
+        if directory is None:
+            continue
+        path = os.path.join(directory, str(year))
+        held = count(path) if os.path.exists(os.path.join(path, 'columns.json')) else 0
+        if held != games:
+            raise ValueError('the {0} store holds {1} games of season {2} and the season store {3}; rebuild the '
+                             'season'.format(name, held, year, games))
+
+
+def ingest_season(year, directory=STORE_DIR, tables_directory=ROOT_DIR, links=None, fetcher=None,
+                  margin_directory=MARGIN_DIR, player_directory=PLAYER_DIR):
+    """
+    Add the games of a season which are not in the store yet, and update the season tables.
+
+    :param int year: The season to refresh.
+    :param str directory: The season store.
+    :param str tables_directory: Where to write the season tables, or None to leave them.
+    :param list links: The season's box score links, defaults to those on the season's schedule pages.
+    :param Fetcher fetcher: The fetcher box scores are fetched on, defaults to the shared fetcher.
+    :param str margin_directory: The margin store the raw totals of the games are added to, or None to leave it.
+    :param str player_directory: The player store the players' rows of the games are added to, or None to leave it.
+    :return: The number of games added.
+    """
+    # a season converted from a csv cannot be ingested, which is known before any schedule page is fetched.
+    store = SeasonStore(directory) if os.path.exists(os.path.join(directory, 'meta.json')) else None
+    done = ingested_links(store, year)
+    if links is None:
+        links = get_season_links(year, fetcher)
+
+    seen = set(done)
+    new_links = [link for link in links if link not in seen]
+    logging.info('%d of %d games of %d are new', len(new_links), len(links), year)
+    if not new_links:
+        return 0
+    if done:
+        check_aligned(year, len(done), margin_directory, player_directory)
+
+    # teams are kept as pairs, in the order get_box_score gives them, as by the rebuild.
+    fetcher = fetcher or get_fetcher()
+    parsed = fetcher.map(lambda link: get_box_score(link, fetcher), new_links)
+    box_scores = [[(team, stats) for team, stats, _ in box_score] for box_score in parsed]
+    games = OutcomeTable.from_games(game_outcomes(dict(box_score)) for box_score in box_scores)
+
+    if store is None:
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        writer = StoreWriter(directory, stats=sorted(games.stats))
+    else:
+        writer = StoreWriter(directory)
+
+    writer.append_season(year, games.to_array(writer.meta['stats']), games.teams)
+    writer.write_links(year, done + new_links)
+    writer.close()
+    if margin_directory is not None:
+        write_margins(year, box_scores, margin_directory, append=bool(done))
+    if player_directory is not None:
+        write_players(year, ([(team, players) for team, _, players in box_score] for box_score in parsed),
+                      player_directory, append=bool(done))
+
+    store = SeasonStore(directory)
+    counts = SeasonCounts(store)
+    counts.get(year)
+    TeamCounts(store).get(year)
+    if tables_directory is not None:
+        write_tables(counts.tables(), tables_directory, breakdown_years=[year])
+
+    return len(new_links)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    for year in sys.argv[1:]:
+        print '{0}: added {1} games'.format(year, ingest_season(int(year)))
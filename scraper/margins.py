@@ -0,0 +1,241 @@
+"""
+Columnar store of the raw team totals of every game, and win probability as a function of stat margins.
+
+The outcome store keeps only whether each stat was won, lost or tied. This store keeps the totals themselves, so
+questions like "what if winning a stat means winning it by 3 or more" are answered without scraping again.
+
+Layout, one directory per season so seasons can be written in parallel:
+
+    margin_store/
+        2017/
+            columns.json    stats (column order of totals and margins), teams (dictionary of team codes)
+            totals.npy      float32, rows x stats: the team's totals
+            margins.npy     float32, rows x stats: the team's totals less its opponent's
+            team.npy        int8 team code of each row
+
+The two sides of a game are rows 2n and 2n + 1, in the order games were scraped.
+
+Use it as:
+
+    store = MarginStore()
+    store.win_probability('ast', thresholds=[0, 3, 5, 10])    # win % when winning assists by at least each margin
+    store.binned('ast', bins=range(-20, 21, 2))               # win % per bin of assist margin
+    store.outcomes(threshold={'ast': 3})                      # outcome codes, a stat won only by 3 or more
+"""
+import json
+import os
+
+import numpy as np
+
+from config import MARGIN_DIR
+from store import LOST, TIED, WON, save_array, write_json
+
+# stats won by the team with the lower total, as in teamscrape.game_outcomes.
+LOWER_IS_BETTER = {'tov', 'tov_pct'}
+
+
+def box_score_rows(box_scores, stats=None):
+    """
+    Convert box scores into rows of totals and margins.
+
+    :param list box_scores: Box scores as lists of two (team, {stat: total}) pairs, as written by the rebuild.
+    :param list stats: The stat columns, defaulting to the sorted stats of the first box score.
+    :return: A tuple of (stats, teams, totals, margins), with a row per team per game.
+    """
+    box_scores = list(box_scores)
+    if stats is None:
+        stats = sorted(box_scores[0][0][1]) if box_scores else []
+
+    teams = []
+    totals = np.empty((2 * len(box_scores), len(stats)), dtype=np.float32)
+    for i, box_score in enumerate(box_scores):
+        for side, (team, values) in enumerate(box_score):
+            teams.append(str(team))
+            totals[2 * i + side] = [values.get(stat, np.nan) for stat in stats]
+
+    margins = np.empty_like(totals)
+    margins[0::2] = totals[0::2] - totals[1::2]
+    margins[1::2] = -margins[0::2]
+    return stats, teams, totals, margins
+
+
+def write_season(year, box_scores, directory=MARGIN_DIR, append=False):
+    """
+    Write (or replace, or append to) a season of the store.
+
+    :param int year: The season.
+    :param list box_scores: Box scores as lists of two (team, {stat: total}) pairs.
+    :param str directory: The store.
+    :param bool append: Whether to add the box scores to the end of the season rather than replace it.
+    :raises ValueError: If appending to a season not in the store, whose games would be numbered from 0.
+    """
+    season_dir = os.path.join(directory, str(year))
+    if append and not os.path.exists(os.path.join(season_dir, 'columns.json')):
+        raise ValueError('season {0} is not in the margin store to append to'.format(year))
+    if not os.path.isdir(season_dir):
+        os.makedirs(season_dir)
+
+    existing = MarginSeason(season_dir) if append else None
+    stats, teams, totals, margins = box_score_rows(box_scores, existing.stats if existing else None)
+    team_names = list(existing.teams) if existing else []
+    index = {team: i for i, team in enumerate(team_names)}
+    for team in teams:
+        if team not in index:
+            index[team] = len(team_names)
+            team_names.append(team)
+    codes = np.array([index[team] for team in teams], dtype=np.int8)
+
+    if existing:
+        totals = np.concatenate([existing.totals, totals])
+        margins = np.concatenate([existing.margins, margins])
+        codes = np.concatenate([existing.team, codes])
+
+    save_array(os.path.join(season_dir, 'totals.npy'), totals)
+    save_array(os.path.join(season_dir, 'margins.npy'), margins)
+    save_array(os.path.join(season_dir, 'team.npy'), codes)
+
+    # the columns are written last: readers see the season once they are.
+    write_json(os.path.join(season_dir, 'columns.json'), {'stats': stats, 'teams': team_names})
+
+
+class MarginSeason(object):
+    """
+    A single season of the store. Columns are memory-mapped on first access.
+    """
+    COLUMNS = ('totals', 'margins', 'team')
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, 'columns.json')) as f:
+            columns = json.load(f)
+        self.stats = columns['stats']
+        self.teams = columns['teams']
+        self._stat_index = {stat: i for i, stat in enumerate(self.stats)}
+
+    def __getattr__(self, name):
+        if name not in self.COLUMNS:
+            raise AttributeError(name)
+        column = np.load(os.path.join(self.directory, name + '.npy'), mmap_mode='r')
+        setattr(self, name, column)
+        return column
+
+    def __len__(self):
+        return len(self.team)
+
+    def rows(self, team=None):
+        """
+        Return a mask of the rows of a team, or None for every row.
+        """
+        if team is None:
+            return None
+        if team not in self.teams:
+            return np.zeros(len(self), dtype=bool)
+        return np.asarray(self.team) == self.teams.index(team)
+
+    def column(self, name, stat, team=None):
+        values = np.asarray(getattr(self, name)[:, self._stat_index[stat]], dtype=float)
+        rows = self.rows(team)
+        return values if rows is None else values[rows]
+
+
+class MarginStore(object):
+    """
+    Read access to the raw totals and margins of every season in a store directory.
+    """
+    def __init__(self, directory=MARGIN_DIR):
+        self.directory = directory
+        self.seasons = sorted(int(name) for name in os.listdir(directory) if name.isdigit() and
+                              os.path.exists(os.path.join(directory, name, 'columns.json')))
+        self._seasons = {}
+
+    def season(self, year):
+        if year not in self.seasons:
+            raise KeyError('season {0} is not in the margin store'.format(year))
+        if year not in self._seasons:
+            self._seasons[year] = MarginSeason(os.path.join(self.directory, str(year)))
+        return self._seasons[year]
+
+    def advantages(self, stat, years=None, team=None):
+        """
+        Return the margins of a stat, signed so that a positive margin means the stat was won, and whether each game
+        was won.
+        """
+        years = self.seasons if years is None else years
+        margins = np.concatenate([self.season(year).column('margins', stat, team) for year in years])
+        won = np.concatenate([self.season(year).column('margins', 'pts', team) for year in years]) > 0
+        if stat in LOWER_IS_BETTER:
+            margins = -margins
+        return margins, won
+
+    def win_probability(self, stat, thresholds=None, years=None, team=None):
+        """
+        The win % of teams which won a stat by at least each threshold.
+
+        :param list thresholds: The margins, defaulting to every margin seen, which gives the whole curve.
+        :return: A DataFrame of threshold, games, wins and win_pct, one row per threshold.
+        """
+        from pandas import DataFrame
+
+        margins, won = self.advantages(stat, years, team)
+        keep = ~np.isnan(margins)
+        margins, won = margins[keep], won[keep]
+
+        order = np.argsort(margins, kind='mergesort')
+        margins, won = margins[order], won[order]
+        # wins among the games at or above each position of the sorted margins.
+        wins_above = np.concatenate([np.cumsum(won[::-1])[::-1], [0]])
+        thresholds = np.unique(margins) if thresholds is None else np.asarray(thresholds, dtype=float)
+
+        first = np.searchsorted(margins, thresholds, side='left')
+        games = len(margins) - first
+        wins = wins_above[first]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            win_pct = np.where(games > 0, wins / games.astype(float), np.nan)
+        return DataFrame({'threshold': thresholds, 'games': games, 'wins': wins, 'win_pct': win_pct},
+                         columns=['threshold', 'games', 'wins', 'win_pct'])
+
+    def binned(self, stat, bins=10, years=None, team=None):
+        """
+        The win % of teams per bin of their margin of a stat.
+
+        :param bins: The number of equal-width bins, or their edges, as for numpy.histogram.
+        :return: A DataFrame of low, high, games, wins and win_pct, one row per bin.
+        """
+        from pandas import DataFrame
+
+        margins, won = self.advantages(stat, years, team)
+        keep = ~np.isnan(margins)
+        margins, won = margins[keep], won[keep]
+
+        games, edges = np.histogram(margins, bins)
+        wins, _ = np.histogram(margins[won], edges)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            win_pct = np.where(games > 0, wins / games.astype(float), np.nan)
+        return DataFrame({'low': edges[:-1], 'high': edges[1:], 'games': games, 'wins': wins, 'win_pct': win_pct},
+                         columns=['low', 'high', 'games', 'wins', 'win_pct'])
+
+    def outcomes(self, stats, threshold=0, years=None, team=None):
+        """
+        Return outcome codes as if a stat were won only by a margin of at least threshold, and lost only by at least
+        as much. Games in between are ties.
+
+        :param list stats: The stats to return codes of, in column order.
+        :param threshold: A margin for every stat, or a dictionary of stat to margin (0 for stats not in it).
+        :return: A tuple of a games x stats array of codes (LOST, WON or TIED), and whether each game was won.
+        """
+        columns = []
+        won = None
+        for stat in stats:
+            margin = threshold.get(stat, 0) if isinstance(threshold, dict) else threshold
+            margins, won = self.advantages(stat, years, team)
+            codes = np.full(len(margins), TIED, dtype=np.int8)
+            if margin > 0:
+                codes[margins >= margin] = WON
+                codes[margins <= -margin] = LOST
+            else:
+                codes[margins > 0] = WON
+                codes[margins < 0] = LOST
+            columns.append(codes)
+        if won is None:
+            won = self.advantages('pts', years, team)[1]
+        return np.column_stack(columns) if columns else np.empty((len(won), 0), np.int8), won
@@ -0,0 +1,235 @@
+"""
+An index of every game by team, opponent and season, and stat importance conditioned on the opponent.
+
+The store keeps the two sides of game n as rows 2n and 2n + 1, but never says who played whom. This index pairs
+them: the opponent of every row is kept in its season's directory as opponent.npy, and the outcomes of every season
+are counted by team and opponent into matchup_counts.npy, a teams x opponents x COUNTS x stats array. Like the
+counters of aggregates.TeamCounts, a season's are made once and afterwards only updated from the rows appended to it.
+
+Head-to-head records and stat importance against any opponent, or against every opponent of a given strength (the
+opponent's win % over the season), are sums of those counters, so no query reads a game:
+
+    index = MatchupCounts(store)
+    index.head_to_head('gsw', 'cle')                   # every stat's summary, gsw against cle over every season
+    index.importance('gsw', 'cle', years=[2017])       # as TeamScraper.stat_importance, against cle only
+    index.by_strength(bins=[0, .4, .6, 1])             # win % when each stat was won, by the opponent's win %
+    index.games('gsw', 'cle')                          # the games themselves, as an OutcomeTable
+
+Use it as:
+
+    python -m scraper.matchups gsw cle
+"""
+import argparse
+import os
+
+import numpy as np
+
+from aggregates import COUNTS, importance, summarize, team_counts
+from store import save_array
+
+
+def opponents(rows, teams):
+    """
+    Pair the two sides of every game of a season.
+
+    :param numpy.ndarray rows: The position of each row in the season; the sides of a game are rows 2n and 2n + 1.
+    :param numpy.ndarray teams: The team code of each row.
+    :return: The team code of each row's opponent, -1 for a row whose other side is missing.
+    """
+    rows = np.asarray(rows, dtype=np.intp)
+    team_at = np.full(rows.max() + 2 if len(rows) else 0, -1, dtype=np.int8)
+    team_at[rows] = teams
+    return team_at[rows ^ 1]
+
+
+class MatchupCounts(object):
+    """
+    The counters of every team against every opponent in every season of a store.
+    """
+    def __init__(self, store):
+        self.store = store
+        self.win_index = store.stat_index('win')
+        self._counts = {}
+        self._opponents = {}
+
+    def _path(self, year, name):
+        return os.path.join(self.store.season(year).directory, name)
+
+    def opponent(self, year):
+        """
+        Return the team code of the opponent of every row of a season, in the order of the season's rows.
+        """
+        if year not in self._opponents:
+            season = self.store.season(year)
+            path = self._path(year, 'opponent.npy')
+            column = np.load(path, mmap_mode='r') if os.path.exists(path) else None
+            if column is None or len(column) != len(season) or (len(column) and column.min() < 0):
+                column = opponents(season.row, season.team)
+                save_array(path, column)
+            self._opponents[year] = column
+        return self._opponents[year]
+
+    def get(self, year):
+        """
+        Return the up to date teams x opponents x COUNTS x stats array of counts of a season.
+        """
+        if year in self._counts:
+            return self._counts[year]
+
+        season = self.store.season(year)
+        path = self._path(year, 'matchup_counts.npy')
+        n_teams, n_stats = len(self.store.teams), len(self.store.stats)
+        counts = np.zeros((n_teams, n_teams, len(COUNTS), n_stats), dtype=np.int64)
+        if os.path.exists(path):
+            saved = np.load(path)
+            # teams added to the store since the counters were saved have none.
+            counts[:len(saved), :len(saved)] = saved
+
+        counted = int(counts[:, :, 0, 0].sum())
+        paired = np.asarray(self.opponent(year)) >= 0
+        if counted < paired.sum():
+            # a game is counted once both of its sides are in the store.
+            new_rows = paired & (np.asarray(season.row) >= counted)
+            groups = np.asarray(season.team[new_rows], dtype=np.intp) * n_teams + self.opponent(year)[new_rows]
+            counts += team_counts(season.outcomes[new_rows], self.win_index, groups,
+                                  n_teams * n_teams).reshape(counts.shape)
+            save_array(path, counts)
+
+        self._counts[year] = counts
+        return counts
+
+    def counts(self, team=None, opponent=None, years=None):
+        """
+        Return the COUNTS x stats array of counts of a team (or every team) against an opponent (or every opponent),
+        summed over the given seasons (defaulting to all of them).
+
+        :raises ValueError: If the team and the opponent are the same team, which never plays itself.
+        """
+        if team is not None and team == opponent:
+            raise ValueError('a team does not play itself: {0}'.format(team))
+        teams = slice(None) if team is None else self.store.team_code(team)
+        opponents = slice(None) if opponent is None else self.store.team_code(opponent)
+        total = np.zeros((len(COUNTS), len(self.store.stats)), dtype=np.int64)
+        for year in self.store.seasons if years is None else years:
+            counts = self.get(year)[teams, opponents]
+            total += counts.reshape((-1,) + total.shape).sum(axis=0)
+        return total
+
+    def strength(self, year):
+        """
+        Return the win % of every team over a season, NaN for teams which did not play in it.
+        """
+        counts = self.get(year).sum(axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return counts[:, COUNTS.index('won'), self.win_index] / counts[:, 0, 0].astype(float)
+
+    def head_to_head(self, team, opponent, years=None, stats=None):
+        """
+        Return a DataFrame of the summary of every stat (or the given ones) of a team against an opponent, one row
+        per stat, as TeamCounts.table.
+        """
+        from pandas import DataFrame
+
+        stats = list(self.store.stats if stats is None else stats)
+        columns = summarize(self.counts(team, opponent, years), [self.store.stat_index(stat) for stat in stats],
+                            self.win_index)
+        frame = DataFrame(columns, index=stats,
+                          columns=list(COUNTS) + ['ties', 'win_pct', 'base_pct', 'adj_pct', 'tie_rate', 'gain'])
+        frame.index.name = 'stat'
+        return frame
+
+    def importance(self, team, opponent, years=None):
+        """
+        Return the importance of each stat to a team against an opponent over the given seasons, in the format of
+        TeamScraper.stat_importance.
+        """
+        columns = summarize(self.counts(team, opponent, years), range(len(self.store.stats)), self.win_index)
+        result = importance(team, self.store.stats, columns)
+        result['opponent'] = opponent
+        return result
+
+    def by_strength(self, team=None, bins=(0, .4, .5, .6, 1), years=None, stats=None):
+        """
+        The win % of a team (or the league) when each stat was won, against opponents in each bin of win %.
+
+        An opponent's strength is its win % over the season of the game.
+
+        :param list bins: The edges of the bins of opponent win %, increasing. The last bin includes its upper edge.
+        :return: A DataFrame of low, high, games, wins, base_pct and the win % when each stat was won, one row per
+            bin.
+        :raises ValueError: If there are fewer than two edges, or they are not increasing.
+        """
+        from pandas import DataFrame
+
+        stats = list(self.store.stats if stats is None else stats)
+        columns = [self.store.stat_index(stat) for stat in stats]
+        edges = np.asarray(bins, dtype=float)
+        if len(edges) < 2 or (np.diff(edges) <= 0).any():
+            raise ValueError('bins must be at least two increasing edges: {0}'.format(list(bins)))
+        counts = np.zeros((len(edges) - 1, len(COUNTS), len(self.store.stats)), dtype=np.int64)
+        for year in self.store.seasons if years is None else years:
+            season = self.get(year)
+            season = season.sum(axis=0) if team is None else season[self.store.team_code(team)]
+            strength = self.strength(year)
+            # a bins x opponents matrix of which bin each opponent is in; opponents outside every bin are left out.
+            binned = np.clip(np.searchsorted(edges, strength, side='right') - 1, 0, len(edges) - 2)
+            with np.errstate(invalid='ignore'):
+                inside = (strength >= edges[0]) & (strength <= edges[-1])
+            membership = (binned == np.arange(len(edges) - 1)[:, None]) & inside
+            counts += np.tensordot(membership.astype(np.int64), season, axes=1)
+
+        games = counts[:, 0, self.win_index]
+        wins = counts[:, COUNTS.index('won'), self.win_index]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            base_pct = wins / games.astype(float)
+            win_pct = (counts[:, COUNTS.index('won_wins')][:, columns] /
+                       counts[:, COUNTS.index('won')][:, columns].astype(float))
+
+        frame = DataFrame(win_pct, columns=stats)
+        frame.insert(0, 'low', edges[:-1])
+        frame.insert(1, 'high', edges[1:])
+        frame.insert(2, 'games', games)
+        frame.insert(3, 'wins', wins)
+        frame.insert(4, 'base_pct', base_pct)
+        return frame
+
+    def rows(self, year, team, opponent=None):
+        """
+        Return the positions in a season (rows 2n and 2n + 1 for game n, as in the margin and player stores) of a
+        team's games against an opponent, or against every opponent, in the order played.
+        """
+        season = self.store.season(year)
+        rows = season.team_rows(team)
+        positions = np.asarray(season.row[rows])
+        if opponent is not None:
+            positions = positions[np.asarray(self.opponent(year)[rows]) == self.store.team_code(opponent)]
+        return np.sort(positions)
+
+    def games(self, team, opponent, years=None):
+        """
+        Return a team's games against an opponent over the given seasons, in the order played, as an OutcomeTable
+        for analyses of single games such as teamscrape.to_win_probability.
+        """
+        from records import OutcomeTable, Schema
+
+        codes = []
+        for year in self.store.seasons if years is None else years:
+            season = self.store.season(year)
+            rows = season.team_rows(team)
+            against = np.asarray(self.opponent(year)[rows]) == self.store.team_code(opponent)
+            order = np.argsort(season.row[rows][against], kind='mergesort')
+            codes.append(np.asarray(season.outcomes[rows][against])[order])
+
+        codes = np.concatenate(codes) if codes else np.empty((0, len(self.store.stats)), dtype=np.int8)
+        return OutcomeTable(Schema.get(self.store.stats), codes, [team] * len(codes))
+
+
+if __name__ == '__main__':
+    from store import SeasonStore
+
+    parser = argparse.ArgumentParser(description='Stat importance of a team against an opponent.')
+    parser.add_argument('team')
+    parser.add_argument('opponent')
+    args = parser.parse_args()
+
+    print MatchupCounts(SeasonStore()).head_to_head(args.team, args.opponent).to_string()
@@ -0,0 +1,343 @@
+"""
+Metrics of the scrape, parse and analyze pipeline: counters, gauges and histograms, and optional profiling.
+
+Every stage of the pipeline records into the process-wide registry:
+
+    fetch.requests, fetch.errors, fetch.retries   counters of requests made, by transport and status
+    fetch.bytes                                   counter of bytes downloaded
+    fetch.latency_seconds                         histogram of request latency
+    cache.hits, cache.misses, cache.evictions     counters of the page cache, by tier
+    cached.hits, cached.misses                    counters of the cached decorator, by function
+    parse.seconds                                 histogram of box score parse time, by backend
+    gain.seconds, counts.seconds                  histograms of information gain and counter computation
+    rebuild.stage_seconds                         histogram of rebuild stage time, by stage
+    memory.peak_bytes                             gauge of peak memory of rebuild stages, by stage and scope (see
+                                                  peak_memory_scope)
+    timeit.seconds                                histogram of functions decorated with utils.timeit
+    service.requests, service.cache               counters of query service requests, by route and status, and of
+                                                  its response cache
+    service.latency_seconds                       histogram of query service latency, by route
+
+Use it as:
+
+    metrics = get_metrics()
+    metrics.increment('fetch.bytes', len(text))
+    with metrics.timer('parse.seconds', backend='scan'):
+        ...
+    metrics.write('metrics.json')     # or metrics.prom, in the Prometheus text format
+
+Registries are snapshotted as plain dictionaries, so metrics recorded in worker processes can be merged into the
+parent's registry.
+"""
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+# upper bounds of histogram buckets, suited to durations in seconds.
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+PROMETHEUS_PREFIX = 'datascience_'
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+class Histogram(object):
+    """
+    Counts of observed values falling into fixed buckets, with their count, sum, minimum and maximum.
+    """
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value):
+        index = next((i for i, bound in enumerate(self.buckets) if value <= bound), len(self.buckets))
+        self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def merge(self, other):
+        if other['buckets'] != list(self.buckets):
+            raise ValueError('cannot merge histograms with different buckets')
+        self.counts = [a + b for a, b in zip(self.counts, other['counts'])]
+        self.count += other['count']
+        self.sum += other['sum']
+        for attr, pick in (('min', min), ('max', max)):
+            if other[attr] is not None:
+                value = getattr(self, attr)
+                setattr(self, attr, other[attr] if value is None else pick(value, other[attr]))
+
+    def to_dict(self):
+        return {'buckets': list(self.buckets), 'counts': list(self.counts), 'count': self.count, 'sum': self.sum,
+                'min': self.min, 'max': self.max}
+
+
+class Registry(object):
+    """
+    A thread-safe collection of named counters, gauges and histograms, each optionally split by labels.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._counters = {}
+            self._gauges = {}
+            self._histograms = {}
+
+    def increment(self, name, value=1, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set_gauge(self, name, value, **labels):
+        with self._lock:
+            self._gauges[_key(name, labels)] = value
+
+    def observe(self, name, value, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(value)
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """
+        Observe the time taken by the body of a with statement, in seconds.
+        """
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.observe(name, time.time() - start, **labels)
+
+    def counter(self, name, **labels):
+        return self._counters.get(_key(name, labels), 0)
+
+    def histogram(self, name, **labels):
+        return self._histograms.get(_key(name, labels))
+
+    def snapshot(self):
+        """
+        Return the metrics as a dictionary of plain values, as written to JSON.
+        """
+        with self._lock:
+            return {
+                'counters': [{'name': name, 'labels': dict(labels), 'value': value}
+                             for (name, labels), value in sorted(self._counters.items())],
+                'gauges': [{'name': name, 'labels': dict(labels), 'value': value}
+                           for (name, labels), value in sorted(self._gauges.items())],
+                'histograms': [dict(histogram.to_dict(), name=name, labels=dict(labels))
+                               for (name, labels), histogram in sorted(self._histograms.items())],
+            }
+
+    def merge(self, snapshot):
+        """
+        Add the metrics of a snapshot, e.g. one taken in a worker process, into this registry.
+        """
+        for counter in snapshot['counters']:
+            self.increment(counter['name'], counter['value'], **counter['labels'])
+        for gauge in snapshot['gauges']:
+            # gauges from several processes are combined by their maximum, e.g. peak memory.
+            key = _key(gauge['name'], gauge['labels'])
+            with self._lock:
+                self._gauges[key] = max(self._gauges.get(key, gauge['value']), gauge['value'])
+        for other in snapshot['histograms']:
+            key = _key(other['name'], other['labels'])
+            with self._lock:
+                histogram = self._histograms.get(key)
+                if histogram is None:
+                    histogram = self._histograms[key] = Histogram(other['buckets'])
+                histogram.merge(other)
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), indent=2, sort_keys=True)
+
+    def to_prometheus(self):
+        """
+        Return the metrics in the Prometheus text exposition format.
+        """
+        snapshot = self.snapshot()
+        lines = []
+
+        def _name(name):
+            return PROMETHEUS_PREFIX + name.replace('.', '_')
+
+        def _labels(labels, **extra):
+            labels = dict(labels, **extra)
+            if not labels:
+                return ''
+            return '{' + ','.join('{0}="{1}"'.format(k, str(v).replace('"', '\\"')) for k, v in sorted(labels.items())) + '}'
+
+        typed = set()
+
+        def _type(name, kind):
+            if name not in typed:
+                typed.add(name)
+                lines.append('# TYPE {0} {1}'.format(name, kind))
+
+        for counter in snapshot['counters']:
+            name = _name(counter['name']) + '_total'
+            _type(name, 'counter')
+            lines.append('{0}{1} {2}'.format(name, _labels(counter['labels']), counter['value']))
+
+        for gauge in snapshot['gauges']:
+            name = _name(gauge['name'])
+            _type(name, 'gauge')
+            lines.append('{0}{1} {2}'.format(name, _labels(gauge['labels']), gauge['value']))
+
+        for histogram in snapshot['histograms']:
+            name = _name(histogram['name'])
+            _type(name, 'histogram')
+            cumulative = 0
+            for bound, count in zip(histogram['buckets'] + ['+Inf'], histogram['counts']):
+                cumulative += count
+                lines.append('{0}_bucket{1} {2}'.format(name, _labels(histogram['labels'], le=bound), cumulative))
+            lines.append('{0}_sum{1} {2!r}'.format(name, _labels(histogram['labels']), histogram['sum']))
+            lines.append('{0}_count{1} {2}'.format(name, _labels(histogram['labels']), histogram['count']))
+
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path):
+        """
+        Write the metrics to path, in the Prometheus text format if it ends in .prom and as JSON otherwise.
+        """
+        with open(path, 'w') as f:
+            f.write(self.to_prometheus() if path.endswith('.prom') else self.to_json())
+
+
+_metrics = Registry()
+
+
+def get_metrics():
+    """
+    Return the process-wide registry.
+    """
+    return _metrics
+
+
+class SamplingProfiler(object):
+    """
+    A statistical profiler: samples the stacks of every other thread at a fixed interval from a background thread.
+
+    Samples are kept as collapsed stacks ('outer;inner;innermost' with a count), the input of flame graph tools.
+
+    :param float interval: Seconds between samples.
+    """
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        own = threading.current_thread().ident
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append('{0}:{1}'.format(os.path.basename(code.co_filename), code.co_name))
+                    frame = frame.f_back
+                self.samples[';'.join(reversed(stack))] += 1
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._sample)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def top(self, n=20):
+        """
+        Return the n functions most often at the top of the stack, with their sample counts.
+        """
+        functions = Counter()
+        for stack, count in self.samples.iteritems():
+            functions[stack.rsplit(';', 1)[-1]] += count
+        return functions.most_common(n)
+
+    def write(self, path):
+        with open(path, 'w') as f:
+            for stack, count in sorted(self.samples.iteritems()):
+                f.write('{0} {1}\n'.format(stack, count))
+
+
+def start_memory_tracing():
+    """
+    Start tracing memory allocations with tracemalloc where it is available. Without it, peak_memory falls back on
+    the peak resident set size of the process.
+    """
+    try:
+        import tracemalloc
+    except ImportError:
+        return False
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+    return True
+
+
+def peak_memory_scope():
+    """
+    Return what peak_memory measures after a reset: 'stage' where the traced peak can be reset (tracemalloc on
+    Python 3.9 and later), so it is the peak since the reset, otherwise 'process', the high-water mark of the whole
+    process so far, which in a pool worker includes every stage it ran before.
+    """
+    try:
+        import tracemalloc
+    except ImportError:
+        return 'process'
+    return 'stage' if tracemalloc.is_tracing() and hasattr(tracemalloc, 'reset_peak') else 'process'
+
+
+def peak_memory(reset=False):
+    """
+    Return the peak memory use of the process in bytes: of traced allocations if tracemalloc is tracing, otherwise
+    the peak resident set size.
+
+    :param bool reset: Whether to reset the traced peak, so the next call measures from now. The resident set size
+        peak cannot be reset.
+    """
+    try:
+        import tracemalloc
+    except ImportError:
+        tracemalloc = None
+
+    if tracemalloc is not None and tracemalloc.is_tracing():
+        peak = tracemalloc.get_traced_memory()[1]
+        if reset and hasattr(tracemalloc, 'reset_peak'):
+            tracemalloc.reset_peak()
+        return peak
+
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, kilobytes elsewhere.
+    return peak if sys.platform == 'darwin' else peak * 1024
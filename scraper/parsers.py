@@ -0,0 +1,289 @@
+"""
+Parsers for basketball-reference pages: the team totals rows of box scores, and the box score links of schedules.
+
+Every totals parser takes the raw html of a box score and returns a dictionary mapping team name to raw stats, read from
+the <tfoot> row of each of the team's stats tables (basic and advanced):
+
+{
+ 'nyk': {'fg3a_per_fga_pct': 0.31, 'orb_pct': 24.5, ... },
+ 'cle': {'fg3a_per_fga_pct': 0.372, 'orb_pct': 27.5, ... }
+}
+
+`scan` is the default: it makes a single pass over the page with regular expressions, only looking inside the
+stats tables' <tfoot> elements, and never builds a parse tree. `bs4` is the original BeautifulSoup parser, kept as
+the reference implementation. `lxml` builds an lxml tree, which is faster than BeautifulSoup but slower than `scan`.
+
+parse_box_score reads the players' rows of the same tables in the same pass as the totals, as a list per team of
+(player id, raw stats) pairs in the order of the box score. Players who did not play are left out, and minutes
+played (mp) are given in seconds:
+
+{
+ 'nyk': [('anthoca01', {'mp': 1862.0, 'fg': 4.0, 'ast': 1.0, 'usg_pct': 27.4, ... }), ... ],
+ 'cle': [('jamesle01', {'mp': 882.0, 'fg': 7.0, 'ast': 0.0, 'usg_pct': 9.3, ... }), ... ]
+}
+"""
+import re
+from collections import defaultdict
+
+from config import IGNORED_STATS, PARSER_BACKEND
+from metrics import get_metrics
+
+# comments are matched alongside tables so that tables commented out of the page (the line score and
+# four factors) are skipped, just as html.parser skips them.
+TABLE_RE = re.compile(r'<!--.*?-->|<table\b([^>]*)>', re.DOTALL | re.IGNORECASE)
+TABLE_END_RE = re.compile(r'</table\s*>', re.IGNORECASE)
+TFOOT_RE = re.compile(r'<tfoot\b[^>]*>(.*?)</tfoot\s*>', re.DOTALL | re.IGNORECASE)
+CELL_RE = re.compile(r'<td\b([^>]*)>(.*?)</td\s*>', re.DOTALL | re.IGNORECASE)
+CLASS_RE = re.compile(r'\bclass\s*=\s*["\']([^"\']*)["\']', re.IGNORECASE)
+ID_RE = re.compile(r'\bid\s*=\s*["\']([^"\']*)["\']', re.IGNORECASE)
+DATA_STAT_RE = re.compile(r'\bdata-stat\s*=\s*["\']([^"\']*)["\']', re.IGNORECASE)
+TAG_RE = re.compile(r'<[^>]+>')
+TBODY_RE = re.compile(r'<tbody\b[^>]*>(.*?)</tbody\s*>', re.DOTALL | re.IGNORECASE)
+ROW_RE = re.compile(r'<tr\b[^>]*>(.*?)</tr\s*>', re.DOTALL | re.IGNORECASE)
+PLAYER_RE = re.compile(r'<th\b[^>]*\bdata-append-csv\s*=\s*["\']([^"\']+)["\']', re.IGNORECASE)
+STAT_CELL_RE = re.compile(r'<td\b[^>]*?\bdata-stat\s*=\s*["\']([^"\']*)["\'][^>]*>(.*?)</td\s*>', re.DOTALL | re.IGNORECASE)
+
+
+def parse_team_name(table_id):
+    """
+    Given the id of a box score table, e.g. 'box_nyk_basic', return the team name it applies to.
+    """
+    return table_id.split('_')[1]
+
+
+def _attribute(pattern, attributes):
+    match = pattern.search(attributes)
+    return match.group(1) if match else None
+
+
+def _player_value(category, text):
+    """
+    Convert the text of a player's cell into a number, or None if it is empty.
+    """
+    text = text.strip()
+    if not text:
+        return None
+    if category == 'mp':
+        minutes, _, seconds = text.partition(':')
+        return float(int(minutes) * 60 + int(seconds or 0))
+    return float(text)
+
+
+class _Players(object):
+    """
+    The players' rows of a box score, merged across the basic and advanced tables of each team.
+    """
+    def __init__(self):
+        self.teams = defaultdict(list)
+        self._rows = {}
+
+    def add(self, team, player, category, value):
+        key = (team, player)
+        if key not in self._rows:
+            self._rows[key] = {}
+            self.teams[team].append((player, self._rows[key]))
+        if value is not None:
+            self._rows[key][category] = value
+
+
+def _scan(html, ignored, players=None):
+    """
+    Scan the page for stats tables, reading the cells of their <tfoot>, and of their <tbody> if players is given.
+    """
+    team_to_stats = defaultdict(dict)
+
+    position = 0
+    while True:
+        match = TABLE_RE.search(html, position)
+        if match is None:
+            break
+        position = match.end()
+
+        attributes = match.group(1)
+        if attributes is None:
+            # a comment.
+            continue
+
+        classes = _attribute(CLASS_RE, attributes)
+        if not classes or 'stats_table' not in classes.split():
+            continue
+
+        end = TABLE_END_RE.search(html, position)
+        table_end = end.start() if end else len(html)
+        tfoot = TFOOT_RE.search(html, position, table_end)
+        tbody = TBODY_RE.search(html, position, table_end) if players is not None else None
+        position = end.end() if end else table_end
+        if tfoot is None:
+            continue
+
+        team = parse_team_name(_attribute(ID_RE, attributes))
+        for cell_attributes, text in CELL_RE.findall(tfoot.group(1)):
+            category = _attribute(DATA_STAT_RE, cell_attributes)
+            if category not in ignored:
+                team_to_stats[team][category] = float(TAG_RE.sub('', text))
+
+        for row in ROW_RE.findall(tbody.group(1)) if tbody else ():
+            player = PLAYER_RE.search(row)
+            if player is None:
+                # the 'Reserves' header row.
+                continue
+            cells = STAT_CELL_RE.findall(row)
+            # a player who did not play has a reason instead of stats.
+            if any(category == 'reason' for category, _ in cells):
+                continue
+            for category, text in cells:
+                players.add(team, player.group(1), category, _player_value(category, TAG_RE.sub('', text)))
+
+    return team_to_stats
+
+
+def scan_team_totals(html, ignored=IGNORED_STATS):
+    """
+    Extract team totals by scanning the page for stats tables and reading only their <tfoot> cells.
+    """
+    return _scan(html, ignored)
+
+
+def scan_box_score(html, ignored=IGNORED_STATS):
+    """
+    Extract team totals and the players' rows in a single scan of the page.
+
+    :return: A tuple of the team totals and the players' rows, as described above.
+    """
+    players = _Players()
+    team_to_stats = _scan(html, ignored, players)
+    return team_to_stats, dict(players.teams)
+
+
+def bs4_team_totals(html, ignored=IGNORED_STATS):
+    """
+    Extract team totals from a full BeautifulSoup parse tree of the page.
+    """
+    from bs4 import BeautifulSoup
+
+    parser = BeautifulSoup(html, 'html.parser')
+
+    team_to_stats = defaultdict(dict)
+    for table in parser.findAll('table', {'class': 'stats_table'}):
+        team = parse_team_name(table['id'])
+        totals_row = table.find('tfoot')
+        for column in totals_row.findAll('td'):
+            category = column['data-stat']
+            if category not in ignored:
+                team_to_stats[team][category] = float(column.text)
+
+    return team_to_stats
+
+
+def lxml_team_totals(html, ignored=IGNORED_STATS):
+    """
+    Extract team totals from an lxml parse tree of the page.
+    """
+    from lxml import html as lxml_html
+
+    tree = lxml_html.fromstring(html)
+
+    team_to_stats = defaultdict(dict)
+    for table in tree.xpath('//table[contains(concat(" ", normalize-space(@class), " "), " stats_table ")]'):
+        team = parse_team_name(table.get('id'))
+        for column in table.xpath('./tfoot//td'):
+            category = column.get('data-stat')
+            if category not in ignored:
+                team_to_stats[team][category] = float(column.text_content())
+
+    return team_to_stats
+
+
+def bs4_player_rows(html):
+    """
+    Extract the players' rows from a full BeautifulSoup parse tree of the page, as a reference for scan_box_score.
+    """
+    from bs4 import BeautifulSoup
+
+    parser = BeautifulSoup(html, 'html.parser')
+
+    players = _Players()
+    for table in parser.findAll('table', {'class': 'stats_table'}):
+        if table.find('tfoot') is None:
+            continue
+        team = parse_team_name(table['id'])
+        for row in table.find('tbody').findAll('tr'):
+            th = row.find('th')
+            if th is None or not th.get('data-append-csv') or row.find('td', {'data-stat': 'reason'}):
+                continue
+            for column in row.findAll('td'):
+                players.add(team, th['data-append-csv'], column['data-stat'],
+                            _player_value(column['data-stat'], column.text))
+
+    return dict(players.teams)
+
+
+def _with_player_rows(team_totals):
+    """
+    Make a box score parser of a team totals parser, reading the players' rows with a second, BeautifulSoup, parse.
+    """
+    def box_score(html, ignored=IGNORED_STATS):
+        return team_totals(html, ignored), bs4_player_rows(html)
+    box_score.__name__ = team_totals.__name__.replace('team_totals', 'box_score')
+    return box_score
+
+
+PARSERS = {
+    'scan': scan_team_totals,
+    'bs4': bs4_team_totals,
+    'lxml': lxml_team_totals,
+}
+
+# only the scan reads the players' rows in the same pass as the team totals.
+BOX_SCORE_PARSERS = {
+    'scan': scan_box_score,
+    'bs4': _with_player_rows(bs4_team_totals),
+    'lxml': _with_player_rows(lxml_team_totals),
+}
+
+
+def parse_team_totals(html, ignored=IGNORED_STATS, backend=None):
+    """
+    Extract a dictionary mapping team name to raw stats from the raw html of a box score.
+
+    :param str html: The raw html of the box score.
+    :param set ignored: Stat categories to leave out.
+    :param str backend: The name of the parser to use, defaults to the configured PARSER_BACKEND.
+    """
+    backend = backend or PARSER_BACKEND
+    with get_metrics().timer('parse.seconds', backend=backend):
+        return PARSERS[backend](html, ignored)
+
+
+def parse_box_score(html, ignored=IGNORED_STATS, backend=None):
+    """
+    Extract the team totals and the players' rows of the raw html of a box score, in a single pass with the scan
+    backend. Where only the team totals are needed, parse_team_totals does less work.
+
+    :param str html: The raw html of the box score.
+    :param set ignored: Stat categories to leave out of the team totals. Players' rows keep every stat.
+    :param str backend: The name of the parser to use, defaults to the configured PARSER_BACKEND.
+    :return: A tuple of a dictionary mapping team name to raw stats, and one mapping team name to a list of
+        (player id, raw stats) pairs.
+    """
+    backend = backend or PARSER_BACKEND
+    with get_metrics().timer('parse.seconds', backend=backend):
+        return BOX_SCORE_PARSERS[backend](html, ignored)
+
+
+BOX_SCORE_CELL_RE = re.compile(r'<td\b[^>]*\bdata-stat\s*=\s*["\']box_score_text["\'][^>]*>(.*?)</td\s*>', re.DOTALL | re.IGNORECASE)
+LINK_RE = re.compile(r'<a\b[^>]*\bhref\s*=\s*["\']([^"\']+)["\'][^>]*>(.*?)</a\s*>', re.DOTALL | re.IGNORECASE)
+
+
+def parse_game_links(html, base_url='http://www.basketball-reference.com'):
+    """
+    Return the box score links of a schedule page, in schedule order.
+
+    Games which have not been played yet have no box score link, and are left out.
+    """
+    game_links = []
+    for cell in BOX_SCORE_CELL_RE.findall(html):
+        link = LINK_RE.search(cell)
+        if link and TAG_RE.sub('', link.group(2)).strip():
+            game_links.append(base_url + link.group(1))
+    return game_links
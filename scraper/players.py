@@ -0,0 +1,295 @@
+"""
+Columnar store of the players' rows of every box score, and team win % by which player led a stat.
+
+The season and margin stores keep a row per team per game. This store keeps a row per player per game, read from the
+same tables in the same pass as the team totals (see parsers.parse_box_score), so questions about players are
+answered without scraping again.
+
+Layout, one directory per season as in the margin store:
+
+    player_store/
+        2017/
+            columns.json        stats (column order of box), teams and players (dictionaries of codes), games
+            box.npy             int16, rows x stats: the player's box score line, mp in seconds, 0 where missing
+            row.npy             int32 row of the player's team in the season, as in the season and margin stores:
+                                the two sides of game n are rows 2n and 2n + 1
+            team.npy            int8 team code of each row
+            player.npy          int16 player code of each row
+            row_offsets.npy     int32, the players of team row r are rows row_offsets[r]:row_offsets[r + 1]
+            team_order.npy      int32, the rows of team code t are team_order[team_offsets[t]:team_offsets[t + 1]]
+            team_offsets.npy
+            player_order.npy    int32, the rows of player code p are player_order[player_offsets[p]:...[p + 1]]
+            player_offsets.npy
+
+Rows are kept in the order games were scraped, and the rows of each team, player and game are found from the
+indexes without a scan.
+
+Use it as:
+
+    store = PlayerStore()
+    store.win_pct_when_leading('jamesle01', 'ast')    # team win % per season, when James led the team in assists
+    store.games('jamesle01', years=[2017])            # the player's box score lines
+"""
+import json
+import os
+
+import numpy as np
+
+from config import PLAYER_DIR, PLAYER_STATS
+from store import save_array, write_json
+
+
+def _index(codes, n_codes):
+    """
+    Return the rows of each code as an order and offsets: the rows of code c are order[offsets[c]:offsets[c + 1]].
+    """
+    order = np.argsort(codes, kind='mergesort').astype(np.int32)
+    offsets = np.searchsorted(np.asarray(codes)[order], np.arange(n_codes + 1)).astype(np.int32)
+    return order, offsets
+
+
+def _codes(names, dictionary, dtype):
+    index = {name: i for i, name in enumerate(dictionary)}
+    for name in names:
+        if name not in index:
+            index[name] = len(dictionary)
+            dictionary.append(name)
+    return np.array([index[name] for name in names], dtype=dtype)
+
+
+def player_rows(box_scores, stats=PLAYER_STATS, first_game=0):
+    """
+    Convert box scores into rows of players.
+
+    :param list box_scores: Box scores as lists of two (team, [(player, {stat: value}), ...]) pairs, in the order of
+        the sides of the game in the season and margin stores.
+    :param int first_game: The number of the first game in the season.
+    :return: A tuple of (rows, teams, players, box), with a row per player per game.
+    """
+    rows, teams, players, box = [], [], [], []
+    for game, box_score in enumerate(box_scores, first_game):
+        for side, (team, lines) in enumerate(box_score):
+            for player, values in lines:
+                rows.append(2 * game + side)
+                teams.append(str(team))
+                players.append(str(player))
+                box.append([values.get(stat, 0) for stat in stats])
+
+    box = np.array(box, dtype=np.int16).reshape(len(rows), len(stats))
+    return np.array(rows, dtype=np.int32), teams, players, box
+
+
+def write_season(year, box_scores, directory=PLAYER_DIR, append=False):
+    """
+    Write (or replace, or append to) a season of the store.
+
+    :param int year: The season.
+    :param list box_scores: Box scores as lists of two (team, [(player, {stat: value}), ...]) pairs.
+    :param str directory: The store.
+    :param bool append: Whether to add the box scores to the end of the season rather than replace it.
+    :raises ValueError: If appending to a season not in the store, whose games would be numbered from 0.
+    """
+    season_dir = os.path.join(directory, str(year))
+    if append and not os.path.exists(os.path.join(season_dir, 'columns.json')):
+        raise ValueError('season {0} is not in the player store to append to'.format(year))
+    if not os.path.isdir(season_dir):
+        os.makedirs(season_dir)
+
+    existing = PlayerSeason(season_dir) if append else None
+    box_scores = list(box_scores)
+    stats = existing.stats if existing else PLAYER_STATS
+    rows, teams, players, box = player_rows(box_scores, stats, existing.games if existing else 0)
+
+    team_names = list(existing.teams) if existing else []
+    player_ids = list(existing.players) if existing else []
+    team_codes = _codes(teams, team_names, np.int8)
+    player_codes = _codes(players, player_ids, np.int16)
+
+    if existing:
+        rows = np.concatenate([existing.row, rows])
+        team_codes = np.concatenate([existing.team, team_codes])
+        player_codes = np.concatenate([existing.player, player_codes])
+        box = np.concatenate([existing.box, box])
+    games = (existing.games if existing else 0) + len(box_scores)
+
+    save_array(os.path.join(season_dir, 'box.npy'), box)
+    save_array(os.path.join(season_dir, 'row.npy'), rows)
+    save_array(os.path.join(season_dir, 'team.npy'), team_codes)
+    save_array(os.path.join(season_dir, 'player.npy'), player_codes)
+    save_array(os.path.join(season_dir, 'row_offsets.npy'),
+               np.searchsorted(rows, np.arange(2 * games + 1)).astype(np.int32))
+    for name, codes, dictionary in (('team', team_codes, team_names), ('player', player_codes, player_ids)):
+        order, offsets = _index(codes, len(dictionary))
+        save_array(os.path.join(season_dir, name + '_order.npy'), order)
+        save_array(os.path.join(season_dir, name + '_offsets.npy'), offsets)
+
+    # the columns are written last: readers see the season once they are.
+    write_json(os.path.join(season_dir, 'columns.json'),
+               {'stats': stats, 'teams': team_names, 'players': player_ids, 'games': games})
+
+
+class PlayerSeason(object):
+    """
+    A single season of the store. Columns are memory-mapped on first access, and the per-team-row tables derived
+    from them are made once.
+    """
+    COLUMNS = ('box', 'row', 'team', 'player', 'row_offsets', 'team_order', 'team_offsets', 'player_order',
+               'player_offsets')
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, 'columns.json')) as f:
+            columns = json.load(f)
+        self.stats = columns['stats']
+        self.teams = columns['teams']
+        self.players = columns['players']
+        self.games = columns['games']
+        self._stat_index = {stat: i for i, stat in enumerate(self.stats)}
+        self._team_code = {team: i for i, team in enumerate(self.teams)}
+        self._player_code = {player: i for i, player in enumerate(self.players)}
+        self._derived = {}
+
+    def __getattr__(self, name):
+        if name not in self.COLUMNS:
+            raise AttributeError(name)
+        column = np.load(os.path.join(self.directory, name + '.npy'), mmap_mode='r')
+        setattr(self, name, column)
+        return column
+
+    def __len__(self):
+        return len(self.row)
+
+    def _rows_of(self, name, code):
+        if code is None:
+            return np.empty(0, dtype=np.int32)
+        offsets = getattr(self, name + '_offsets')
+        return np.asarray(getattr(self, name + '_order')[offsets[code]:offsets[code + 1]])
+
+    def rows(self, player=None, team=None):
+        """
+        Return the rows of a player, of a team, or of a player while with a team, in the order played.
+        """
+        if player is None and team is None:
+            return np.arange(len(self))
+        if player is None:
+            return self._rows_of('team', self._team_code.get(team))
+        rows = self._rows_of('player', self._player_code.get(player))
+        if team is not None:
+            rows = rows[np.asarray(self.team)[rows] == self._team_code.get(team, -1)]
+        return rows
+
+    def game(self, n):
+        """
+        Return the slice of rows of both sides of game n.
+        """
+        return slice(int(self.row_offsets[2 * n]), int(self.row_offsets[2 * n + 2]))
+
+    def column(self, stat, rows=None):
+        values = self.box[:, self._stat_index[stat]]
+        return np.asarray(values if rows is None else values[rows])
+
+    def team_totals(self, stat):
+        """
+        Return the sum of a stat over the players of each team row.
+        """
+        key = ('totals', stat)
+        if key not in self._derived:
+            self._derived[key] = np.bincount(self.row, self.column(stat), minlength=2 * self.games)
+        return self._derived[key]
+
+    def won(self):
+        """
+        Return whether the team of each team row won its game.
+        """
+        if 'won' not in self._derived:
+            points = self.team_totals('pts')
+            # the other side of row r is row r ^ 1.
+            self._derived['won'] = points > points[np.arange(len(points)) ^ 1]
+        return self._derived['won']
+
+    def leaders(self, stat, shared=True):
+        """
+        Return whether each row's player led the team in a stat in that game. Nobody leads a stat the whole team
+        had none of.
+
+        :param bool shared: Whether a player tied for the lead led it.
+        """
+        key = ('leaders', stat, shared)
+        if key not in self._derived:
+            values = self.column(stat)
+            offsets = np.asarray(self.row_offsets)
+            starts = offsets[:-1]
+            played = offsets[1:] > starts
+            best = np.zeros(len(starts), dtype=values.dtype)
+            if len(values):
+                best[played] = np.maximum.reduceat(values, starts[played])
+            leaders = (values == best[self.row]) & (values > 0)
+            if not shared:
+                leaders &= np.bincount(self.row, leaders, minlength=len(starts))[self.row] == 1
+            self._derived[key] = leaders
+        return self._derived[key]
+
+
+class PlayerStore(object):
+    """
+    Read access to the players' rows of every season in a store directory.
+    """
+    def __init__(self, directory=PLAYER_DIR):
+        self.directory = directory
+        self.seasons = sorted(int(name) for name in os.listdir(directory) if name.isdigit() and
+                              os.path.exists(os.path.join(directory, name, 'columns.json')))
+        self._seasons = {}
+
+    def season(self, year):
+        if year not in self.seasons:
+            raise KeyError('season {0} is not in the player store'.format(year))
+        if year not in self._seasons:
+            self._seasons[year] = PlayerSeason(os.path.join(self.directory, str(year)))
+        return self._seasons[year]
+
+    def games(self, player, years=None, team=None):
+        """
+        Return the box score lines of a player.
+
+        :return: A DataFrame of season, row (of the team in the season), team, won and the player's stats, one row
+            per game played.
+        """
+        from pandas import DataFrame, concat
+
+        frames = []
+        for year in self.seasons if years is None else years:
+            season = self.season(year)
+            rows = season.rows(player, team)
+            frame = DataFrame(np.asarray(season.box[rows]), columns=season.stats)
+            frame.insert(0, 'season', year)
+            frame.insert(1, 'row', np.asarray(season.row[rows]))
+            frame.insert(2, 'team', np.asarray(season.teams, dtype=object)[np.asarray(season.team[rows])])
+            frame.insert(3, 'won', season.won()[season.row[rows]])
+            frames.append(frame)
+        return concat(frames, ignore_index=True) if frames else DataFrame(columns=['season', 'row', 'team', 'won'])
+
+    def win_pct_when_leading(self, player, stat, years=None, shared=True):
+        """
+        The win % of a player's team in the games the player played, and in those where the player led the team in a stat.
+
+        :param bool shared: Whether games where the player tied for the lead count as leading it.
+        :return: A DataFrame indexed by season of games, wins, led, led_wins, win_pct and led_win_pct.
+        """
+        from pandas import DataFrame
+
+        years = self.seasons if years is None else list(years)
+        counts = np.zeros((len(years), 4), dtype=np.int64)
+        for i, year in enumerate(years):
+            season = self.season(year)
+            rows = season.rows(player)
+            won = season.won()[season.row[rows]]
+            led = season.leaders(stat, shared)[rows]
+            counts[i] = len(rows), won.sum(), led.sum(), (won & led).sum()
+
+        games, wins, led, led_wins = counts.T
+        with np.errstate(divide='ignore', invalid='ignore'):
+            win_pct = wins / games.astype(float)
+            led_win_pct = led_wins / led.astype(float)
+        return DataFrame({'games': games, 'wins': wins, 'led': led, 'led_wins': led_wins, 'win_pct': win_pct,
+                          'led_win_pct': led_win_pct}, index=years,
+                         columns=['games', 'wins', 'led', 'led_wins', 'win_pct', 'led_win_pct'])
@@ -0,0 +1,439 @@
+"""
+Rebuild season data as a graph of stages, run across a process pool.
+
+For every season:
+
+    links        the season's box score links                  build/YYYY/links.json
+    box_scores   raw team totals and players' rows of every     build/YYYY/box_scores.json
+                 box score
+    outcomes     won/lost/tied per stat per team per game      raw_game_data_YYYY
+    margins      raw totals and margins per team per game      margin_store/YYYY/
+    players      box score lines per player per game           player_store/YYYY/
+    aggregates   per-stat counters and the stat breakdown      build/YYYY/counts.npy, stat_breakdown_YYYY.csv
+
+and then across seasons:
+
+    frames       the cross-season tables and the season store  totals.csv, zscores.csv, ..., season_store/
+
+A stage runs once all the stages it depends on are done. A stage is skipped when the fingerprints of its inputs
+match those of its last run and its outputs still exist, so only work downstream of a change is redone. Links are
+always fetched (bypassing the page cache), since a season in progress gains games, but stages after them are skipped
+when the links have not changed. Rebuilt seasons replace their own in the season store, and the cross-season tables
+are made over every season in it.
+
+Use it as:
+
+    python -m scraper.rebuild 2000 2017
+    python -m scraper.rebuild 2000 2017 --no-scrape    # start from the existing raw_game_data_YYYY files
+
+Every stage records metrics (see scraper.metrics) in its worker, and the rebuild merges them:
+
+    python -m scraper.rebuild 2000 2017 --metrics build/metrics.prom --profile build/profile.txt --trace-memory
+
+writes the metrics of the rebuild in the Prometheus text format (or JSON, for any other extension), the sampled
+stacks of every stage collapsed for flame graph tools, and the peak memory of every stage: of the stage alone where
+tracemalloc can reset its peak, otherwise of the worker process up to the end of the stage (see
+metrics.peak_memory_scope).
+"""
+import argparse
+import hashlib
+import json
+import logging
+import multiprocessing as mp
+import os
+import time
+from collections import Counter
+
+import numpy as np
+
+from config import BUILD_DIR, MARGIN_DIR, PLAYER_DIR, RAW_GAME_DATA, ROOT_DIR, STORE_DIR
+from metrics import SamplingProfiler, get_metrics, peak_memory, peak_memory_scope, start_memory_tracing
+from store import write_json
+
+
+def fingerprint(paths):
+    """
+    Return a digest of the contents of the given files.
+    """
+    digest = hashlib.sha1()
+    for path in paths:
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def season_dir(year, build_dir=BUILD_DIR):
+    directory = os.path.join(build_dir, str(year))
+    if not os.path.isdir(directory):
+        try:
+            os.makedirs(directory)
+        except OSError:
+            if not os.path.isdir(directory):
+                raise
+    return directory
+
+
+# Stages. Each runs in a worker process, and writes its outputs to the paths it is given.
+
+def fetch_links(year, links_path):
+    from fetch import get_fetcher
+    from ingest import get_season_links
+
+    write_json(links_path, get_season_links(year, get_fetcher()))
+
+
+def fetch_box_scores(links_path, box_scores_path):
+    from fetch import get_fetcher
+    from teamscrape import get_box_score
+
+    with open(links_path) as f:
+        links = json.load(f)
+
+    # teams are kept as pairs, in the order get_box_score gives them, and their players in the same order.
+    box_scores = get_fetcher().map(get_box_score, links)
+    write_json(box_scores_path, [{'link': link,
+                                   'teams': [(team, stats) for team, stats, _ in box_score],
+                                   'players': [players for _, _, players in box_score]}
+                                  for link, box_score in zip(links, box_scores)])
+
+
+def compute_outcomes(box_scores_path, raw_game_data_path):
+    from records import OutcomeTable
+    from teamscrape import game_outcomes
+
+    with open(box_scores_path) as f:
+        box_scores = json.load(f)
+
+    games = (game_outcomes({str(team): stats for team, stats in box_score['teams']}) for box_score in box_scores)
+    OutcomeTable.from_games(games).to_frame().to_csv(raw_game_data_path)
+
+
+def compute_margins(year, box_scores_path, margin_dir):
+    from margins import write_season
+
+    with open(box_scores_path) as f:
+        box_scores = json.load(f)
+
+    write_season(year, (box_score['teams'] for box_score in box_scores), margin_dir)
+
+
+def compute_players(year, box_scores_path, player_dir):
+    from players import write_season
+
+    with open(box_scores_path) as f:
+        box_scores = json.load(f)
+
+    # box scores fetched before players were kept have none.
+    write_season(year, ([(team, players) for (team, _), players in
+                         zip(box_score['teams'], box_score.get('players', [[], []]))]
+                        for box_score in box_scores), player_dir)
+
+
+def compute_aggregates(raw_game_data_path, counts_path, breakdown_path):
+    from pandas import read_csv
+
+    from aggregates import counts_by_stat, season_counts, stat_breakdown
+
+    frame = read_csv(raw_game_data_path, index_col=0)
+    stats = [column for column in frame.columns if column != 'team']
+    counts = season_counts(frame[stats].values, stats.index('win'))
+
+    np.save(counts_path, counts)
+    stat_breakdown(counts_by_stat(counts, stats)).to_csv(breakdown_path)
+
+
+def compute_frames(years, counts_paths, raw_game_data, stats_path, tables_dir, store_dir, links_paths=None):
+    from pandas import read_csv
+
+    from aggregates import SeasonCounts, SeasonTables, TeamCounts
+    from store import SeasonStore, StoreWriter
+
+    with open(stats_path) as f:
+        stats = json.load(f)
+
+    # only the rebuilt seasons are replaced; the store's other seasons are left as they are.
+    if not os.path.isdir(store_dir):
+        os.makedirs(store_dir)
+    writer = StoreWriter(store_dir, stats=stats)
+    for year, links_path in zip(years, links_paths or [None] * len(years)):
+        writer.write_frame(year, read_csv(raw_game_data.format(year), index_col=0))
+        if links_path is not None:
+            with open(links_path) as f:
+                writer.write_links(year, json.load(f))
+        elif os.path.exists(os.path.join(store_dir, str(year), 'links.json')):
+            # the links of a season replaced from a csv alone are not known.
+            os.remove(os.path.join(store_dir, str(year), 'links.json'))
+    writer.close()
+
+    # the tables span every season in the store, using the counters of the rebuilt seasons already made.
+    store = SeasonStore(store_dir)
+    counts = SeasonCounts(store)
+    rebuilt = dict(zip(years, counts_paths)) if store.stats == stats else {}
+    SeasonTables(store.seasons, store.stats, [np.load(rebuilt[year]) if year in rebuilt else counts.get(year)
+                                              for year in store.seasons]).write(tables_dir)
+
+    index = TeamCounts(store)
+    for year in years:
+        index.get(year)
+
+
+class Stage(object):
+    """
+    A unit of the rebuild: a function, the stages whose outputs it reads, and the files it writes.
+
+    :param str name: Unique name of the stage, e.g. 'box_scores:2017'.
+    :param function func: The function to run, with args. None for a stage whose outputs already exist.
+    :param list deps: Names of the stages this one reads the outputs of.
+    :param list outputs: Paths of the files this stage writes.
+    :param bool network: Whether the stage fetches pages. Fetching stages are limited in number so that the
+        per-host rate limit of a single fetcher holds.
+    :param bool volatile: Whether to run the stage even if its inputs have not changed.
+    """
+    def __init__(self, name, func, args=(), deps=(), outputs=(), network=False, volatile=False):
+        self.name = name
+        self.func = func
+        self.args = args
+        self.deps = list(deps)
+        self.outputs = list(outputs)
+        self.network = network
+        self.volatile = volatile
+
+    def input_key(self, done):
+        """
+        Digest of this stage's arguments and the fingerprints of the outputs of the stages it depends on.
+        """
+        digest = hashlib.sha1(self.name)
+        digest.update(repr(self.args))
+        for dep in self.deps:
+            digest.update(done[dep])
+        return digest.hexdigest()
+
+
+def _run_stage(func, args, outputs, kind, profile=False, trace_memory=False):
+    """
+    Run a stage in a worker process.
+
+    :return: A tuple of the fingerprint of the stage's outputs, a snapshot of the metrics it recorded, and its
+        sampled stacks if profiled.
+    """
+    metrics = get_metrics()
+    # workers run many stages, so each stage reports only its own metrics.
+    metrics.reset()
+    if trace_memory:
+        start_memory_tracing()
+        peak_memory(reset=True)
+
+    profiler = SamplingProfiler().start() if profile else None
+    try:
+        with metrics.timer('rebuild.stage_seconds', stage=kind):
+            func(*args)
+    finally:
+        if profiler is not None:
+            profiler.stop()
+
+    if trace_memory:
+        # without a resettable peak, this is the worker's high-water mark, labelled as such.
+        metrics.set_gauge('memory.peak_bytes', peak_memory(), stage=kind, scope=peak_memory_scope())
+    return fingerprint(outputs), metrics.snapshot(), dict(profiler.samples) if profiler else None
+
+
+def build_stages(years, scrape=True, build_dir=BUILD_DIR, tables_dir=ROOT_DIR, store_dir=STORE_DIR,
+                 raw_game_data=RAW_GAME_DATA, margin_dir=MARGIN_DIR, player_dir=PLAYER_DIR):
+    """
+    Return the stages rebuilding the given seasons.
+
+    :param bool scrape: Whether to scrape the seasons. If not, the existing raw_game_data_YYYY files are used.
+    """
+    stages = []
+    counts_paths = []
+    links_paths = [] if scrape else None
+    for year in years:
+        directory = season_dir(year, build_dir)
+        links_path = os.path.join(directory, 'links.json')
+        box_scores_path = os.path.join(directory, 'box_scores.json')
+        raw_game_data_path = raw_game_data.format(year)
+        counts_path = os.path.join(directory, 'counts.npy')
+        breakdown_path = os.path.join(tables_dir, 'stat_breakdown_{0}.csv'.format(year))
+        counts_paths.append(counts_path)
+
+        if scrape:
+            links_paths.append(links_path)
+            stages.append(Stage('links:{0}'.format(year), fetch_links, (year, links_path),
+                                outputs=[links_path], network=True, volatile=True))
+            stages.append(Stage('box_scores:{0}'.format(year), fetch_box_scores, (links_path, box_scores_path),
+                                deps=['links:{0}'.format(year)], outputs=[box_scores_path], network=True))
+            stages.append(Stage('outcomes:{0}'.format(year), compute_outcomes, (box_scores_path, raw_game_data_path),
+                                deps=['box_scores:{0}'.format(year)], outputs=[raw_game_data_path]))
+            margins_dir = os.path.join(margin_dir, str(year))
+            stages.append(Stage('margins:{0}'.format(year), compute_margins, (year, box_scores_path, margin_dir),
+                                deps=['box_scores:{0}'.format(year)],
+                                outputs=[os.path.join(margins_dir, name) for name in ('columns.json', 'margins.npy')]))
+            players_dir = os.path.join(player_dir, str(year))
+            stages.append(Stage('players:{0}'.format(year), compute_players, (year, box_scores_path, player_dir),
+                                deps=['box_scores:{0}'.format(year)],
+                                outputs=[os.path.join(players_dir, name) for name in ('columns.json', 'box.npy')]))
+        else:
+            stages.append(Stage('outcomes:{0}'.format(year), None, outputs=[raw_game_data_path]))
+
+        stages.append(Stage('aggregates:{0}'.format(year), compute_aggregates,
+                            (raw_game_data_path, counts_path, breakdown_path),
+                            deps=['outcomes:{0}'.format(year)], outputs=[counts_path, breakdown_path]))
+
+    # the stat columns of the counters, so the cross-season stage's inputs are all files.
+    stats_path = os.path.join(build_dir, 'stats.json')
+    stages.append(Stage('frames', compute_frames,
+                        (list(years), counts_paths, raw_game_data, stats_path, tables_dir, store_dir, links_paths),
+                        deps=['aggregates:{0}'.format(year) for year in years] + ['outcomes:{0}'.format(year) for year in years],
+                        outputs=[os.path.join(tables_dir, 'totals.csv'), os.path.join(store_dir, 'meta.json')]))
+    return stages, stats_path
+
+
+class Rebuild(object):
+    """
+    Runs a graph of stages on a process pool, skipping stages whose inputs have not changed since their last run.
+
+    The fingerprints of each stage's inputs and outputs are kept in a manifest, saved after every stage
+    so that an interrupted rebuild keeps the work it finished. The metrics recorded by stages are merged into the
+    process-wide registry.
+
+    :param bool profile: Whether to sample the stacks of every stage, collected in .samples.
+    :param bool trace_memory: Whether to record the peak memory of every stage, as the memory.peak_bytes gauge.
+    """
+    def __init__(self, stages, manifest_path, processes=None, network_slots=1, profile=False, trace_memory=False):
+        self.stages = {stage.name: stage for stage in stages}
+        self.order = [stage.name for stage in stages]
+        self.manifest_path = manifest_path
+        self.processes = processes or mp.cpu_count()
+        self.network_slots = network_slots
+        self.profile = profile
+        self.trace_memory = trace_memory
+
+        self.manifest = {}
+        if os.path.exists(manifest_path):
+            with open(manifest_path) as f:
+                self.manifest = json.load(f)
+
+        self.ran = []
+        self.skipped = []
+        self.samples = Counter()
+
+    def _can_skip(self, stage, input_key):
+        if stage.volatile:
+            return False
+        entry = self.manifest.get(stage.name)
+        return (entry is not None and entry['input'] == input_key and
+                all(os.path.exists(path) for path in stage.outputs))
+
+    def _finish(self, stage, input_key, output):
+        self.manifest[stage.name] = {'input': input_key, 'output': output}
+        write_json(self.manifest_path, self.manifest)
+
+    def run(self):
+        """
+        Run every stage which needs to, and return a dictionary of stage name to output fingerprint.
+        """
+        done = {}
+        running = {}
+        pending = list(self.order)
+        pool = mp.Pool(self.processes)
+        try:
+            while pending or running:
+                for name in list(pending):
+                    stage = self.stages[name]
+                    if not all(dep in done for dep in stage.deps):
+                        continue
+
+                    input_key = stage.input_key(done)
+                    if stage.func is None:
+                        # a source: its outputs are whatever is on disk.
+                        done[name] = fingerprint(stage.outputs)
+                        self._finish(stage, input_key, done[name])
+                        self.skipped.append(name)
+                        pending.remove(name)
+                        continue
+                    if self._can_skip(stage, input_key):
+                        done[name] = self.manifest[name]['output']
+                        self.skipped.append(name)
+                        pending.remove(name)
+                        continue
+
+                    busy_network = sum(1 for other in running if self.stages[other].network)
+                    if stage.network and busy_network >= self.network_slots:
+                        continue
+                    if len(running) >= self.processes:
+                        break
+
+                    logging.info('running %s', name)
+                    result = pool.apply_async(_run_stage, (stage.func, stage.args, stage.outputs,
+                                                           name.split(':')[0], self.profile, self.trace_memory))
+                    running[name] = (result, input_key)
+                    pending.remove(name)
+
+                finished = [name for name, (result, _) in running.iteritems() if result.ready()]
+                if not finished:
+                    time.sleep(0.01)
+                    continue
+
+                for name in finished:
+                    result, input_key = running.pop(name)
+                    output, snapshot, samples = result.get()
+                    get_metrics().merge(snapshot)
+                    self.samples.update(samples or {})
+                    self._finish(self.stages[name], input_key, output)
+                    done[name] = output
+                    self.ran.append(name)
+        finally:
+            pool.terminate()
+            pool.join()
+
+        return done
+
+
+def rebuild(years, scrape=True, processes=None, build_dir=BUILD_DIR, tables_dir=ROOT_DIR, store_dir=STORE_DIR,
+            raw_game_data=RAW_GAME_DATA, margin_dir=MARGIN_DIR, player_dir=PLAYER_DIR, profile=False,
+            trace_memory=False):
+    """
+    Rebuild the given seasons, redoing only the stages whose inputs changed.
+
+    :return: The Rebuild, listing the stages which ran and were skipped.
+    """
+    stages, stats_path = build_stages(years, scrape, build_dir, tables_dir, store_dir, raw_game_data, margin_dir,
+                                      player_dir)
+    if not os.path.exists(stats_path):
+        from pandas import read_csv
+
+        columns = read_csv(raw_game_data.format(years[0]), index_col=0, nrows=1).columns
+        write_json(stats_path, [column for column in columns if column != 'team'])
+
+    runner = Rebuild(stages, os.path.join(build_dir, 'manifest.json'), processes, profile=profile,
+                     trace_memory=trace_memory)
+    runner.run()
+    return runner
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Rebuild season data, redoing only what changed.')
+    parser.add_argument('first', type=int, help='first season to rebuild')
+    parser.add_argument('last', type=int, help='last season to rebuild')
+    parser.add_argument('--no-scrape', dest='scrape', action='store_false',
+                        help='start from the existing raw_game_data_YYYY files instead of scraping')
+    parser.add_argument('--processes', type=int, default=None, help='size of the process pool, defaults to every core')
+    parser.add_argument('--metrics', help='write the metrics of the rebuild to this file, .prom or .json')
+    parser.add_argument('--profile', help='write the sampled stacks of every stage to this file')
+    parser.add_argument('--trace-memory', action='store_true', help='record the peak memory of every stage, or of its worker process')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    runner = rebuild(range(args.first, args.last + 1), args.scrape, args.processes, profile=bool(args.profile),
+                     trace_memory=args.trace_memory)
+    print 'ran {0} stages, skipped {1}'.format(len(runner.ran), len(runner.skipped))
+
+    if args.metrics:
+        get_metrics().write(args.metrics)
+    if args.profile:
+        profiler = SamplingProfiler()
+        profiler.samples = runner.samples
+        profiler.write(args.profile)
+        for function, count in profiler.top(10):
+            print '{0:>8} {1}'.format(count, function)
@@ -0,0 +1,247 @@
+"""
+Compact records of game outcomes.
+
+A game outcome says, for one team in one game, whether the team won (1), lost (0) or tied (0.5) each stat. Rather
+than a dictionary of ~30 stat names per team per game, a GameOutcome keeps a packed array of int8 outcome codes
+(see scraper.store) and a reference to a Schema, the stat order shared by every record built from the same stats.
+Records still read like dictionaries, so code written against the dictionaries keeps working:
+
+    record = scrape_game_data(url)['gsw']
+    record['fg'], record.keys(), record.to_dict()
+
+An OutcomeTable packs many records into a single rows x stats array, and converts to NumPy or a DataFrame in the
+format of the raw_game_data_YYYY files without building a dictionary per row.
+"""
+from array import array
+import threading
+
+import numpy as np
+
+from store import LOST, TIED, WON, to_codes, to_outcomes
+
+OUTCOMES = {WON: 1, LOST: 0, TIED: 0.5}
+
+
+def to_code(outcome):
+    """
+    Convert a single outcome as scraped (0, 0.5 or 1) into its int8 code.
+    """
+    if outcome == 1:
+        return WON
+    if outcome == 0:
+        return LOST
+    return TIED
+
+
+class Schema(object):
+    """
+    An ordered list of stats, shared by every record with the same stats.
+
+    Schemas are interned: Schema.get returns the same object for the same stats, so records of one scrape share a
+    single schema, and it is pickled once per pickled list of records.
+    """
+    __slots__ = ('stats', 'index')
+
+    _schemas = {}
+    _lock = threading.Lock()
+
+    def __init__(self, stats):
+        self.stats = tuple(stats)
+        self.index = {stat: i for i, stat in enumerate(self.stats)}
+
+    @classmethod
+    def get(cls, stats):
+        stats = tuple(stats)
+        with cls._lock:
+            schema = cls._schemas.get(stats)
+            if schema is None:
+                schema = cls._schemas[stats] = cls(stats)
+        return schema
+
+    def __len__(self):
+        return len(self.stats)
+
+    def __reduce__(self):
+        return _get_schema, (self.stats,)
+
+    def __repr__(self):
+        return 'Schema({0!r})'.format(list(self.stats))
+
+
+def _get_schema(stats):
+    return Schema.get(stats)
+
+
+class GameOutcome(object):
+    """
+    The outcome of every stat for one team in one game.
+
+    :param Schema schema: The stats of the record, in the order of codes.
+    :param str team: The team the record is for.
+    :param array codes: An array('b') of outcome codes, one per stat of the schema.
+    """
+    __slots__ = ('schema', 'team', 'codes')
+
+    def __init__(self, schema, team, codes):
+        self.schema = schema
+        self.team = team
+        self.codes = codes
+
+    @classmethod
+    def from_dict(cls, team, outcomes, schema=None):
+        """
+        Build a record from a dictionary mapping stat to outcome (0, 0.5 or 1).
+        """
+        schema = schema or Schema.get(sorted(outcomes))
+        return cls(schema, team, array('b', [to_code(outcomes[stat]) for stat in schema.stats]))
+
+    def __getitem__(self, stat):
+        return OUTCOMES[self.codes[self.schema.index[stat]]]
+
+    def get(self, stat, default=None):
+        if stat not in self.schema.index:
+            return default
+        return self[stat]
+
+    def __contains__(self, stat):
+        return stat in self.schema.index
+
+    def __iter__(self):
+        return iter(self.schema.stats)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def keys(self):
+        return list(self.schema.stats)
+
+    def values(self):
+        return [OUTCOMES[code] for code in self.codes]
+
+    def items(self):
+        return zip(self.schema.stats, self.values())
+
+    def iteritems(self):
+        return iter(self.items())
+
+    def to_dict(self):
+        return dict(self.items())
+
+    def __eq__(self, other):
+        if isinstance(other, GameOutcome):
+            if other.schema is self.schema:
+                return self.team == other.team and self.codes == other.codes
+            return self.team == other.team and self.to_dict() == other.to_dict()
+        if isinstance(other, dict):
+            return self.to_dict() == other
+        return NotImplemented
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+
+    def __reduce__(self):
+        return GameOutcome, (self.schema, self.team, self.codes)
+
+    def __repr__(self):
+        return 'GameOutcome({0!r}, {1!r})'.format(self.team, self.to_dict())
+
+
+class OutcomeTable(object):
+    """
+    Game outcomes packed into a rows x stats int8 array of codes, with the team of each row.
+
+    :param Schema schema: The stats of the columns of codes.
+    :param numpy.ndarray codes: A rows x stats int8 array of outcome codes.
+    :param list teams: The team of each row.
+    """
+    def __init__(self, schema, codes, teams):
+        self.schema = schema
+        self.codes = np.asarray(codes, dtype=np.int8).reshape(-1, len(schema))
+        self.teams = list(teams)
+
+    @classmethod
+    def from_records(cls, records, schema=None):
+        """
+        Pack a list of GameOutcome records. Records with a different schema are reordered to the first record's.
+        """
+        records = list(records)
+        if schema is None:
+            if not records:
+                raise ValueError('a schema is required to pack no records')
+            schema = records[0].schema
+
+        buf = array('b')
+        for record in records:
+            if record.schema is schema:
+                buf.extend(record.codes)
+            else:
+                buf.extend(array('b', [record.codes[record.schema.index[stat]] for stat in schema.stats]))
+
+        codes = np.frombuffer(buf.tostring(), dtype=np.int8).reshape(len(records), len(schema))
+        return cls(schema, codes, [record.team for record in records])
+
+    @classmethod
+    def from_games(cls, games, schema=None):
+        """
+        Pack games as returned by scrape_game_data, dictionaries mapping team name to GameOutcome.
+        The two sides of game n are rows 2n and 2n + 1.
+        """
+        return cls.from_records((record for game in games for record in game.itervalues()), schema)
+
+    @classmethod
+    def from_frame(cls, frame):
+        """
+        Pack a DataFrame in the format of the raw_game_data_YYYY files.
+        """
+        stats = [column for column in frame.columns if column != 'team']
+        return cls(Schema.get(stats), to_codes(frame[stats].values), frame['team'])
+
+    @property
+    def stats(self):
+        return list(self.schema.stats)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, i):
+        return GameOutcome(self.schema, self.teams[i], array('b', self.codes[i].tostring()))
+
+    def __iter__(self):
+        return (self[i] for i in xrange(len(self)))
+
+    def column(self, stat):
+        """
+        Return a view of the outcome codes of a single stat.
+        """
+        return self.codes[:, self.schema.index[stat]]
+
+    def to_array(self, stats=None):
+        """
+        Return a rows x stats float array of outcomes (0, 0.5 or 1), for every stat or the given ones.
+        """
+        if stats is None:
+            return to_outcomes(self.codes)
+        return to_outcomes(self.codes[:, [self.schema.index[stat] for stat in stats]])
+
+    def select(self, rows):
+        """
+        Return a table of the given rows, a boolean mask or an array of positions.
+        """
+        rows = np.asarray(rows)
+        if rows.dtype == bool:
+            rows = np.flatnonzero(rows)
+        return OutcomeTable(self.schema, self.codes[rows], [self.teams[i] for i in rows])
+
+    def to_frame(self):
+        """
+        Return the table as a DataFrame in the format of the raw_game_data_YYYY files.
+        """
+        from pandas import DataFrame
+
+        frame = DataFrame(self.to_array(), columns=self.stats)
+        # stats with no ties are whole numbers, as they are in frames built from dictionaries of outcomes.
+        for i in np.flatnonzero(~(self.codes == TIED).any(axis=0)):
+            frame[self.schema.stats[i]] = frame[self.schema.stats[i]].astype(np.int64)
+        frame['team'] = self.teams
+        return frame[sorted(frame.columns)]
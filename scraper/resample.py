@@ -0,0 +1,206 @@
+"""
+Confidence intervals and p-values of stat importance, by resampling games.
+
+For a set of games (a team's season, say) and every stat:
+
+    win_pct     the win % when the stat was won, with a bootstrap confidence interval
+    gain        the information gain of the stat about the game result (see entropy.gain), with a bootstrap interval
+    p_win_pct   the permutation test p-value of win_pct: the chance of a win % this high if the stat had nothing to
+                do with winning
+    p_gain      the permutation test p-value of gain
+
+Resamples are vectorized: a bootstrap resample is a vector of how many times each game was drawn, and a permutation
+reorders the game results, so the counts of every resample and stat are a single matrix product, and thousands of
+resamples cost a few milliseconds per team season. Team seasons are spread over a process pool.
+
+Use it as:
+
+    report = significance_report(SeasonStore(), resamples=2000)
+
+or:
+
+    python -m scraper.resample 2000 2017 --resamples 2000 --out significance.csv
+"""
+import argparse
+import multiprocessing as mp
+
+import numpy as np
+
+from entropy import _entropy, gain_from_counts
+from store import LOST, WON
+
+RESAMPLES = 1000
+CONFIDENCE = 0.95
+
+
+def _counts(weights, stat_won, stat_lost, won):
+    """
+    Counts of count_outcomes for every resample at once.
+
+    :param numpy.ndarray weights: A resamples x games array of how many times each game is counted, or None when
+        every game is counted once.
+    :param numpy.ndarray won: The game results, a games array, or a resamples x games array of permuted results.
+    """
+    won = np.asarray(won, dtype=float)
+    if weights is None:
+        # permuted results: every game is counted once, and the results vary by resample.
+        won_stat = stat_won.sum(axis=0)
+        lost_stat = stat_lost.sum(axis=0)
+        won_wins = won.dot(stat_won)
+        lost_wins = won.dot(stat_lost)
+    else:
+        won_stat = weights.dot(stat_won)
+        lost_stat = weights.dot(stat_lost)
+        won_wins = weights.dot(stat_won * won[:, None])
+        lost_wins = weights.dot(stat_lost * won[:, None])
+    return {
+        'won': np.broadcast_to(won_stat, won_wins.shape),
+        'lost': np.broadcast_to(lost_stat, lost_wins.shape),
+        'won_wins': won_wins,
+        'won_losses': won_stat - won_wins,
+        'lost_wins': lost_wins,
+        'lost_losses': lost_stat - lost_wins,
+    }
+
+
+def _gain(counts):
+    """
+    The information gain of gain_from_counts without its rounding, which resamples do not need.
+    """
+    total = counts['won'] + counts['lost']
+    segments = np.zeros(total.shape)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for segment, wins, losses in (('lost', 'lost_wins', 'lost_losses'), ('won', 'won_wins', 'won_losses')):
+            segments += np.where(total > 0, counts[segment] / total, 0.0) * _entropy(counts[wins], counts[losses])
+    return _entropy(counts['won_wins'] + counts['lost_wins'], counts['won_losses'] + counts['lost_losses']) - segments
+
+
+def _bootstrap_weights(random, resamples, games):
+    """
+    Return a resamples x games array of how many times each game was drawn, for resamples of games drawn with
+    replacement.
+    """
+    draws = random.randint(0, games, size=(resamples, games)) + (np.arange(resamples) * games)[:, None]
+    return np.bincount(draws.ravel(), minlength=resamples * games).reshape(resamples, games).astype(float)
+
+
+def _win_pct(counts):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return counts['won_wins'] / counts['won']
+
+
+def resample_stats(outcomes, won, stats, resamples=RESAMPLES, confidence=CONFIDENCE, seed=None):
+    """
+    Bootstrap confidence intervals and permutation p-values of the win % when each stat was won, and of its gain.
+
+    :param numpy.ndarray outcomes: A games x stats array of outcome codes: LOST, WON or TIED.
+    :param numpy.ndarray won: Whether each game was won.
+    :param list stats: The stat of each column of outcomes.
+    :param int resamples: The number of bootstrap resamples, and of permutations.
+    :param float confidence: The confidence level of the intervals.
+    :param int seed: Seed of the random resamples.
+    :return: A DataFrame with a row per stat.
+    """
+    from pandas import DataFrame
+
+    random = np.random.RandomState(seed)
+    outcomes = np.asarray(outcomes)
+    won = np.asarray(won, dtype=bool)
+    stat_won = (outcomes == WON).astype(float)
+    stat_lost = (outcomes == LOST).astype(float)
+    games = len(outcomes)
+
+    observed = _counts(np.ones((1, games)), stat_won, stat_lost, won)
+    win_pct = _win_pct(observed)[0]
+    gain = _gain(observed)[0]
+
+    # bootstrap: every resample counts each game the number of times it was drawn.
+    bootstrap = _counts(_bootstrap_weights(random, resamples, games), stat_won, stat_lost, won)
+    tail = 100 * (1 - confidence) / 2
+    with np.errstate(invalid='ignore'):
+        win_pct_low, win_pct_high = np.nanpercentile(_win_pct(bootstrap), [tail, 100 - tail], axis=0)
+    gain_low, gain_high = np.percentile(_gain(bootstrap), [tail, 100 - tail], axis=0)
+
+    # permutations: the game results are shuffled, leaving how often each stat was won unchanged.
+    order = np.argsort(random.rand(resamples, games), axis=1)
+    permuted = _counts(None, stat_won, stat_lost, won[order])
+    with np.errstate(invalid='ignore'):
+        p_win_pct = ((_win_pct(permuted) >= win_pct - 1e-12).sum(axis=0) + 1.0) / (resamples + 1)
+    p_gain = ((_gain(permuted) >= gain - 1e-12).sum(axis=0) + 1.0) / (resamples + 1)
+
+    frame = DataFrame({
+        'games': games,
+        'win_pct': win_pct, 'win_pct_low': win_pct_low, 'win_pct_high': win_pct_high, 'p_win_pct': p_win_pct,
+        'gain': gain_from_counts(observed)[1][0], 'gain_low': gain_low, 'gain_high': gain_high, 'p_gain': p_gain,
+    }, index=list(stats), columns=['games', 'win_pct', 'win_pct_low', 'win_pct_high', 'p_win_pct',
+                                   'gain', 'gain_low', 'gain_high', 'p_gain'])
+    frame.index.name = 'stat'
+    return frame
+
+
+def _resample_group(args):
+    from store import SeasonStore
+
+    directory, year, team, resamples, confidence, seed = args
+    store = SeasonStore(directory)
+    stats = [stat for stat in store.stats if stat != 'win']
+    outcomes = np.asarray(store.season(year).outcomes_for(team))
+    frame = resample_stats(outcomes[:, [store.stat_index(stat) for stat in stats]],
+                           outcomes[:, store.stat_index('win')] == WON, stats, resamples, confidence, seed)
+    frame['season'] = year
+    frame['team'] = team or 'league'
+    return frame.reset_index()
+
+
+def significance_report(store, years=None, teams=None, resamples=RESAMPLES, confidence=CONFIDENCE, processes=None,
+                        seed=0):
+    """
+    Resample every team season of a store (and every whole season, as team 'league') on a process pool.
+
+    :param list years: The seasons, defaulting to all of them.
+    :param list teams: The teams, defaulting to every team of the store.
+    :param int seed: Seed of the resamples. Each team season is seeded from it, so reports are reproducible
+        whatever the number of processes.
+    :return: A DataFrame with a row per season, team and stat.
+    """
+    from pandas import concat
+
+    years = store.seasons if years is None else years
+    teams = store.teams if teams is None else teams
+    groups = []
+    for year in years:
+        season = store.season(year)
+        groups.append((year, None))
+        groups.extend((year, team) for team in teams if season.team_rows(team).stop > season.team_rows(team).start)
+
+    tasks = [(store.directory, year, team, resamples, confidence, seed + i) for i, (year, team) in enumerate(groups)]
+    pool = mp.Pool(processes or mp.cpu_count())
+    try:
+        frames = pool.map(_resample_group, tasks)
+    finally:
+        pool.terminate()
+        pool.join()
+
+    columns = ['season', 'team', 'stat']
+    report = concat(frames, ignore_index=True)
+    return report[columns + [column for column in report.columns if column not in columns]]
+
+
+if __name__ == '__main__':
+    from store import SeasonStore
+
+    parser = argparse.ArgumentParser(description='Confidence intervals and p-values of stat importance.')
+    parser.add_argument('first', type=int, nargs='?', help='first season, defaults to every season')
+    parser.add_argument('last', type=int, nargs='?', help='last season')
+    parser.add_argument('--resamples', type=int, default=RESAMPLES)
+    parser.add_argument('--confidence', type=float, default=CONFIDENCE)
+    parser.add_argument('--processes', type=int, default=None)
+    parser.add_argument('--out', default='significance.csv', help='where to write the report')
+    args = parser.parse_args()
+
+    store = SeasonStore()
+    years = range(args.first, (args.last or args.first) + 1) if args.first else store.seasons
+    report = significance_report(store, years, resamples=args.resamples, confidence=args.confidence,
+                                 processes=args.processes)
+    report.to_csv(args.out, index=False)
+    print 'wrote {0} rows to {1}'.format(len(report), args.out)
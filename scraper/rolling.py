@@ -0,0 +1,230 @@
+"""
+Rolling-window stat importance: the win % when each stat was won over a team's last N games, and league-wide.
+
+Windows are kept as sliding counters. A window holds, for its last N games, whether each stat was won and whether it
+was won in a win, in a ring buffer, along with their running sums; adding a game replaces the oldest game's entry and
+updates the sums, so it costs the same however long the window or the season.
+
+    index = RollingIndex.from_store(store, 2017, window=10)   # the windows as of the end of the season so far
+    index.add('gsw', outcomes, won)                           # a game just played
+    index.win_pct('gsw')                                      # win % when each stat was won, last 10 games
+    index.win_pct()                                           # league-wide, the last 10 games played in the league
+
+Whole rolling series are made in one vectorized pass from cumulative sums, every team of every season at once:
+
+    series = backfill(store, window=10)                       # a row per team game, with each stat's win %
+
+or:
+
+    python -m scraper.rolling 10 --out rolling_10.csv
+
+Windows do not carry over from one season to the next. A league-wide window of N games is the last N games played in
+the whole league, whichever teams played them, i.e. the last 2N team rows of the season in the order games were
+scraped.
+"""
+import argparse
+
+import numpy as np
+
+from store import WON
+
+
+class RollingCounts(object):
+    """
+    Sliding counters of the last window games of a team, or of the league.
+
+    :param int window: The number of games in the window.
+    :param int n_stats: The number of stats counted.
+    """
+    def __init__(self, window, n_stats):
+        self.window = window
+        self.games = 0
+        # ring buffers: whether each stat was won, and won in a win, in each of the last window games.
+        self._won = np.zeros((window, n_stats), dtype=np.int32)
+        self._won_wins = np.zeros((window, n_stats), dtype=np.int32)
+        self._wins = np.zeros(window, dtype=np.int32)
+        self.won = np.zeros(n_stats, dtype=np.int64)
+        self.won_wins = np.zeros(n_stats, dtype=np.int64)
+        self.wins = 0
+
+    def push(self, outcomes, won):
+        """
+        Add a game, dropping the oldest one once the window is full.
+
+        :param numpy.ndarray outcomes: The outcome codes of the game's stats: LOST, WON or TIED.
+        :param bool won: Whether the game was won.
+        """
+        slot = self.games % self.window
+        stat_won = np.asarray(outcomes) == WON
+        self.won += stat_won - self._won[slot]
+        self.won_wins += stat_won * won - self._won_wins[slot]
+        self.wins += int(won) - self._wins[slot]
+        self._won[slot] = stat_won
+        self._won_wins[slot] = stat_won * won
+        self._wins[slot] = won
+        self.games += 1
+
+    def __len__(self):
+        return min(self.games, self.window)
+
+    def win_pct(self):
+        """
+        Return the win % when each stat was won in the window, NaN for stats not won in it.
+        """
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return self.won_wins / self.won.astype(float)
+
+    def base_pct(self):
+        """
+        Return the win % over every game of the window.
+        """
+        return self.wins / float(len(self)) if self.games else float('nan')
+
+
+class RollingIndex(object):
+    """
+    Sliding windows of every team of a season, and of the league.
+
+    :param list stats: The stat of each column of the outcomes added, without the game result.
+    :param int window: The number of games of each team's window; the league's window holds the last window games of
+        the league, i.e. 2 * window team rows.
+    """
+    def __init__(self, stats, window):
+        self.stats = list(stats)
+        self.window = window
+        self.teams = {}
+        self.league = RollingCounts(2 * window, len(self.stats))
+
+    @classmethod
+    def from_store(cls, store, year, window):
+        """
+        Return the windows of every team at the end of a season of the store.
+        """
+        stats = [stat for stat in store.stats if stat != 'win']
+        columns = [store.stat_index(stat) for stat in stats]
+        season = store.season(year)
+        outcomes = np.asarray(season.outcomes)
+        won = outcomes[:, store.stat_index('win')] == WON
+        rows = np.asarray(season.row)
+        teams = np.asarray(store.teams)[np.asarray(season.team)]
+
+        index = cls(stats, window)
+        # only the last games of each window are kept, so only those are added.
+        order = np.argsort(rows, kind='mergesort')
+        for i in order[-2 * window:]:
+            index.league.push(outcomes[i, columns], won[i])
+        for team in np.unique(teams):
+            for i in np.flatnonzero(teams[order] == team)[-window:]:
+                index._team(team).push(outcomes[order[i], columns], won[order[i]])
+        return index
+
+    def _team(self, team):
+        if team not in self.teams:
+            self.teams[team] = RollingCounts(self.window, len(self.stats))
+        return self.teams[team]
+
+    def add(self, team, outcomes, won):
+        """
+        Add a game of a team.
+
+        :param numpy.ndarray outcomes: The outcome codes of the game's stats, in the order of stats.
+        :param bool won: Whether the team won.
+        """
+        self._team(team).push(outcomes, won)
+        self.league.push(outcomes, won)
+
+    def counts(self, team=None):
+        return self.league if team is None else self.teams[team]
+
+    def win_pct(self, team=None):
+        """
+        Return a dictionary of the win % when each stat was won in the window of a team, or of the league.
+        """
+        return dict(zip(self.stats, self.counts(team).win_pct()))
+
+
+def rolling_sums(values, groups, order, window):
+    """
+    Sum values over a sliding window of rows within each group, for every row at once.
+
+    :param numpy.ndarray values: A rows x columns array.
+    :param numpy.ndarray groups: The group of each row. Windows do not cross groups.
+    :param numpy.ndarray order: The position of each row in time; windows hold a row and the rows before it.
+    :param int window: The number of rows in a window.
+    :return: A tuple of the rows x columns sums and the number of rows in each row's window.
+    """
+    values = np.asarray(values)
+    sort = np.lexsort((order, groups))
+    sorted_groups = np.asarray(groups)[sort]
+
+    # cumulative sums with a leading zero row: the sum of rows [a, b) is sums[b] - sums[a].
+    sums = np.zeros((len(values) + 1,) + values.shape[1:], dtype=np.int64)
+    np.cumsum(values[sort], axis=0, out=sums[1:])
+
+    position = np.arange(len(values))
+    is_first = np.concatenate([[True], sorted_groups[1:] != sorted_groups[:-1]]) if len(values) else position == 0
+    group_start = np.maximum.accumulate(np.where(is_first, position, 0))
+    start = np.maximum(group_start, position + 1 - window)
+
+    result = np.empty_like(sums[1:])
+    result[sort] = sums[position + 1] - sums[start]
+    games = np.empty(len(values), dtype=np.int64)
+    games[sort] = position + 1 - start
+    return result, games
+
+
+def backfill(store, window, years=None, league=False):
+    """
+    Make the rolling series of every team game of the given seasons (defaulting to all of them) in one pass.
+
+    :param int window: The number of games of each window.
+    :param bool league: Whether to give the league's window as of each game, the last window games of the league (2 *
+        window team rows), rather than the team's.
+    :return: A DataFrame with a row per team game, in the order played: season, team, row, games (in the window),
+        base_pct and the win % when each stat was won.
+    """
+    from pandas import DataFrame
+
+    stats = [stat for stat in store.stats if stat != 'win']
+    columns = [store.stat_index(stat) for stat in stats]
+    seasons = [store.season(year) for year in (store.seasons if years is None else years)]
+    outcomes = np.concatenate([np.asarray(season.outcomes) for season in seasons])
+    year = np.concatenate([np.full(len(season), season.year, dtype=np.int32) for season in seasons])
+    teams = np.concatenate([np.asarray(season.team, dtype=np.intp) for season in seasons])
+    rows = np.concatenate([np.asarray(season.row) for season in seasons])
+    won = outcomes[:, store.stat_index('win')] == WON
+
+    # every season's teams (or league) are groups of their own, so windows restart with each season.
+    season_code = np.unique(year, return_inverse=True)[1]
+    groups = season_code if league else season_code * len(store.teams) + teams
+    stat_won = outcomes[:, columns] == WON
+    values = np.hstack([stat_won, stat_won & won[:, None], won[:, None]])
+    sums, games = rolling_sums(values, groups, rows, 2 * window if league else window)
+
+    n_stats = len(stats)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        win_pct = sums[:, n_stats:2 * n_stats] / sums[:, :n_stats].astype(float)
+        base_pct = sums[:, -1] / games.astype(float)
+
+    frame = DataFrame(win_pct, columns=stats)
+    frame.insert(0, 'season', year)
+    frame.insert(1, 'team', np.asarray(store.teams)[teams])
+    frame.insert(2, 'row', rows)
+    frame.insert(3, 'games', games)
+    frame.insert(4, 'base_pct', base_pct)
+    return frame.sort_values(['season', 'row'], kind='mergesort').reset_index(drop=True)
+
+
+if __name__ == '__main__':
+    from store import SeasonStore
+
+    parser = argparse.ArgumentParser(description='Rolling win % when each stat was won, over the last N games.')
+    parser.add_argument('window', type=int, help='number of games in the window')
+    parser.add_argument('--league', action='store_true', help='the window of the last N games of the whole league '
+                        '(2N team rows) rather than each team\'s')
+    parser.add_argument('--out', default='rolling.csv', help='where to write the series')
+    args = parser.parse_args()
+
+    series = backfill(SeasonStore(), args.window, league=args.league)
+    series.to_csv(args.out, index=False)
+    print 'wrote {0} rows to {1}'.format(len(series), args.out)
@@ -0,0 +1,307 @@
+"""
+Read-only HTTP service answering stat importance, win probability and gain of any team and seasons.
+
+Everything is answered from data loaded when the service starts: the team and matchup counters of every season of
+the store (see aggregates.TeamCounts and matchups.MatchupCounts) and, if there is one, the margin store (see
+margins.MarginStore). Nothing is scraped or read from disk while serving, and encoded responses are kept in an
+in-process cache, so a repeated query costs a dictionary lookup.
+
+    GET /teams                                          the teams, seasons and stats of the store
+    GET /stats?team=gsw&seasons=2015-2017               every stat's counts, win_pct, base_pct, adj_pct, tie_rate
+                                                        and gain (TeamCounts.table)
+    GET /importance?team=gsw&seasons=2017               stat importance, as TeamScraper.stat_importance
+    GET /win_probability?stat=ast&thresholds=0,3,5      win % when winning a stat by each margin (needs margins)
+    GET /head_to_head?team=gsw&opponent=cle             every stat's summary of a team against an opponent
+    GET /by_strength?team=gsw&bins=0,.4,.6,1            win % when each stat was won, by bin of opponent win %
+                                                        (see matchups.MatchupCounts)
+    GET /metrics                                        the process' metrics, in the Prometheus text format
+
+team defaults to the whole league and seasons (a season, a range first-last, or a comma separated list) to every
+season. stats restricts /stats to some stats, as a comma separated list.
+
+Requests are served on a thread each, over keep-alive connections. Use it as:
+
+    python -m scraper.service --port 8040
+
+or, in process:
+
+    with ServiceServer(QueryService(SeasonStore())) as server:
+        requests.get(server.url + '/stats?team=gsw')
+"""
+import argparse
+import BaseHTTPServer
+import json
+import logging
+import os
+import threading
+import time
+from SocketServer import ThreadingMixIn
+from urlparse import parse_qsl, urlparse
+
+import numpy as np
+
+from aggregates import TeamCounts
+from cache import LRUCache
+from config import MARGIN_DIR, SERVICE_CACHE_BYTES, SERVICE_PORT
+from matchups import MatchupCounts
+from metrics import get_metrics
+
+# responses never change while the service runs: the data is loaded once.
+NEVER = float('inf')
+
+
+def _finite(value):
+    """
+    Return a response with NaN and infinite numbers (e.g. the win % of no games) replaced by None, encoded as null.
+    """
+    if isinstance(value, float):
+        return value if np.isfinite(value) else None
+    if isinstance(value, dict):
+        return {key: _finite(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_finite(item) for item in value]
+    return value
+
+
+class QueryError(Exception):
+    """
+    A query which cannot be answered, with the HTTP status to answer it with.
+    """
+    def __init__(self, status, message):
+        super(QueryError, self).__init__(message)
+        self.status = status
+
+
+class QueryService(object):
+    """
+    Answers queries from the counters of a season store, and optionally a margin store, loaded into memory.
+
+    :param SeasonStore store: The season store.
+    :param MarginStore margins: The margin store, or None to not answer win probability queries.
+    :param int cache_bytes: Size of the cache of encoded responses.
+    """
+    ROUTES = ('teams', 'stats', 'importance', 'win_probability', 'head_to_head', 'by_strength')
+
+    def __init__(self, store, margins=None, cache_bytes=SERVICE_CACHE_BYTES):
+        self.store = store
+        self.counts = TeamCounts(store)
+        self.matchups = MatchupCounts(store)
+        for year in store.seasons:
+            self.counts.get(year)
+            self.matchups.get(year)
+
+        self.margins = margins
+        if margins is not None:
+            for year in margins.seasons:
+                season = margins.season(year)
+                season.margins = np.array(season.margins)
+                season.team = np.array(season.team)
+
+        self.cache = LRUCache(cache_bytes)
+
+    def _seasons(self, params):
+        value = params.get('seasons')
+        if not value:
+            return None
+        try:
+            if '-' in value:
+                first, last = value.split('-')
+                years = range(int(first), int(last) + 1)
+            else:
+                years = [int(year) for year in value.split(',')]
+        except ValueError:
+            raise QueryError(400, 'seasons must be a season, a range first-last or a list: {0}'.format(value))
+        if not years:
+            raise QueryError(400, 'seasons must not be empty or a reversed range: {0}'.format(value))
+        missing = [year for year in years if year not in self.store.seasons]
+        if missing:
+            raise QueryError(404, 'seasons not in the store: {0}'.format(missing))
+        return years
+
+    def _team(self, params, name='team'):
+        team = params.get(name) or None
+        if team is not None and team not in self.store.teams:
+            raise QueryError(404, 'unknown team: {0}'.format(team))
+        return team
+
+    def _stats(self, params, name='stats'):
+        if not params.get(name):
+            return None
+        stats = params[name].split(',')
+        unknown = [stat for stat in stats if stat not in self.store.stats]
+        if unknown:
+            raise QueryError(404, 'unknown stats: {0}'.format(unknown))
+        return stats
+
+    def teams(self, params):
+        return {'teams': self.store.teams, 'seasons': self.store.seasons, 'stats': self.store.stats}
+
+    def stats(self, params):
+        team, years = self._team(params), self._seasons(params)
+        frame = self.counts.table(team, years, self._stats(params))
+        return {'team': team, 'seasons': years or self.store.seasons,
+                'stats': json.loads(frame.reset_index().to_json(orient='records'))}
+
+    def importance(self, params):
+        team, years = self._team(params), self._seasons(params)
+        result = self.counts.importance(team, years)
+        result['seasons'] = years or self.store.seasons
+        return result
+
+    def win_probability(self, params):
+        if self.margins is None:
+            raise QueryError(404, 'the service has no margin store')
+        team, years = self._team(params), self._seasons(params)
+        years = [year for year in years or self.store.seasons if year in self.margins.seasons]
+        stat = params.get('stat')
+        if not stat:
+            raise QueryError(400, 'stat is required')
+        if not years or stat not in self.margins.season(years[0]).stats:
+            raise QueryError(404, 'no margins of {0} in seasons {1}'.format(stat, years))
+        thresholds = None
+        if params.get('thresholds'):
+            try:
+                thresholds = [float(value) for value in params['thresholds'].split(',')]
+            except ValueError:
+                raise QueryError(400, 'thresholds must be numbers: {0}'.format(params['thresholds']))
+
+        frame = self.margins.win_probability(stat, thresholds, years, team)
+        return {'stat': stat, 'team': team, 'seasons': years,
+                'thresholds': json.loads(frame.to_json(orient='records'))}
+
+    def head_to_head(self, params):
+        team, opponent, years = self._team(params), self._team(params, 'opponent'), self._seasons(params)
+        if team is None or opponent is None:
+            raise QueryError(400, 'team and opponent are required')
+        if team == opponent:
+            raise QueryError(400, 'a team does not play itself: {0}'.format(team))
+        frame = self.matchups.head_to_head(team, opponent, years, self._stats(params))
+        return {'team': team, 'opponent': opponent, 'seasons': years or self.store.seasons,
+                'stats': json.loads(frame.reset_index().to_json(orient='records'))}
+
+    def by_strength(self, params):
+        team, years = self._team(params), self._seasons(params)
+        kwargs = {}
+        if params.get('bins'):
+            try:
+                kwargs['bins'] = [float(value) for value in params['bins'].split(',')]
+            except ValueError:
+                raise QueryError(400, 'bins must be numbers: {0}'.format(params['bins']))
+            if len(kwargs['bins']) < 2:
+                raise QueryError(400, 'bins must have at least two edges')
+            if (np.diff(kwargs['bins']) <= 0).any():
+                raise QueryError(400, 'bins must be increasing: {0}'.format(params['bins']))
+        frame = self.matchups.by_strength(team, years=years, stats=self._stats(params), **kwargs)
+        return {'team': team, 'seasons': years or self.store.seasons,
+                'bins': json.loads(frame.to_json(orient='records'))}
+
+    def query(self, route, params):
+        """
+        Answer a query, from the cache if it was answered before.
+
+        :param str route: One of ROUTES.
+        :param dict params: The query parameters.
+        :return: A tuple of the HTTP status and the encoded JSON response.
+        """
+        if route not in self.ROUTES:
+            return 404, json.dumps({'error': 'unknown route: /{0}'.format(route)})
+
+        key = '{0}?{1}'.format(route, sorted(params.items()))
+        body = self.cache.get(key)
+        if body is not None:
+            get_metrics().increment('service.cache', result='hit')
+            return 200, body
+        get_metrics().increment('service.cache', result='miss')
+
+        try:
+            body = json.dumps(_finite(getattr(self, route)(params)), separators=(',', ':'), allow_nan=False)
+        except QueryError as e:
+            return e.status, json.dumps({'error': str(e)})
+        except Exception:
+            logging.exception('failed to answer /%s?%s', route, params)
+            return 500, json.dumps({'error': 'internal error answering /{0}'.format(route)})
+        self.cache.set(key, body, NEVER)
+        return 200, body
+
+
+class ServiceHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    # keep-alive, so dashboards and load tests reuse their connections.
+    protocol_version = 'HTTP/1.1'
+    # the status line, headers and body go out in a single write, flushed after each request, rather than a packet
+    # each held back by Nagle's algorithm until the client acknowledges the last.
+    wbufsize = -1
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        start = time.time()
+        url = urlparse(self.path)
+        route = url.path.strip('/')
+        if route == 'metrics':
+            status, body, content_type = 200, get_metrics().to_prometheus(), 'text/plain; version=0.0.4'
+        else:
+            status, body = self.server.service.query(route, dict(parse_qsl(url.query)))
+            content_type = 'application/json'
+
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+        metrics = get_metrics()
+        metrics.increment('service.requests', route=route, status=status)
+        metrics.observe('service.latency_seconds', time.time() - start, route=route)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _Server(ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+    # room for many clients connecting at once.
+    request_queue_size = 128
+
+
+class ServiceServer(object):
+    """
+    Serve a QueryService on a local port, in a background thread.
+    """
+    def __init__(self, service, host='127.0.0.1', port=0):
+        self.httpd = _Server((host, port), ServiceHandler)
+        self.httpd.service = service
+        self._thread = None
+
+    @property
+    def url(self):
+        return 'http://{0}:{1}'.format(*self.httpd.server_address)
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+if __name__ == '__main__':
+    from margins import MarginStore
+    from store import SeasonStore
+
+    parser = argparse.ArgumentParser(description='Serve stat importance, win probability and gain over HTTP.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=SERVICE_PORT)
+    args = parser.parse_args()
+
+    margins = MarginStore() if os.path.isdir(MARGIN_DIR) else None
+    server = ServiceServer(QueryService(SeasonStore(), margins), args.host, args.port)
+    print 'serving on {0}'.format(server.url)
+    server.httpd.serve_forever()
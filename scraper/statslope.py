@@ -0,0 +1,108 @@
+"""
+The data bundle of the statslope trend page: the win % of teams which won each stat, every season.
+
+The bundle is made from the season counters of the store (see aggregates.SeasonCounts), laid out the way the page
+draws it, so the page does no reshaping or sorting of its own:
+
+    {
+        "years":  [2000, ..., 2017],
+        "stats":  ["ts_pct", "efg_pct", ...],         sorted by win % in the last season, highest first
+        "values": [[0.8347, ...], ...],               per stat, the win % of each season
+        "ranks":  [[1, ...], ...],                    per stat, its rank among the stats in each season, from 1
+        "slopes": [0.0007, ...]                       per stat, the least squares change in win % per season
+    }
+
+It is written as statslope/data.json, and gzipped beside it as data.json.gz for servers which serve precompressed
+files. Browsers do not let a page opened from file:// fetch data.json, so it is also written as data.js, a script
+setting STATSLOPE_DATA, which trend.html includes.
+
+Use it as:
+
+    write_bundle(SeasonCounts(SeasonStore()).tables())
+
+or:
+
+    python -m scraper.statslope
+"""
+import argparse
+import gzip
+import json
+import os
+from StringIO import StringIO
+
+import numpy as np
+
+from config import ROOT_DIR, STATS
+from store import write_bytes
+
+BUNDLE = 'data.json'
+SCRIPT = 'data.js'
+
+
+def bundle(seasons, stats=STATS):
+    """
+    Make the bundle of the trend page.
+
+    :param seasons: Counts of each season, as {year: {stat: {count: value}}}, or aggregates.SeasonTables.
+    :param list stats: The stats of the page.
+    :return: The bundle, as a dictionary of columns.
+    """
+    from aggregates import win_pcts
+
+    values = win_pcts(seasons, stats).sort_index()
+    years = [int(year) for year in values.index]
+    # highest win % in the last season first; ties keep the order of stats.
+    order = np.argsort(-values.values[-1], kind='mergesort')
+    values = values.iloc[:, order]
+
+    # rank of every stat within each season, 1 for the highest win %.
+    ranks = np.argsort(np.argsort(-values.values, axis=1, kind='mergesort'), axis=1, kind='mergesort') + 1
+    if len(years) > 1:
+        slopes = np.polyfit(years, values.values, 1)[0]
+    else:
+        slopes = np.zeros(len(values.columns))
+
+    return {
+        'years': years,
+        'stats': list(values.columns),
+        'values': values.values.T.tolist(),
+        'ranks': ranks.T.tolist(),
+        'slopes': [round(slope, 6) for slope in slopes],
+    }
+
+
+def _write(path, data, compress=False):
+    if compress:
+        buf = StringIO()
+        with gzip.GzipFile(fileobj=buf, mode='wb', compresslevel=9, mtime=0) as gz:
+            gz.write(data)
+        data = buf.getvalue()
+    write_bytes(path, data)
+
+
+def write_bundle(seasons, directory=os.path.join(ROOT_DIR, 'statslope'), stats=STATS):
+    """
+    Write the bundle of the trend page, its gzipped copy and its script, to directory.
+
+    :param seasons: Counts of each season, as {year: {stat: {count: value}}}, or aggregates.SeasonTables.
+    :return: The path of the bundle.
+    """
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    data = json.dumps(bundle(seasons, stats), sort_keys=True, separators=(',', ':'))
+    path = os.path.join(directory, BUNDLE)
+    _write(path + '.gz', data, compress=True)
+    _write(os.path.join(directory, SCRIPT), 'var STATSLOPE_DATA = {0};\n'.format(data))
+    _write(path, data)
+    return path
+
+
+if __name__ == '__main__':
+    from aggregates import SeasonCounts
+    from store import SeasonStore
+
+    parser = argparse.ArgumentParser(description='Write the data bundle of the statslope trend page.')
+    parser.add_argument('--out', default=os.path.join(ROOT_DIR, 'statslope'), help='directory to write it to')
+    args = parser.parse_args()
+
+    print 'wrote {0}'.format(write_bundle(SeasonCounts(SeasonStore()).tables(), args.out))
@@ -0,0 +1,374 @@
+"""
+Columnar, memory-mapped store of per-game stat outcomes, one directory per season.
+
+Layout:
+
+    season_store/
+        meta.json           stats (column order of outcomes), teams (dictionary of team codes), seasons
+        team_diffs.npy      all_diff_data.p as a teams x stats float array, described in meta.json
+        2017/
+            outcomes.npy    int8, rows x stats: LOST (0), WON (1) or TIED (-1)
+            team.npy        int8 team code of each row
+            row.npy         int32 position of each row in the season, in the order games were scraped.
+                            The two sides of a game are rows 2n and 2n + 1.
+            offsets.npy     int32, rows of team code t are offsets[t]:offsets[t + 1]
+            links.json      box score links ingested so far, in schedule order (seasons scraped incrementally)
+            counts.npy      per-stat counters of the season's outcomes, see scraper.aggregates
+            team_counts.npy per-team, per-stat counters of the season's outcomes, see scraper.aggregates
+            opponent.npy    int8 team code of the opponent of each row, see scraper.matchups
+            matchup_counts.npy  per-team, per-opponent, per-stat counters of the season's outcomes
+
+Rows of a season are sorted by team, so the games of a single team are a contiguous, zero-copy slice.
+
+Use it as:
+
+    store = SeasonStore()
+    outcomes = store.season(2017).outcomes_for('gsw')
+"""
+import argparse
+import json
+import os
+import pickle
+import shutil
+import tempfile
+
+import numpy as np
+
+from config import DIFF_DATA, RAW_GAME_DATA, SEASONS, STORE_DIR
+
+LOST, WON, TIED = 0, 1, -1
+
+VERSION = 1
+
+# files derived from a season's outcomes, removed when the season is replaced.
+DERIVED = ('counts.npy', 'team_counts.npy', 'opponent.npy', 'matchup_counts.npy')
+
+
+def to_codes(outcomes):
+    """
+    Convert outcomes as scraped (0, 0.5 or 1) into int8 codes.
+    """
+    outcomes = np.asarray(outcomes, dtype=float)
+    codes = np.full(outcomes.shape, TIED, dtype=np.int8)
+    codes[outcomes == 1] = WON
+    codes[outcomes == 0] = LOST
+    return codes
+
+
+def to_outcomes(codes):
+    """
+    Convert int8 codes back into outcomes as scraped (0, 0.5 or 1).
+    """
+    return np.where(codes == TIED, 0.5, codes).astype(float)
+
+
+def save_array(path, array):
+    """
+    Write an array to path atomically, so readers mapping the old file are not disturbed.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+    with os.fdopen(fd, 'wb') as f:
+        np.save(f, array)
+    os.rename(tmp_path, path)
+
+
+def write_bytes(path, data):
+    """
+    Write a string to path atomically, so readers see either the old file or the whole new one.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+    with os.fdopen(fd, 'wb') as f:
+        f.write(data)
+    os.rename(tmp_path, path)
+
+
+def write_json(path, value, **kwargs):
+    """
+    Write a value to path as JSON atomically. Keyword arguments are passed on to json.dumps.
+    """
+    write_bytes(path, json.dumps(value, **kwargs))
+
+
+class Season(object):
+    """
+    A single season of the store. Columns are memory-mapped on first access.
+    """
+    COLUMNS = ('outcomes', 'team', 'row', 'offsets')
+
+    def __init__(self, store, year):
+        self.store = store
+        self.year = year
+        self.directory = os.path.join(store.directory, str(year))
+
+    def __getattr__(self, name):
+        if name not in self.COLUMNS:
+            raise AttributeError(name)
+        column = np.load(os.path.join(self.directory, name + '.npy'), mmap_mode='r')
+        setattr(self, name, column)
+        return column
+
+    def __len__(self):
+        return len(self.team)
+
+    @property
+    def links(self):
+        """
+        The box score links ingested into this season, or None if the season was converted from a csv.
+        """
+        path = os.path.join(self.directory, 'links.json')
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return json.load(f)
+
+    def team_rows(self, team):
+        """
+        Return the slice of rows holding the given team's games.
+        """
+        code = self.store.team_code(team)
+        if code + 1 >= len(self.offsets):
+            return slice(0, 0)
+        return slice(int(self.offsets[code]), int(self.offsets[code + 1]))
+
+    def outcomes_for(self, team=None):
+        """
+        Return a zero-copy view of the games x stats outcome codes, for every team or a single team.
+        """
+        if team is None:
+            return self.outcomes
+        return self.outcomes[self.team_rows(team)]
+
+    def column(self, stat, team=None):
+        """
+        Return a zero-copy view of the outcome codes of a single stat.
+        """
+        return self.outcomes_for(team)[:, self.store.stat_index(stat)]
+
+    def to_frame(self):
+        """
+        Return the season as a DataFrame in the format of the raw_game_data_YYYY files.
+        """
+        from pandas import DataFrame
+
+        order = np.argsort(self.row, kind='mergesort')
+        frame = DataFrame(to_outcomes(self.outcomes[order]), columns=self.store.stats)
+        frame['team'] = np.asarray(self.store.teams)[self.team[order]]
+        return frame[sorted(frame.columns)]
+
+
+class SeasonStore(object):
+    """
+    Read access to a season store directory.
+    """
+    def __init__(self, directory=STORE_DIR):
+        self.directory = directory
+        with open(os.path.join(directory, 'meta.json')) as f:
+            self.meta = json.load(f)
+
+        self.stats = self.meta['stats']
+        self.teams = self.meta['teams']
+        self.seasons = self.meta['seasons']
+        self._stat_index = {stat: i for i, stat in enumerate(self.stats)}
+        self._team_code = {team: i for i, team in enumerate(self.teams)}
+        self._seasons = {}
+
+    def stat_index(self, stat):
+        return self._stat_index[stat]
+
+    def team_code(self, team):
+        return self._team_code[team]
+
+    def season(self, year):
+        if year not in self.seasons:
+            raise KeyError('season {0} is not in the store'.format(year))
+        if year not in self._seasons:
+            self._seasons[year] = Season(self, year)
+        return self._seasons[year]
+
+    def __iter__(self):
+        return (self.season(year) for year in self.seasons)
+
+    def team_diffs(self):
+        """
+        Return the per-team stat win percentages of all_diff_data.p as a DataFrame.
+        """
+        from pandas import DataFrame
+
+        diffs = self.meta.get('team_diffs')
+        if diffs is None:
+            return None
+        values = np.load(os.path.join(self.directory, 'team_diffs.npy'), mmap_mode='r')
+        return DataFrame(values, index=diffs['teams'], columns=diffs['stats'])
+
+
+class StoreWriter(object):
+    """
+    Creates a season store, or replaces seasons in an existing one.
+    """
+    def __init__(self, directory=STORE_DIR, stats=None):
+        self.directory = directory
+        meta_path = os.path.join(directory, 'meta.json')
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                self.meta = json.load(f)
+        else:
+            if stats is None:
+                raise ValueError('stats are required to create a new store')
+            self.meta = {'version': VERSION, 'stats': list(stats), 'teams': [], 'seasons': []}
+
+    def _team_codes(self, team_names):
+        teams = self.meta['teams']
+        index = {team: i for i, team in enumerate(teams)}
+        for team in team_names:
+            if team not in index:
+                index[team] = len(teams)
+                teams.append(team)
+        return np.array([index[team] for team in team_names], dtype=np.int8)
+
+    def write_season(self, year, outcomes, team_names, rows=None):
+        """
+        Write (or replace) a season.
+
+        :param int year: The season.
+        :param numpy.ndarray outcomes: A rows x stats array of outcomes (0, 0.5, 1), in the store's stat order.
+        :param list team_names: The team of each row.
+        :param numpy.ndarray rows: The position of each row in the season, defaults to the order given.
+        """
+        # counters of the replaced season no longer apply.
+        for name in DERIVED:
+            path = os.path.join(self.directory, str(year), name)
+            if os.path.exists(path):
+                os.remove(path)
+        self._write_columns(year, outcomes, team_names, rows)
+
+    def _write_columns(self, year, outcomes, team_names, rows=None):
+        teams = self._team_codes(team_names)
+        if rows is None:
+            rows = np.arange(len(teams))
+        rows = np.asarray(rows, dtype=np.int32)
+
+        order = np.argsort(teams, kind='mergesort')
+        offsets = np.searchsorted(teams[order], np.arange(len(self.meta['teams']) + 1)).astype(np.int32)
+
+        directory = os.path.join(self.directory, str(year))
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        save_array(os.path.join(directory, 'outcomes.npy'), to_codes(outcomes)[order])
+        save_array(os.path.join(directory, 'team.npy'), teams[order])
+        save_array(os.path.join(directory, 'row.npy'), rows[order])
+        save_array(os.path.join(directory, 'offsets.npy'), offsets)
+
+        if year not in self.meta['seasons']:
+            self.meta['seasons'] = sorted(self.meta['seasons'] + [year])
+
+    def append_season(self, year, outcomes, team_names):
+        """
+        Add rows to the end of a season, creating it if needed.
+
+        :param int year: The season.
+        :param numpy.ndarray outcomes: A rows x stats array of outcomes (0, 0.5, 1), in the store's stat order.
+        :param list team_names: The team of each row.
+        """
+        outcomes = np.asarray(outcomes, dtype=float).reshape(-1, len(self.meta['stats']))
+        if year not in self.meta['seasons']:
+            return self.write_season(year, outcomes, team_names)
+
+        # appended rows are numbered after the existing ones, which is how counters find rows they have not seen.
+        season = Season(self, year)
+        first_row = int(season.row.max()) + 1 if len(season.row) else 0
+        self._write_columns(
+            year,
+            np.concatenate([to_outcomes(season.outcomes), outcomes]),
+            list(np.asarray(self.meta['teams'])[season.team]) + list(team_names),
+            np.concatenate([season.row, np.arange(first_row, first_row + len(team_names))]),
+        )
+
+    def write_links(self, year, links):
+        """
+        Record the box score links ingested into a season.
+        """
+        write_json(os.path.join(self.directory, str(year), 'links.json'), list(links))
+
+    def write_frame(self, year, frame):
+        """
+        Write a season from a DataFrame in the format of the raw_game_data_YYYY files.
+        """
+        self.write_season(year, frame[self.meta['stats']].values, list(frame['team']))
+
+    def write_team_diffs(self, diffs):
+        """
+        Write a dictionary of team to stat to value, as in all_diff_data.p.
+        """
+        teams = sorted(diffs)
+        stats = sorted(set(stat for values in diffs.values() for stat in values))
+        values = np.array([[diffs[team].get(stat, np.nan) for stat in stats] for team in teams], dtype=float)
+        save_array(os.path.join(self.directory, 'team_diffs.npy'), values)
+        self.meta['team_diffs'] = {'teams': teams, 'stats': stats}
+
+    def close(self):
+        """
+        Write the store's metadata. Readers see new seasons once this is done.
+        """
+        write_json(os.path.join(self.directory, 'meta.json'), self.meta, indent=2, sort_keys=True)
+
+
+def convert_csvs(years=SEASONS, directory=STORE_DIR, raw_game_data=RAW_GAME_DATA, diff_data=DIFF_DATA, force=False):
+    """
+    Build a season store from the raw_game_data_YYYY csv files and the all_diff_data.p pickle.
+
+    The store is built in a sibling directory and swapped in once it is complete, so a missing or unreadable csv
+    leaves the existing store as it was.
+
+    :param bool force: Whether to replace a store holding seasons ingested incrementally, whose links are lost.
+    :raises ValueError: If there are no seasons to convert, or the store holds ingested seasons and force is not given.
+    """
+    from pandas import read_csv
+
+    years = list(years)
+    if not years:
+        raise ValueError('no seasons to convert')
+    if not force and os.path.exists(os.path.join(directory, 'meta.json')):
+        store = SeasonStore(directory)
+        ingested = [year for year in store.seasons if store.season(year).links is not None]
+        if ingested:
+            raise ValueError('seasons {0} of {1} were ingested incrementally; pass force to replace them'.format(
+                ingested, directory))
+
+    parent = os.path.dirname(os.path.abspath(directory))
+    if not os.path.isdir(parent):
+        os.makedirs(parent)
+    building = tempfile.mkdtemp(dir=parent, prefix='.{0}.'.format(os.path.basename(os.path.abspath(directory))))
+    try:
+        os.chmod(building, 0o755)
+        writer = None
+        for year in years:
+            frame = read_csv(raw_game_data.format(year), index_col=0)
+            if writer is None:
+                writer = StoreWriter(building, stats=[column for column in frame.columns if column != 'team'])
+            writer.write_frame(year, frame)
+
+        if diff_data and os.path.exists(diff_data):
+            with open(diff_data, 'rb') as f:
+                writer.write_team_diffs(pickle.load(f))
+
+        writer.close()
+    except BaseException:
+        shutil.rmtree(building, ignore_errors=True)
+        raise
+
+    if os.path.isdir(directory):
+        replaced = building + '.old'
+        os.rename(directory, replaced)
+        os.rename(building, directory)
+        shutil.rmtree(replaced)
+    else:
+        os.rename(building, directory)
+    return SeasonStore(directory)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build the season store from the raw_game_data_YYYY csv files.')
+    parser.add_argument('--force', action='store_true', help='replace seasons ingested incrementally')
+    args = parser.parse_args()
+
+    convert_csvs(force=args.force)
@@ -0,0 +1,168 @@
+"""
+Streaming scrape of whole seasons into raw_game_data_YYYY files, with checkpoints.
+
+Box scores are fetched on the fetcher's worker pool a window at a time, and every batch of parsed games is appended
+to the season's output as soon as it is complete, so memory stays bounded by the batch size however many games and
+seasons are scraped. After each batch a checkpoint records how many of the season's links are written and where the
+output ends:
+
+    build/YYYY/stream.json      links, games written, bytes of output written
+    raw_game_data_YYYY.partial  the output so far
+
+An interrupted run resumes from its checkpoint: the output is cut back to the end of the last checkpointed batch,
+and only the links after it are fetched. The output replaces raw_game_data_YYYY once the season is done.
+
+Use it as:
+
+    python -m scraper.stream 2000 2017 --batch-size 200
+"""
+import argparse
+import json
+import logging
+import os
+
+from config import BUILD_DIR, RAW_GAME_DATA
+from store import write_json
+
+BATCH_SIZE = 100
+
+
+def stream_box_scores(links, fetcher=None):
+    """
+    Yield the raw team totals of each box score, as lists of (team, stats) pairs in the order of the parsed
+    dictionary, in the order of the links.
+    """
+    from fetch import get_fetcher
+    from teamscrape import get_raw_game_data
+
+    fetcher = fetcher or get_fetcher()
+    return fetcher.imap(lambda link: get_raw_game_data(link, fetcher).items(), links)
+
+
+def batches(iterable, size):
+    """
+    Yield lists of up to size consecutive items of an iterable.
+    """
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def batch_frame(box_scores, first_row):
+    """
+    Convert box scores into rows in the format of the raw_game_data_YYYY files, numbered from first_row.
+    """
+    from records import OutcomeTable
+    from teamscrape import game_outcomes
+
+    frame = OutcomeTable.from_games(game_outcomes(dict(box_score)) for box_score in box_scores).to_frame()
+    # every batch is formatted alike: outcomes as floats, the game result as an integer.
+    for column in frame.columns:
+        if column not in ('team', 'win'):
+            frame[column] = frame[column].astype(float)
+    frame.index += first_row
+    return frame
+
+
+class Checkpoint(object):
+    """
+    The progress of a season being streamed, saved atomically after every batch.
+    """
+    def __init__(self, path, links, games=0, offset=0):
+        self.path = path
+        self.links = links
+        self.games = games
+        self.offset = offset
+
+    @classmethod
+    def load(cls, path, links):
+        """
+        Return the checkpoint at path if it is for the given links, or a new one.
+        """
+        if os.path.exists(path):
+            with open(path) as f:
+                saved = json.load(f)
+            if saved['links'] == links:
+                return cls(path, links, saved['games'], saved['offset'])
+        return cls(path, links)
+
+    def save(self):
+        write_json(self.path, {'links': self.links, 'games': self.games, 'offset': self.offset})
+
+    def remove(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def stream_season(year, links=None, output=None, batch_size=BATCH_SIZE, fetcher=None, build_dir=BUILD_DIR):
+    """
+    Scrape a season into its raw_game_data_YYYY file a batch at a time, resuming from a checkpoint if there is one.
+
+    :param int year: The season.
+    :param list links: The season's box score links, defaults to those on the season's schedule pages.
+    :param str output: The file to write, defaults to the season's raw_game_data_YYYY.
+    :param int batch_size: Games written, and checkpointed, at a time.
+    :param Fetcher fetcher: The fetcher box scores are fetched on, defaults to the shared fetcher.
+    :return: The number of games fetched by this run.
+    """
+    from ingest import get_season_links
+    from rebuild import season_dir
+
+    if links is None:
+        links = get_season_links(year, fetcher)
+    output = output or RAW_GAME_DATA.format(year)
+    partial = output + '.partial'
+
+    checkpoint = Checkpoint.load(os.path.join(season_dir(year, build_dir), 'stream.json'), links)
+    if checkpoint.games and (not os.path.exists(partial) or os.path.getsize(partial) < checkpoint.offset):
+        # the rows the checkpoint counts are gone, e.g. renamed to the output by a run which then died.
+        logging.info('discarding the checkpoint of %d, whose partial file is missing or short', year)
+        checkpoint = Checkpoint(checkpoint.path, links)
+    if checkpoint.games:
+        logging.info('resuming %d after %d of %d games', year, checkpoint.games, len(links))
+
+    remaining = links[checkpoint.games:]
+    with open(partial, 'ab') as f:
+        # drop rows written after the last checkpoint.
+        f.truncate(checkpoint.offset)
+        for batch in batches(stream_box_scores(remaining, fetcher), batch_size):
+            frame = batch_frame(batch, 2 * checkpoint.games)
+            frame.to_csv(f, header=checkpoint.offset == 0)
+            f.flush()
+            os.fsync(f.fileno())
+
+            checkpoint.games += len(batch)
+            checkpoint.offset = f.tell()
+            checkpoint.save()
+
+    # the checkpoint goes first: a checkpoint outliving its partial file would resume on an empty one.
+    checkpoint.remove()
+    os.rename(partial, output)
+    return len(remaining)
+
+
+def stream_seasons(years, batch_size=BATCH_SIZE, fetcher=None, build_dir=BUILD_DIR):
+    """
+    Stream several seasons one after another.
+
+    :return: A dictionary of season to the number of games fetched.
+    """
+    return {year: stream_season(year, batch_size=batch_size, fetcher=fetcher, build_dir=build_dir) for year in years}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Scrape seasons into raw_game_data_YYYY files, with checkpoints.')
+    parser.add_argument('first', type=int, help='first season to scrape')
+    parser.add_argument('last', type=int, nargs='?', help='last season to scrape')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='games written at a time')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    fetched = stream_seasons(range(args.first, (args.last or args.first) + 1), args.batch_size)
+    for year, games in sorted(fetched.items()):
+        print '{0}: fetched {1} games'.format(year, games)
@@ -1,17 +1,14 @@
-from collections import defaultdict
+from array import array
 import re
 import operator
 
-from entropy import calc_entropy, gain
+from entropy import calc_entropy, gain, gain_all, outcome_matrix
+from fetch import get_fetcher, get_page
+from metrics import get_metrics
+from parsers import parse_box_score, parse_team_totals
+from records import GameOutcome, OutcomeTable, Schema
+from store import LOST, TIED, WON
 from utils import cached, timeit
-from bs4 import BeautifulSoup
-from requests import get
-from urllib2 import urlopen
-import json
-from pandas import DataFrame as df
-import concurrent.futures
-import time
-import multiprocessing as mp
 
 
 years = [i for i in range(2000, 2018)]
@@ -27,71 +24,70 @@ IGNORED_CAT = {'mp', 'plus_minus', 'usg_pct', 'off_rtg', 'def_rtg', 'win'}
 
 STATS = ['fg', 'fga', 'fg_pct', 'fg3', 'fg3_pct', 'orb', 'drb', 'trb', 'ast', 'stl', 'blk', 'tov', 'ts_pct', 'efg_pct', 'fta', 'ft']
 
-def get_raw_game_data(game_url):
+def get_raw_game_data(game_url, fetcher=None):
     """
     In:
     :param str game_url: A box score to parse.
+    :param Fetcher fetcher: The fetcher to fetch the box score with, defaults to the shared fetcher.
 
     Out:
     :return: Dictionary mapping team name to raw stats.
     """
-    raw_html = get(game_url).text
-    parser = BeautifulSoup(raw_html, 'html.parser')
-
     # parse raw totals for each team
-    raw_team_stats = defaultdict(dict)
-    for table in parser.findAll('table', {'class': 'stats_table'}):
-        team = table['id'].split('_')[1]
-        totals_row = table.find('tfoot')
-        for column in totals_row.findAll('td'):
-            category = column['data-stat']
-            if category not in IGNORED_CAT:
-                raw_team_stats[team][category] = float(column.text)
+    return parse_team_totals((fetcher or get_fetcher()).get(game_url), IGNORED_CAT)
 
-    return raw_team_stats
 
+def get_box_score(game_url, fetcher=None):
+    """
+    Parse the raw totals of each team and the rows of each team's players of a box score, in one pass.
 
-def scrape_game_data(game_url):
+    :param Fetcher fetcher: The fetcher to fetch the box score with, defaults to the shared fetcher.
+    :return: A list of two (team, raw totals, players' rows) triples. The teams are in the order of the parsed
+        dictionary, which is arbitrary rather than the order of the box score; whatever it is, the same order is
+        kept by every store the box score is written to.
+    """
+    team_to_stats, team_to_players = parse_box_score((fetcher or get_fetcher()).get(game_url), IGNORED_CAT)
+    return [(team, stats, team_to_players.get(team, [])) for team, stats in team_to_stats.items()]
+
+
+def scrape_game_data(game_url, fetcher=None):
     """
     Scrape data from a game into a dictionary mapping stat categories to booleans
     indicating if the given team won the particular category
     """
-    raw_team_stats = get_raw_game_data(game_url)
+    return game_outcomes(get_raw_game_data(game_url, fetcher))
+
 
-    # convert raw totals to booleans if the given team won the particular stat.
+def game_outcomes(raw_team_stats):
+    """
+    Convert a dictionary mapping team name to raw stats, as returned by get_raw_game_data,
+    into a dictionary mapping team name to a GameOutcome record of whether the team won each stat category.
+    """
+    # convert raw totals to outcomes of the given team for the particular stat.
     teams = raw_team_stats.keys()
     stats = raw_team_stats.values()
-    parsed_team_stats = defaultdict(dict)
 
-    for cat in stats[0].keys():
-        write_cat = 'win' if cat == 'pts' else cat
+    cats = sorted(stats[0].keys(), key=lambda cat: 'win' if cat == 'pts' else cat)
+    schema = Schema.get(['win' if cat == 'pts' else cat for cat in cats])
 
+    first, second = array('b'), array('b')
+    for cat in cats:
+        # fewer turnovers wins the category.
+        diff = cmp(stats[0][cat], stats[1][cat])
         if cat == 'tov' or cat == 'tov_pct':
-
-            if stats[0][cat] > stats[1][cat]:
-                parsed_team_stats[teams[0]][write_cat] = 0
-                parsed_team_stats[teams[1]][write_cat] = 1
-            elif stats[0][cat] < stats[1][cat]:
-                parsed_team_stats[teams[0]][write_cat] = 1
-                parsed_team_stats[teams[1]][write_cat] = 0
-            else:
-                parsed_team_stats[teams[0]][write_cat] = 0.5
-                parsed_team_stats[teams[1]][write_cat] = 0.5
-
+            diff = -diff
+
+        if diff > 0:
+            first.append(WON)
+            second.append(LOST)
+        elif diff < 0:
+            first.append(LOST)
+            second.append(WON)
         else:
-            if stats[0][cat] > stats[1][cat]:
-                parsed_team_stats[teams[0]][write_cat] = 1
-                parsed_team_stats[teams[1]][write_cat] = 0
-            elif stats[0][cat] < stats[1][cat]:
-                parsed_team_stats[teams[0]][write_cat] = 0
-                parsed_team_stats[teams[1]][write_cat] = 1
-            else:
-                parsed_team_stats[teams[0]][write_cat] = 0.5
-                parsed_team_stats[teams[1]][write_cat] = 0.5
-    return parsed_team_stats
-
-
+            first.append(TIED)
+            second.append(TIED)
 
+    return {teams[0]: GameOutcome(schema, teams[0], first), teams[1]: GameOutcome(schema, teams[1], second)}
 
 
 @cached(24 * 3600 * 7)
@@ -99,11 +95,8 @@ def get_team_data(team):
     """
     Return a list of results for the given team.
     """
-    results = []
-    for link in get_game_links(TEAM_URL.format(team.upper())):
-        game_data = scrape_game_data(link)[team.lower()]
-        results.append(game_data)
-    return results
+    links = get_game_links(TEAM_URL.format(team.upper()))
+    return [game_data[team.lower()] for game_data in get_fetcher().map(scrape_game_data, links)]
 
 
 @cached(24 * 3600 * 7)
@@ -111,7 +104,9 @@ def get_game_links(url):
     """
     Return a list of scrape-able links.
     """
-    raw_html = get(url).text
+    from bs4 import BeautifulSoup
+
+    raw_html = get_page(url)
     parser = BeautifulSoup(raw_html, 'html.parser')
 
     game_links = []
@@ -139,28 +134,23 @@ def get_all_game_links(year):
     return links
 
 def get_raw_data_request(game_url):
-    return get(game_url).text
+    return get_page(game_url)
 
 
 @timeit
-def get_all_teams_data(year):
+def get_all_teams_data(year, fetcher=None):
+    """
+    Scrape every game of the given season, fetching box scores concurrently.
 
-    links = get_all_game_links(year)
-    results = []
-    for link in links:
-        game_data = scrape_game_data(link)
-        results.append(game_data)
+    :param int year: The season to scrape.
+    :param Fetcher fetcher: The fetcher to use, defaults to the shared fetcher.
+    """
+    fetcher = fetcher or get_fetcher()
 
-    print results
-    return results
+    links = get_all_game_links(year)
+    return fetcher.map(lambda link: scrape_game_data(link, fetcher), links)
 
     """
-    pool = mp.Pool(processes=4)
-    results = [pool.map_async(scrape_game_data, links)]
-    print [r.get() for r in results]
-    pool.terminate()
-    pool.join()
-
     for link in get_all_game_links(year):
         game_data = scrape_game_data(link)
         for team, team_data in game_data.iteritems():
@@ -174,12 +164,13 @@ def get_all_teams_data(year):
 
 def calc_team_gain(team_results):
 
-    gains = {}
-    for cat in team_results[0].keys():
-        g = gain(team_results, cat, 'win')
-        gains[cat] = g
+    if not isinstance(team_results, OutcomeTable):
+        team_results = OutcomeTable.from_records(team_results)
+    cats = team_results.stats
+    with get_metrics().timer('gain.seconds'):
+        _, gains = gain_all(outcome_matrix(team_results, cats), outcome_matrix(team_results, ['win'])[:, 0])
 
-    return gains
+    return dict(zip(cats, gains))
 
 def print_sorted(values, details):
 
@@ -188,31 +179,45 @@ def print_sorted(values, details):
         print g, details[g[0]]
 
 
-def to_win_probability(team_name):
+def to_win_probability(team_name, team_data=None):
+    """
+    Tabulate the team's record when it won and lost each stat.
+
+    :param str team_name: The team.
+    :param team_data: The team's game outcomes, as GameOutcome records or an OutcomeTable. Defaults to scraping them.
+    """
+    from pandas import DataFrame as df
 
     team_df = []
-    team_data = get_team_data(team_name)
-    total_wins = len([x for x in team_data if x['win']])
+    if team_data is None:
+        team_data = get_team_data(team_name)
+    if not isinstance(team_data, OutcomeTable):
+        team_data = OutcomeTable.from_records(team_data)
+
+    # ties count as wins of the game and of the stat, as they always have here.
+    game_won = team_data.column('win') != LOST
+    total_wins = int(game_won.sum())
     base_pct = round(total_wins / float(len(team_data)), 2)
-    team_frame = frame.loc[frame['team'] == team_name]
+    gains = calc_team_gain(team_data)
 
-    for stat in team_data[0].keys():
-        wins_stat = [x for x in team_data if x[stat]]
-        loss_stat = [x for x in team_data if not x[stat]]
+    for stat in team_data.stats:
+        stat_won = team_data.column(stat) != LOST
+        wins_stat = team_data.select(stat_won)
+        loss_stat = team_data.select(~stat_won)
 
-        w_when_stat_wins = len([x for x in wins_stat if x['win']])
-        l_when_stat_wins = len([x for x in wins_stat if not x['win']])
+        w_when_stat_wins = int((stat_won & game_won).sum())
+        l_when_stat_wins = int((stat_won & ~game_won).sum())
         total_when_stat_wins = float(w_when_stat_wins + l_when_stat_wins)
         win_w_pct = round(w_when_stat_wins / total_when_stat_wins,  3)
 
         entropy_when_win = calc_entropy(wins_stat, 'win')
         entropy_when_loss = calc_entropy(loss_stat, 'win')
 
-        w_when_stat_loss = len([x for x in loss_stat if x['win']])
-        l_when_stat_loss = len([x for x in loss_stat if not x['win']])
+        w_when_stat_loss = int((~stat_won & game_won).sum())
+        l_when_stat_loss = int((~stat_won & ~game_won).sum())
         total_when_stat_loss = float(w_when_stat_loss + l_when_stat_loss)
         loss_w_pct = round(w_when_stat_loss / total_when_stat_loss,  3)
-        gain = team_frame[stat].iloc[0]
+        gain = gains[stat]
 
         if stat in ['ast', 'fg']:
             print stat, gain, entropy_when_win, entropy_when_loss
@@ -235,48 +240,8 @@ def to_win_probability(team_name):
 
 
 if __name__ == '__main__':
+    from stream import stream_season
 
-    sgd = scrape_game_data('https://www.basketball-reference.com/boxscores/201610250CLE.html')
-
-    print sgd
-    import pdb; pdb.set_trace()
-
-    all_years = {}
-    total_years = {}
-    raw_totals = {}
-    for year in [years[-1]]:
-        data_for_year = get_all_teams_data(year)
-        import pdb; pdb.set_trace()
-
-        """
-        results = df(data_for_year)
-        results.to_csv('raw_game_data_{0}'.format(year))
-
-        year_dict = {year: {}}
-        total_year_dict = {year: {}}
-        raw_totals_year = {year: {}}
-        total_stat_wins = 0
-        for stat in STATS:
-            won_stat = results[results[stat] == 1]
-            wins = results[results['win'] == 1]
-            stat_wins = len(wins[wins[stat] ==1])
-            total_stat_wins += stat_wins
-            wins_when_stat_is_won = won_stat[won_stat['win'] == 1]
-            win_pct = round(len(wins_when_stat_is_won) / float(len(won_stat)), 4)
-            pct_of_games = 100 * round(len(won_stat) / float(len(results)), 4)
-
-            total_year_dict[year].update({stat: stat_wins})
-            year_dict[year].update({stat: win_pct})
-            raw_totals_year[year].update({stat: len(wins_when_stat_is_won)})
-
-        year_dict[year].update({'total_win_pct': float(total_stat_wins) / len(results) * len(STATS), 'total_win': total_stat_wins})
-        all_years.update(year_dict)
-        total_years.update(total_year_dict)
-        raw_totals.update(raw_totals_year)
-
-    frame = df.from_dict(all_years, orient='index')
-    totals = df.from_dict(total_years, orient='index')
-    wins_when_stat_is_won = df.from_dict(raw_totals, orient='index')
-    wins_when_stat_is_won.to_csv('wins_when_stat_is_won.csv')
-    import pdb; pdb.set_trace()
-    """
+    print scrape_game_data('https://www.basketball-reference.com/boxscores/201610250CLE.html')
+    # writes raw_game_data_YYYY; see also python -m scraper.cli scrape.
+    stream_season(years[-1])
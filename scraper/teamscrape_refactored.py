@@ -1,24 +1,16 @@
-from collections import defaultdict
+from array import array
 
-from bs4 import BeautifulSoup
-from requests import get
-
-from config import ALL_TEAMS, IGNORED_STATS, USED_STATS
+from config import ALL_TEAMS, USED_STATS
+from fetch import get_fetcher, get_page
+from parsers import parse_team_totals
+from records import GameOutcome, OutcomeTable, Schema, to_code
+from store import WON
 from utils import cached
 
 BASE_URL = 'http://www.basketball-reference.com'
 
-
-@cached(3600 * 24 * 7)
-def _get_html(url):
-    """
-    Request the data for this game_url in its raw html form.
-    Convert it into a BeautifulSoup object for parsing.
-
-    Note: this is a stand-alone function in order to work with the caching decorator.
-    """
-    raw_html = get(url).text
-    return BeautifulSoup(raw_html, 'html.parser')
+# the order of the stats in records made by winners_for_stat, sorted by their names in the records.
+SCHEMA_STATS = sorted(USED_STATS, key=lambda stat: 'win' if stat == 'pts' else stat)
 
 
 @cached(3600 * 24 * 7)
@@ -26,7 +18,9 @@ def get_reg_season_games(url):
     """
     Return a list of scrapable links.
     """
-    raw_html = get(url).text
+    from bs4 import BeautifulSoup
+
+    raw_html = get_page(url)
     parser = BeautifulSoup(raw_html, 'html.parser')
 
     game_links = []
@@ -40,16 +34,11 @@ def get_reg_season_games(url):
     return game_links
 
 
-def parse_team_name(table_html):
-    """
-    Given a box score table in html form, return the team name for which that table applies to.
-    """
-    return table_html['id'].split('_')[1]
-
-
 def winners_for_stat(team_to_stats):
     """
     Given raw team to stat data, consolidate the input by winners of each stat.
+
+    :return: A dictionary mapping team name to a GameOutcome record.
     """
     def _calc(stat, direction):
         """
@@ -73,32 +62,31 @@ def winners_for_stat(team_to_stats):
             else:
                 return {t1: 0, t2: 1}
 
+    teams = team_to_stats.keys()
     t1, t2 = teams[0], teams[1]
 
     MORE = 1
     LESS = 0
 
-    teams = team_to_stats.keys()
-
-    t1_results, t2_results = {}, {}
-    for stat in USED_STATS:
+    t1_results, t2_results = array('b'), array('b')
+    for stat in SCHEMA_STATS:
         direction = LESS if stat in {'tov', 'tov_pct'} else MORE
         result = _calc(stat, direction)
-        if stat == 'pts':
-            stat = 'win'
 
-        t1_results.update({stat: result[t1]})
-        t2_results.update({stat: result[t2]})
+        t1_results.append(to_code(result[t1]))
+        t2_results.append(to_code(result[t2]))
 
-    return {t1: t1_results, t2: t2_results}
+    schema = Schema.get(['win' if stat == 'pts' else stat for stat in SCHEMA_STATS])
+    return {t1: GameOutcome(schema, t1, t1_results), t2: GameOutcome(schema, t2, t2_results)}
 
 
 class BoxScore(object):
     """
     Class which encapsulates a single basketball-reference box score. Contains methods for parsing data from this box score.
     """
-    def __init__(self, game_url):
+    def __init__(self, game_url, fetcher=None):
         self.game_url = game_url
+        self.fetcher = fetcher
 
     def _parse_html(self):
         """
@@ -111,25 +99,24 @@ class BoxScore(object):
          'cle': {'fg3a_per_fga_pct': 0.372, 'orb_pct': 27.5, ... }
         }
         """
-        html = _get_html(self.game_url)
-
-        team_to_stats = defaultdict(dict)
-        for table in html.findAll('table', {'class': 'stats_table'}):
-            team = parse_team_name(table)
-            totals_row = table.find('tfoot')
-            for column in totals_row.findAll('td'):
-                category = column['data-stat']
-                if category not in IGNORED_STATS:
-                    team_to_stats[team][category] = float(column.text)
+        return parse_team_totals((self.fetcher or get_fetcher()).get(self.game_url))
 
-        return team_to_stats
-
-    def apply_func(self, aggregate_func):
+    def parse(self, aggregate_func):
         """
         Apply the function which takes the parse html into usuable output.
         """
         return aggregate_func(self._parse_html())
 
+    @classmethod
+    def parse_all(cls, game_urls, aggregate_func, fetcher=None):
+        """
+        Fetch and parse many box scores concurrently with the given fetcher.
+
+        :return: A list of parsed box scores, in the same order as game_urls.
+        """
+        fetcher = fetcher or get_fetcher()
+        return fetcher.map(lambda game_url: cls(game_url, fetcher).parse(aggregate_func), game_urls)
+
 
 class TeamScraper(object):
 
@@ -138,21 +125,57 @@ class TeamScraper(object):
     def __init__(self, team_name):
         self.team_name = team_name
 
-    def get_per_game_data(self, func):
+    def get_per_game_data(self, func, fetcher=None):
         """
         Scrape all regular season games for the given team, and apply the given aggregation function to each result.
 
         :param function func: An aggregation function to apply to raw per-game data.
+        :param Fetcher fetcher: The fetcher box scores are fetched with, defaults to the shared fetcher.
         :return: A list of data elements, one for each regular season game.
         """
         url = self.TEAM_URL.format(self.team_name.upper())
 
-        results = []
-        for game_link in get_reg_season_games(url):
-            box_score = BoxScore(game_link)
-            results.append(box_score.parse(func)[self.team_name])
+        game_links = get_reg_season_games(url)
+        return [result[self.team_name] for result in BoxScore.parse_all(game_links, func, fetcher)]
+
+    @classmethod
+    def get_league_data(cls, func, team_names=ALL_TEAMS, team_links=None, fetcher=None):
+        """
+        Scrape all regular season games of the given teams, fetching and parsing each game once, and apply the given
+        aggregation function to each result. Every game is played by two of the teams, so this parses half the box
+        scores that calling get_per_game_data for each team would.
+
+        :param function func: An aggregation function to apply to raw per-game data.
+        :param list team_names: The teams to scrape.
+        :param dict team_links: Team name to the links of its games, defaults to scraping each team's schedule.
+        :param Fetcher fetcher: The fetcher box scores are fetched with, defaults to the shared fetcher.
+        :return: A dictionary mapping team name to a list of data elements, one for each of its games in order.
+        """
+        if team_links is None:
+            team_links = {team_name: get_reg_season_games(cls.TEAM_URL.format(team_name.upper()))
+                          for team_name in team_names}
+
+        game_links = []
+        seen = set()
+        for team_name in team_names:
+            for game_link in team_links[team_name]:
+                if game_link not in seen:
+                    seen.add(game_link)
+                    game_links.append(game_link)
+
+        results = dict(zip(game_links, BoxScore.parse_all(game_links, func, fetcher)))
+        return {team_name: [results[game_link][team_name] for game_link in team_links[team_name]]
+                for team_name in team_names}
+
+    @classmethod
+    def calc_league_importance(cls, team_names=ALL_TEAMS, team_links=None, fetcher=None):
+        """
+        Calculate the importance of each statistic for each of the given teams, in a single pass over their games.
 
-        return results
+        :return: A list of the teams' stat importances, as returned by calc_stat_importance, in the order of team_names.
+        """
+        league_data = cls.get_league_data(winners_for_stat, team_names, team_links, fetcher)
+        return [cls(team_name).stat_importance(league_data[team_name]) for team_name in team_names]
 
     def calc_stat_importance(self):
         """
@@ -161,33 +184,43 @@ class TeamScraper(object):
 
         :return: Dictionary mapping stats to their importance.
         """
-        data = self.get_per_game_data()
+        return self.stat_importance(self.get_per_game_data(winners_for_stat))
+
+    def stat_importance(self, data):
+        """
+        Calculate the importance of each statistic from the team's game outcomes.
+
+        :param data: The team's game outcomes, as GameOutcome records or an OutcomeTable.
+        :return: The team's base win % and, for each stat, the win % when it was won (None if it never was) and the
+            number of games it was won.
+        """
+        if not isinstance(data, OutcomeTable):
+            data = OutcomeTable.from_records(data)
 
-        wins = float(len([_ for _ in data if _['win'] == 1]))
-        base_win_pct = round(wins / len(data), 3)
+        game_won = data.column('win') == WON
+        base_win_pct = round(float(game_won.sum()) / len(data), 3)
 
         diffs = {'base_win_pct': base_win_pct}
-        for stat in data[0].keys():
-            stat_wins = [_ for _ in data if _[stat] == 1]
-            wins_with_stat_win = float(len([_ for _ in stat_wins if _['win'] == 1]))
-            win_pct = wins_with_stat_win / len(stat_wins)
+        for stat in data.stats:
+            stat_won = data.column(stat) == WON
+            total = int(stat_won.sum())
+            # a stat never won has no win %; None keeps the output valid JSON, where NaN is not.
+            win_pct = round(float((stat_won & game_won).sum()) / total, 3) if total else None
 
             stat = stat.replace('_pct', '%')
 
             # this is where I can change importance
-            diffs[stat] = {'pct_diff': round(win_pct, 3), 'total': len(stat_wins)}
+            diffs[stat] = {'pct_diff': win_pct, 'total': total}
 
         return {'team_name': self.team_name, 'diffs': diffs}
 
 
 if __name__ == '__main__':
 
-    all_data = []
-    for team in ALL_TEAMS:
-        stat_importance = TeamScraper(team).calc_stat_importance()
+    all_data = TeamScraper.calc_league_importance()
+    for team_diffs in all_data:
         print team_diffs
-        all_data.append(team_diffs)
 
     import json
     with open('team_diff_data.json', 'w') as diff_data_file:
-        json.dump(all_data, diff_data_file)
+        json.dump(all_data, diff_data_file, allow_nan=False)
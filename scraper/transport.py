@@ -0,0 +1,119 @@
+"""
+Transports: how a Fetcher gets the pages it is asked for.
+
+    http      fetch pages over the network
+    record    fetch pages over the network, and append every page fetched to a page archive
+    replay    serve pages from a page archive, never touching the network
+
+Every transport answers get(url, timeout) with a requests Response, so the Fetcher's retries, errors and caching
+work the same whichever is used. The transport of the shared fetcher is picked with the DATASCIENCE_TRANSPORT
+environment variable (see config.FETCH_TRANSPORT), and the archive with DATASCIENCE_PAGE_ARCHIVE. To reprocess
+every season offline after changing a parser, record once:
+
+    DATASCIENCE_TRANSPORT=record python -m scraper.rebuild 2000 2017
+
+and then replay as often as needed:
+
+    DATASCIENCE_TRANSPORT=replay python -m scraper.rebuild 2000 2017
+"""
+from requests import Response, Session
+from requests.adapters import HTTPAdapter
+
+from archive import get_archive
+from config import FETCH_TRANSPORT, FETCH_WORKERS, PAGE_ARCHIVE
+
+
+class HttpTransport(object):
+    """
+    Fetches pages over a pool of keep-alive connections.
+    """
+    name = 'http'
+    remote = True
+
+    def __init__(self, pool_size=FETCH_WORKERS):
+        # one connection pool per host, large enough for every worker to hold a connection open.
+        self.session = Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max(pool_size, 1))
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def get(self, url, timeout=None):
+        return self.session.get(url, timeout=timeout)
+
+    def on_cache_hit(self, url, text):
+        pass
+
+
+class RecordTransport(object):
+    """
+    Fetches pages with another transport, and appends every page fetched successfully to an archive.
+    """
+    name = 'record'
+    remote = True
+
+    def __init__(self, archive, transport=None):
+        self.archive = archive
+        self.transport = transport or HttpTransport()
+
+    @property
+    def session(self):
+        return self.transport.session
+
+    def get(self, url, timeout=None):
+        response = self.transport.get(url, timeout)
+        if response.status_code == 200:
+            self.archive.put(url, response.text)
+        return response
+
+    def on_cache_hit(self, url, text):
+        # pages served from the page cache are archived too, so a recording covers every page used.
+        if url not in self.archive:
+            self.archive.put(url, text)
+
+
+class ReplayTransport(object):
+    """
+    Serves pages from an archive. Pages which were never recorded are answered with a 404.
+    """
+    name = 'replay'
+    remote = False
+
+    def __init__(self, archive):
+        self.archive = archive
+
+    def get(self, url, timeout=None):
+        return archived_response(url, self.archive.get(url))
+
+    def on_cache_hit(self, url, text):
+        pass
+
+
+def archived_response(url, page):
+    """
+    Build a requests Response for an archived page, or a 404 if page is None.
+    """
+    response = Response()
+    response.url = url
+    response.encoding = 'utf-8'
+    if page is None:
+        response.status_code = 404
+        response.reason = 'Not Archived'
+        response._content = b''
+    else:
+        response.status_code = 200
+        response.reason = 'OK'
+        response._content = page.encode('utf-8')
+    return response
+
+
+def make_transport(mode=FETCH_TRANSPORT, archive_path=PAGE_ARCHIVE, pool_size=FETCH_WORKERS):
+    """
+    Create a transport by name: 'http', 'record' or 'replay'.
+    """
+    if mode == 'http':
+        return HttpTransport(pool_size)
+    if mode == 'record':
+        return RecordTransport(get_archive(archive_path), HttpTransport(pool_size))
+    if mode == 'replay':
+        return ReplayTransport(get_archive(archive_path))
+    raise ValueError('unknown transport {0!r}, expected http, record or replay'.format(mode))
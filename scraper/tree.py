@@ -0,0 +1,276 @@
+"""
+Decision trees over stat outcomes: which combinations of stats won, lost or tied decide games.
+
+Trees are grown as in ID3 (see entropy.calc_entropy and entropy.gain), splitting every node three ways on the
+outcome of the stat with the highest information gain about the game result. Ties are a branch of their own rather
+than being left out as in gain.
+
+Evaluating a split needs the counts of wins and losses for every outcome of every stat among the node's games. They
+are made for all stats at once with a single bincount, and only for the smaller children of a split: the counts of
+the largest child are its parent's counts less those of its siblings.
+
+Use it as:
+
+    tree = DecisionTree(max_depth=4, min_leaf=50).fit(outcomes, win, stats)
+    print tree
+    tree.predict_proba(outcomes)
+
+or, over a season store:
+
+    tree = fit_store(SeasonStore())
+    trees = fit_seasons(SeasonStore(), processes=4)       # a tree per season, trained in parallel
+
+    python -m scraper.tree --max-depth 3 --min-leaf 100
+    python -m scraper.tree 2010 2017 --per-season
+"""
+import argparse
+import multiprocessing as mp
+
+import numpy as np
+
+from store import LOST, TIED, WON
+
+# outcome codes of a branch, in the order of the outcome axis of counts: code % 3 maps LOST, WON and TIED to 0, 1, 2.
+BRANCHES = (LOST, WON, TIED)
+BRANCH_NAMES = {LOST: 'lost', WON: 'won', TIED: 'tied'}
+
+
+def _entropy(counts):
+    """
+    Entropy of the last axis of an array of win/loss counts, in bits.
+    """
+    counts = np.asarray(counts, dtype=float)
+    total = counts.sum(axis=-1, keepdims=True)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        proportion = counts / total
+        terms = np.where(counts > 0, -proportion * np.log2(proportion), 0.0)
+    return terms.sum(axis=-1)
+
+
+def outcome_counts(outcomes, won):
+    """
+    Count the wins and losses of every outcome of every stat.
+
+    :param numpy.ndarray outcomes: A games x stats array of outcome codes: LOST, WON or TIED.
+    :param numpy.ndarray won: Whether each game was won.
+    :return: A stats x outcomes (BRANCHES) x (lost, won) array of counts.
+    """
+    n_stats = outcomes.shape[1]
+    cells = np.arange(n_stats) * 6 + (outcomes % 3) * 2 + np.asarray(won, dtype=np.intp)[:, None]
+    return np.bincount(cells.ravel(), minlength=n_stats * 6).reshape(n_stats, 3, 2)
+
+
+def split_gains(counts):
+    """
+    Information gain of splitting on each stat, from outcome_counts' counts.
+    """
+    games = counts.sum(axis=2).astype(float)
+    total = games.sum(axis=1)
+    parent = _entropy(counts[0].sum(axis=0))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        children = (games / total[:, None] * _entropy(counts)).sum(axis=1)
+    return parent - children
+
+
+class Node(object):
+    """
+    A node of a tree: the games reaching it, and either the stat it splits on and a child per outcome, or none.
+    """
+    __slots__ = ('games', 'wins', 'stat', 'gain', 'children')
+
+    def __init__(self, games, wins):
+        self.games = games
+        self.wins = wins
+        self.stat = None
+        self.gain = None
+        self.children = {}
+
+    @property
+    def win_pct(self):
+        return self.wins / float(self.games) if self.games else 0.0
+
+    @property
+    def is_leaf(self):
+        return self.stat is None
+
+
+class DecisionTree(object):
+    """
+    A decision tree predicting the game result from stat outcomes.
+
+    :param int max_depth: The most splits on the way from the root to a leaf.
+    :param int min_leaf: The fewest games a child of a split may hold. Outcomes with no games get no child.
+    :param float min_gain: Nodes are split only if the best split gains more than this.
+    """
+    def __init__(self, max_depth=4, min_leaf=20, min_gain=0.0):
+        self.max_depth = max_depth
+        self.min_leaf = min_leaf
+        self.min_gain = min_gain
+        self.stats = None
+        self.root = None
+
+    def fit(self, outcomes, won, stats):
+        """
+        Grow the tree.
+
+        :param numpy.ndarray outcomes: A games x stats array of outcome codes: LOST, WON or TIED.
+        :param numpy.ndarray won: Whether each game was won.
+        :param list stats: The stat of each column of outcomes.
+        :return: The tree.
+        """
+        self.stats = list(stats)
+        outcomes = np.asarray(outcomes, dtype=np.int8)
+        won = np.asarray(won, dtype=bool)
+        rows = np.arange(len(outcomes))
+        self.root = self._grow(outcomes, won, rows, outcome_counts(outcomes, won), 0, np.zeros(len(stats), bool))
+        return self
+
+    def _grow(self, outcomes, won, rows, counts, depth, used):
+        games = int(counts[0].sum())
+        node = Node(games, int(counts[0, :, 1].sum()))
+        if depth >= self.max_depth or games < 2 * self.min_leaf or node.wins in (0, games):
+            return node
+
+        branch_games = counts.sum(axis=2)
+        allowed = ~used & ((branch_games == 0) | (branch_games >= self.min_leaf)).all(axis=1)
+        allowed &= (branch_games > 0).sum(axis=1) >= 2
+        if not allowed.any():
+            return node
+
+        gains = np.where(allowed, split_gains(counts), -np.inf)
+        best = int(np.argmax(gains))
+        if gains[best] <= self.min_gain:
+            return node
+        node.stat, node.gain = self.stats[best], float(gains[best])
+
+        branches = outcomes[rows, best] % 3
+        child_rows = [rows[branches == index] for index in range(3)]
+        largest = int(np.argmax([len(child) for child in child_rows]))
+        child_counts = [None] * 3
+        for index, child in enumerate(child_rows):
+            if index != largest and len(child):
+                child_counts[index] = outcome_counts(outcomes[child], won[child])
+        child_counts[largest] = counts - sum(child for child in child_counts if child is not None)
+
+        used = used.copy()
+        used[best] = True
+        for index, child in enumerate(child_rows):
+            if len(child):
+                node.children[BRANCHES[index]] = self._grow(outcomes, won, child, child_counts[index], depth + 1, used)
+        return node
+
+    def predict_proba(self, outcomes):
+        """
+        Return the probability each game was won: the win % of the leaf it reaches. Games reaching an outcome
+        with no child are given the win % of the node they stop at.
+        """
+        outcomes = np.asarray(outcomes)
+        probabilities = np.empty(len(outcomes))
+        stack = [(self.root, np.arange(len(outcomes)))]
+        while stack:
+            node, rows = stack.pop()
+            if node.is_leaf:
+                probabilities[rows] = node.win_pct
+                continue
+            branches = outcomes[rows, self.stats.index(node.stat)]
+            rest = np.ones(len(rows), dtype=bool)
+            for outcome, child in node.children.items():
+                selected = branches == outcome
+                rest &= ~selected
+                stack.append((child, rows[selected]))
+            probabilities[rows[rest]] = node.win_pct
+        return probabilities
+
+    def predict(self, outcomes):
+        return self.predict_proba(outcomes) >= 0.5
+
+    def leaves(self):
+        """
+        Return every leaf as a tuple of (conditions, games, win %), where conditions is a list of (stat, outcome).
+        """
+        leaves = []
+        stack = [(self.root, [])]
+        while stack:
+            node, conditions = stack.pop()
+            if node.is_leaf:
+                leaves.append((conditions, node.games, node.win_pct))
+            for outcome, child in sorted(node.children.items(), reverse=True):
+                stack.append((child, conditions + [(node.stat, outcome)]))
+        return leaves
+
+    def __str__(self):
+        lines = ['all games ({0} games, {1:.1%} won)'.format(self.root.games, self.root.win_pct)]
+
+        def _lines(node, indent):
+            for outcome in BRANCHES:
+                child = node.children.get(outcome)
+                if child is None:
+                    continue
+                lines.append('{0}{1} {2} ({3} games, {4:.1%} won)'.format(
+                    '  ' * indent, node.stat, BRANCH_NAMES[outcome], child.games, child.win_pct))
+                _lines(child, indent + 1)
+
+        _lines(self.root, 1)
+        return '\n'.join(lines)
+
+
+def _season_data(store, years):
+    stats = [stat for stat in store.stats if stat != 'win']
+    columns = [store.stat_index(stat) for stat in stats]
+    outcomes = np.concatenate([np.asarray(store.season(year).outcomes) for year in years])
+    return outcomes[:, columns], outcomes[:, store.stat_index('win')] == WON, stats
+
+
+def fit_store(store, years=None, **params):
+    """
+    Grow a tree on the games of the given seasons of a store, defaulting to all of them.
+
+    :param params: Parameters of the DecisionTree.
+    """
+    outcomes, won, stats = _season_data(store, store.seasons if years is None else years)
+    return DecisionTree(**params).fit(outcomes, won, stats)
+
+
+def _fit_season(args):
+    from store import SeasonStore
+
+    directory, year, params = args
+    return year, fit_store(SeasonStore(directory), [year], **params)
+
+
+def fit_seasons(store, years=None, processes=None, **params):
+    """
+    Grow a tree per season, in parallel on a process pool.
+
+    :return: A dictionary of season to tree.
+    """
+    years = store.seasons if years is None else years
+    pool = mp.Pool(processes or mp.cpu_count())
+    try:
+        return dict(pool.map(_fit_season, [(store.directory, year, params) for year in years]))
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+if __name__ == '__main__':
+    from store import SeasonStore
+
+    parser = argparse.ArgumentParser(description='Grow a decision tree of the stats which decide games.')
+    parser.add_argument('first', type=int, nargs='?', help='first season, defaults to every season')
+    parser.add_argument('last', type=int, nargs='?', help='last season')
+    parser.add_argument('--max-depth', type=int, default=4)
+    parser.add_argument('--min-leaf', type=int, default=20)
+    parser.add_argument('--per-season', action='store_true', help='grow a tree per season')
+    parser.add_argument('--processes', type=int, default=None)
+    args = parser.parse_args()
+
+    store = SeasonStore()
+    years = range(args.first, (args.last or args.first) + 1) if args.first else store.seasons
+    params = {'max_depth': args.max_depth, 'min_leaf': args.min_leaf}
+    if args.per_season:
+        for year, tree in sorted(fit_seasons(store, years, args.processes, **params).items()):
+            print year
+            print tree
+    else:
+        print fit_store(store, years, **params)
@@ -1,30 +1,36 @@
+import cPickle as pickle
+import functools
+import logging
 import time
 
-def timeit(method):
+from cache import get_cache
+from config import PAGE_TTL
+from metrics import get_metrics
 
+
+def timeit(method):
+    """
+    Decorator recording the time taken by each call of a method in the timeit.seconds metric.
+    """
+    @functools.wraps(method)
     def timed(*args, **kw):
         ts = time.time()
-        result = method(*args, **kw)
-        te = time.time()
-
-        print '%r (%r, %r) %2.2f sec' % \
-              (method.__name__, args, kw, te-ts)
-        return result
+        try:
+            return method(*args, **kw)
+        finally:
+            te = time.time()
+            get_metrics().observe('timeit.seconds', te - ts, function=method.__name__)
+            logging.debug('%s took %2.2f sec', method.__name__, te - ts)
 
     return timed
 
 
-import functools
-import logging
-import memcache
-
-client = memcache.Client(['127.0.0.1:11211'], debug=0)
-
-
-def cached(time=1200):
+def cached(time=PAGE_TTL):
   """
   Decorator that caches the result of a method for the specified time in seconds.
 
+  Results are pickled into the local page cache, keyed by the function and the repr of its arguments.
+
   Use it as:
 
     @cached(time=1200)
@@ -35,12 +41,16 @@ def cached(time=1200):
   def decorator(function):
     @functools.wraps(function)
     def wrapper(*args, **kwargs):
-      key = '%s%s%s' % (function.__name__, str(args), str(kwargs))
-      value = client.get(key)
-      logging.debug('Cache lookup for %s, found? %s', key, value != None)
-      if not value:
-        value = function(*args, **kwargs)
-        client.set(key, value, time=time)
+      key = '%s.%s%r%r' % (function.__module__, function.__name__, args, sorted(kwargs.items()))
+      data = get_cache().get(key)
+      logging.debug('Cache lookup for %s, found? %s', key, data is not None)
+      if data is not None:
+        get_metrics().increment('cached.hits', function=function.__name__)
+        return pickle.loads(data)
+
+      get_metrics().increment('cached.misses', function=function.__name__)
+      value = function(*args, **kwargs)
+      get_cache().set(key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), time)
       return value
     return wrapper
   return decorator
@@ -0,0 +1 @@
+var STATSLOPE_DATA = {"ranks":[[1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1],[3,2,2,2,2,2,2,3,2,2,2,2,2,2,2,2,4,2],[2,3,3,3,3,3,3,2,3,3,3,3,4,4,3,3,2,3],[4,4,4,4,4,4,4,4,4,4,5,4,3,3,4,4,3,4],[6,6,6,5,6,5,5,5,6,5,4,5,5,6,5,5,5,5],[9,8,7,7,7,7,7,7,8,8,7,7,8,7,7,7,7,6],[5,5,5,6,5,6,6,6,5,6,6,6,6,5,6,6,6,7],[14,10,14,14,13,8,11,10,9,9,10,8,9,9,8,8,10,8],[8,7,11,9,8,10,8,8,7,7,8,10,7,8,9,9,8,9],[7,9,9,12,14,11,10,9,13,11,12,13,11,10,10,11,9,10],[11,12,10,11,10,13,14,13,12,12,13,12,12,11,13,10,13,11],[10,11,8,8,9,9,9,11,10,10,9,9,10,13,11,12,11,12],[12,14,13,13,12,14,13,12,11,14,14,14,14,12,14,13,12,13],[13,13,12,10,11,12,12,14,14,13,11,11,13,14,12,14,14,14],[16,16,15,15,15,15,15,15,15,15,15,15,15,15,16,16,15,15],[15,15,16,16,16,16,16,16,16,16,16,16,16,16,15,15,16,16]],"slopes":[0.000697,0.000673,0.000487,0.00108,0.001712,0.003141,-0.000901,0.004213,0.001188,-0.000427,-0.00058,-0.001574,-0.000726,-0.001745,0.001208,0.001104],"stats":["ts_pct","efg_pct","fg_pct","fg","drb","fg3_pct","ast","fg3","trb","blk","stl","ft","tov","fta","orb","fga"],"values":[[0.8347,0.8439,0.855,0.839,0.8421,0.8297,0.8109,0.8272,0.842,0.8453,0.8488,0.8511,0.8416,0.8413,0.8519,0.8545,0.8444,0.8457],[0.7962,0.8191,0.8234,0.8122,0.811,0.7926,0.7928,0.7903,0.819,0.8008,0.8112,0.818,0.7943,0.8114,0.8182,0.8222,0.8117,0.8272],[0.8039,0.8105,0.8148,0.7997,0.8046,0.7682,0.781,0.7909,0.7975,0.7885,0.7962,0.8009,0.7813,0.8072,0.8096,0.8102,0.8152,0.8116],[0.7866,0.7976,0.7861,0.7839,0.7904,0.757,0.7665,0.7699,0.7785,0.773,0.772,0.7582,0.7854,0.8109,0.7879,0.7989,0.8134,0.8017],[0.7222,0.7389,0.7093,0.7293,0.7328,0.7233,0.7193,0.7317,0.7425,0.7551,0.7755,0.7392,0.7505,0.7321,0.7405,0.7449,0.7488,0.7514],[0.6267,0.6536,0.6497,0.6656,0.6758,0.6758,0.6713,0.6672,0.6667,0.657,0.6991,0.68,0.6574,0.6708,0.6821,0.6938,0.6964,0.7262],[0.7559,0.742,0.7307,0.7117,0.7329,0.7052,0.7094,0.7218,0.7447,0.7319,0.7189,0.7117,0.7207,0.7322,0.7212,0.7174,0.716,0.7261],[0.5765,0.6155,0.5933,0.5853,0.609,0.6378,0.6231,0.6356,0.6406,0.6391,0.633,0.6432,0.6449,0.6484,0.6472,0.6511,0.6399,0.6817],[0.6313,0.6613,0.6193,0.6275,0.6414,0.6274,0.654,0.6576,0.6696,0.6696,0.676,0.6364,0.685,0.6515,0.6418,0.6357,0.6656,0.6463],[0.6525,0.622,0.6203,0.5965,0.6048,0.6153,0.6237,0.6367,0.6024,0.6207,0.5995,0.5884,0.6054,0.6183,0.6379,0.5964,0.6412,0.6155],[0.6184,0.5995,0.6196,0.5984,0.6191,0.5917,0.5416,0.5799,0.625,0.6091,0.5882,0.5902,0.6031,0.6109,0.5831,0.6034,0.5803,0.6094],[0.6261,0.602,0.6377,0.6286,0.6195,0.6337,0.6274,0.6105,0.6375,0.6215,0.6414,0.6431,0.6094,0.5878,0.6242,0.5937,0.5981,0.594],[0.5998,0.5722,0.5981,0.5963,0.6133,0.5774,0.5733,0.5945,0.6294,0.585,0.5752,0.5805,0.5846,0.6074,0.5796,0.5841,0.5824,0.575],[0.5888,0.5864,0.6115,0.6061,0.6185,0.6125,0.6203,0.5718,0.585,0.6022,0.6284,0.6163,0.5909,0.5872,0.586,0.5625,0.5656,0.5738],[0.4542,0.4556,0.4592,0.4592,0.4784,0.4575,0.4926,0.4896,0.4799,0.4925,0.4863,0.4528,0.5171,0.4802,0.4459,0.4548,0.4905,0.4903],[0.4587,0.4682,0.4488,0.4478,0.4584,0.425,0.454,0.4868,0.4715,0.4618,0.4363,0.4283,0.5054,0.4714,0.4508,0.4674,0.4671,0.4835]],"years":[2000,2001,2002,2003,2004,2005,2006,2007,2008,2009,2010,2011,2012,2013,2014,2015,2016,2017]};
@@ -1,33 +1,19 @@
-import csv
-import json
-import operator
-from collections import OrderedDict
+"""
+Write data.json, the data bundle of trend.html, from the season store. See scraper/statslope.py.
 
-with open('all_year_data.csv') as data:
-    reader = csv.DictReader(data)
-    rows = list(reader)
+Use it as:
 
+    python statslope/parse.py
+"""
+import os
+import sys
 
-# process rows
-for row in rows:
-    year = row['']
-    row['year'] = year
-    del row['']
-    del row['total_win']
-    del row['total_win_pct']
-    for k, v in row.iteritems():
-        if '_pct' in k:
-            k = k.replace('_pct', '%')
-        if k == 'year':
-            row[k] = int(v)
-        else:
-            row[k] = float(v)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
 
-last_yr =  rows[-1]
-import pdb; pdb.set_trace()
+from scraper.aggregates import SeasonCounts
+from scraper.statslope import write_bundle
+from scraper.store import SeasonStore
 
-# sort by stat values descending from the last year
-
-
-with open('parsed_data.json', 'w') as f:
-    json.dump(rows, f)
+if __name__ == '__main__':
+    path = write_bundle(SeasonCounts(SeasonStore()).tables(), os.path.dirname(os.path.abspath(__file__)))
+    print 'wrote {0}'.format(path)
@@ -0,0 +1,139 @@
+import os
+import shutil
+import tempfile
+import unittest
+import warnings
+
+import numpy as np
+from pandas import read_csv
+
+from scraper.aggregates import (SeasonCounts, SeasonTables, TeamCounts, season_counts, stat_breakdown, team_counts,
+                                total_stat_wins, totals, zscores)
+from scraper.config import BREAKDOWN_STATS, ROOT_DIR, SEASONS
+from scraper.records import OutcomeTable
+from scraper.store import SeasonStore, StoreWriter, convert_csvs
+from scraper.teamscrape import calc_team_gain
+from scraper.teamscrape_refactored import TeamScraper
+
+
+def _read(name):
+    return read_csv(os.path.join(ROOT_DIR, name), index_col=0)
+
+
+class TestAggregates(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.mkdtemp()
+        cls.store = convert_csvs(SEASONS, os.path.join(cls.directory, 'store'))
+        cls.seasons = SeasonCounts(cls.store).by_stat()
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.directory)
+
+    def test_matches_season_tables(self):
+        expected = _read('totals.csv')
+        self.assertTrue((totals(self.seasons)[expected.columns] == expected).all().all())
+
+        expected = _read('total_stat_wins_for_winning_teams.csv')
+        self.assertTrue(np.allclose(total_stat_wins(self.seasons).values, expected.values))
+
+        expected = _read('zscores.csv')
+        self.assertTrue(np.allclose(zscores(self.seasons)[expected.columns].values, expected.values))
+
+        expected = _read('stat_breakdown_2016.csv')
+        self.assertTrue((stat_breakdown(self.seasons[2016]) == expected).all().all())
+
+    def test_single_pass_matches_saved_counters(self):
+        store = SeasonStore(self.store.directory)
+        counts = SeasonCounts(store)
+        tables = SeasonTables.from_store(store)
+        self.assertEqual(tables.years, sorted(store.seasons))
+        self.assertTrue((tables.counts == np.array([counts.get(year) for year in tables.years])).all())
+
+        by_stat = SeasonTables.from_seasons(counts.by_stat())
+        self.assertTrue(tables.all_year_data().equals(by_stat.all_year_data()))
+        self.assertTrue(tables.stat_breakdown(2016).equals(by_stat.stat_breakdown(2016)))
+
+        # the streamed mean and variance agree with pandas' over the whole table.
+        win_pcts = tables.win_pcts(BREAKDOWN_STATS)
+        expected = (win_pcts - win_pcts.mean()) / win_pcts.std(ddof=0)
+        self.assertTrue(np.allclose(tables.zscores().values, expected.values))
+
+        # a single season has no spread.
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')
+            self.assertTrue(SeasonTables.from_store(store, [2016]).zscores().isnull().values.all())
+
+    def test_counts_follow_appended_rows(self):
+        before = SeasonCounts(self.store).get(2017)
+
+        frame = self.store.season(2017).to_frame().head(4)
+        writer = StoreWriter(self.store.directory)
+        writer.append_season(2017, frame[writer.meta['stats']].values, list(frame['team']))
+        writer.close()
+
+        store = SeasonStore(self.store.directory)
+        after = SeasonCounts(store).get(2017)
+        self.assertEqual(after[0, 0], before[0, 0] + 4)
+        self.assertTrue((after == season_counts(store.season(2017).outcomes, store.stat_index('win'))).all())
+
+
+class TestTeamCounts(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.store = convert_csvs([2016, 2017], os.path.join(self.directory, 'store'))
+        self.index = TeamCounts(self.store)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_matches_scans_of_games(self):
+        # the league-wide roll-up of a season is the season's counters.
+        self.assertTrue((self.index.counts(years=[2017]) == SeasonCounts(self.store).get(2017)).all())
+
+        records = OutcomeTable.from_frame(self.store.season(2017).to_frame().query('team == "gsw"'))
+        self.assertEqual(self.index.importance('gsw', [2017]), TeamScraper('gsw').stat_importance(records))
+
+        gains = calc_team_gain(records)
+        table = self.index.table('gsw', [2017])
+        for stat in ('fg', 'ast', 'tov', 'fg_pct'):
+            self.assertEqual(table.loc[stat, 'gain'], gains[stat])
+
+        summary = self.index.summary('fg', 'gsw', [2017])
+        self.assertEqual(summary['ties'], summary['rows'] - summary['won'] - summary['lost'])
+        self.assertAlmostEqual(summary['adj_pct'], summary['win_pct'] - summary['base_pct'])
+
+        both = self.index.counts('gsw')
+        self.assertTrue((both == self.index.counts('gsw', [2016]) + self.index.counts('gsw', [2017])).all())
+
+    def test_importance_of_a_stat_never_won(self):
+        frame = self.store.season(2016).to_frame().query('team == "gsw"').copy()
+        frame['fg'] = 0
+        writer = StoreWriter(self.store.directory)
+        writer.write_frame(2016, frame)
+        writer.close()
+
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')
+            importance = TeamScraper('gsw').stat_importance(OutcomeTable.from_frame(frame))
+        self.assertEqual(importance['diffs']['fg'], {'pct_diff': None, 'total': 0})
+        self.assertEqual(TeamCounts(SeasonStore(self.store.directory)).importance('gsw', [2016]), importance)
+
+    def test_counts_follow_appended_rows(self):
+        before = self.index.counts('gsw', [2017])
+
+        frame = self.store.season(2017).to_frame().query('team == "gsw"').head(3)
+        writer = StoreWriter(self.store.directory)
+        writer.append_season(2017, frame[writer.meta['stats']].values, list(frame['team']))
+        writer.close()
+
+        store = SeasonStore(self.store.directory)
+        after = TeamCounts(store).counts('gsw', [2017])
+        self.assertEqual(after[0, 0], before[0, 0] + 3)
+
+        season = store.season(2017)
+        expected = team_counts(season.outcomes, store.stat_index('win'), season.team, len(store.teams))
+        self.assertTrue((after == expected[store.team_code('gsw')]).all())
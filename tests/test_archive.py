@@ -0,0 +1,78 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from requests.exceptions import HTTPError
+
+from benchmarks.server import FixtureServer
+from scraper.archive import PageArchive
+from scraper.fetch import Fetcher
+from scraper.ingest import get_season_links
+from scraper.transport import HttpTransport, RecordTransport, ReplayTransport
+
+
+class TestPageArchive(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'pages.archive')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_put_and_get(self):
+        archive = PageArchive(self.path)
+        archive.put('http://a', u'first \u2013 page')
+        archive.put('http://b', u'second page')
+        archive.put('http://a', u'first page, again')
+
+        self.assertEqual(archive.get('http://a'), u'first page, again')
+        self.assertEqual(archive.get('http://b'), u'second page')
+        self.assertIsNone(archive.get('http://c'))
+
+        # another reader sees pages appended after it opened the archive.
+        other = PageArchive(self.path)
+        archive.put('http://c', u'third page')
+        self.assertEqual(other.get('http://c'), u'third page')
+        self.assertEqual(sorted(other.urls()), ['http://a', 'http://b', 'http://c'])
+
+    def test_recovers_from_crashes(self):
+        archive = PageArchive(self.path)
+        archive.put('http://a', u'first page')
+        archive.put('http://b', u'second page')
+
+        # a missing index is rebuilt from the archive's records.
+        os.remove(self.path + '.idx')
+        self.assertEqual(PageArchive(self.path).get('http://b'), u'second page')
+
+        # a record cut short is dropped by the next write.
+        with open(self.path, 'ab') as f:
+            f.write(b'PAGE\x00\x08')
+        archive = PageArchive(self.path)
+        archive.put('http://c', u'third page')
+        self.assertEqual(PageArchive(self.path).get('http://c'), u'third page')
+        self.assertEqual(len(PageArchive(self.path)), 3)
+
+
+class TestTransports(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.archive = PageArchive(os.path.join(self.directory, 'pages.archive'))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_record_and_replay(self):
+        with FixtureServer() as server:
+            recorder = server.install(Fetcher(rate=0, retries=0, transport=RecordTransport(self.archive, HttpTransport())))
+            links = get_season_links(2017, recorder)
+            pages = recorder.map(recorder.get, links[:10])
+
+        replayer = Fetcher(retries=0, transport=ReplayTransport(PageArchive(self.archive.path)))
+        self.assertEqual(get_season_links(2017, replayer), links)
+        self.assertEqual(replayer.map(replayer.get, links[:10]), pages)
+
+        with self.assertRaises(HTTPError):
+            replayer.get(links[10])
@@ -0,0 +1,28 @@
+import unittest
+
+from benchmarks.run import compare, result
+from benchmarks.server import FixtureServer
+from scraper.fetch import Fetcher
+from scraper.ingest import get_season_links
+from scraper.parsers import parse_team_totals
+
+
+class TestFixtureServer(unittest.TestCase):
+
+    def test_serves_recorded_pages(self):
+        with FixtureServer() as server:
+            fetcher = server.install(Fetcher(rate=0, retries=0, cache=None))
+            links = get_season_links(2017, fetcher)
+            self.assertEqual(len(links), 217)
+            self.assertTrue(links[0].startswith('http://www.basketball-reference.com/boxscores/'))
+
+            self.assertEqual(len(parse_team_totals(fetcher.get(links[0]))), 2)
+            self.assertEqual(server.requests, 9)
+
+
+class TestCompare(unittest.TestCase):
+
+    def test_flags_regressions(self):
+        baseline = {'parse': result(2.0, 'ms'), 'fetch': result(100.0, 'pages/s', 'higher')}
+        rows = compare({'parse': result(2.1, 'ms'), 'fetch': result(80.0, 'pages/s', 'higher')}, baseline)
+        self.assertEqual([(name, regressed) for name, _, _, _, regressed in rows], [('fetch', True), ('parse', False)])
@@ -0,0 +1,61 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+from pandas import concat
+
+from scraper.bitmaps import Bitmap, BitmapIndex
+from scraper.store import LOST, convert_csvs
+
+
+class TestBitmapIndex(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.mkdtemp()
+        store = convert_csvs([2016, 2017], os.path.join(cls.directory, 'store'))
+        cls.index = BitmapIndex.from_store(store)
+        frames = []
+        for season in store:
+            frame = season.to_frame()
+            frame['season'] = season.year
+            frames.append(frame)
+        cls.frame = concat(frames)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.directory)
+
+    def test_matches_scans_of_games(self):
+        frame = self.frame
+        rows = (frame['efg_pct'] == 1) & (frame['orb'] == 1) & (frame['tov'] == 0)
+        result = self.index.query(won=['efg_pct', 'orb'], lost=['tov'])
+        self.assertEqual(result['games'], rows.sum())
+        self.assertEqual(result['wins'], (frame['win'][rows] == 1).sum())
+
+        rows = ((frame['ast'] == 1) | (frame['stl'] != 1)) & (frame['season'] == 2017) & (frame['team'] == 'gsw')
+        games = (self.index.won('ast') | ~self.index.won('stl')) & self.index.where(seasons=[2017], team='gsw')
+        self.assertEqual(games.count(), rows.sum())
+        self.assertAlmostEqual(self.index.win_pct(games), (frame['win'][rows] == 1).mean())
+
+    def test_no_seasons_match_no_rows(self):
+        self.assertEqual(self.index.where(seasons=[]).count(), 0)
+        self.assertEqual(self.index.query(seasons=[])['win_pct'], None)
+
+    def test_rank(self):
+        pairs = self.index.rank(2, min_games=200)
+        self.assertTrue((np.diff(pairs['win_pct'].values) <= 0).all())
+        best = pairs.iloc[0]
+        self.assertEqual(best['games'], self.index.query(won=best['stats'])['games'])
+
+        triples = self.index.rank(3, outcome=LOST, stats=['fg', 'ast', 'tov', 'drb'])
+        self.assertEqual(len(triples), 4)
+        row = triples[triples['stats'] == ('fg', 'ast', 'drb')].iloc[0]
+        self.assertEqual(row['wins'], self.index.query(lost=['fg', 'ast', 'drb'])['wins'])
+
+    def test_invert_ignores_padding(self):
+        bitmap = Bitmap.from_mask([True, False, True])
+        self.assertEqual((~bitmap).count(), 1)
+        self.assertEqual(list((~bitmap).to_mask()), [False, True, False])
@@ -0,0 +1,75 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from scraper.cache import DiskStore, LRUCache, TieredCache, set_cache
+from scraper.utils import cached
+
+
+class TestCache(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        set_cache(None)
+        shutil.rmtree(self.directory)
+
+    def test_lru_evicts_by_size(self):
+        lru = LRUCache(max_bytes=10)
+        expires = time.time() + 60
+        lru.set('a', 'x' * 4, expires)
+        lru.set('b', 'x' * 4, expires)
+        lru.get('a')
+        lru.set('c', 'x' * 4, expires)
+
+        self.assertEqual(lru.get('b'), None)
+        self.assertEqual(lru.get('a'), 'xxxx')
+        self.assertEqual(lru.size, 8)
+        self.assertEqual(lru.evictions, 1)
+
+    def test_disk_store_shares_identical_content(self):
+        disk = DiskStore(self.directory)
+        expires = time.time() + 60
+        disk.set('page:a', '<html></html>', expires)
+        disk.set('page:b', '<html></html>', expires)
+        disk.set('page:old', '<html>old</html>', time.time() - 1)
+
+        objects = [name for _, _, files in os.walk(os.path.join(self.directory, 'objects')) for name in files]
+        self.assertEqual(len(objects), 2)
+        self.assertEqual(disk.get('page:b'), '<html></html>')
+        self.assertEqual(disk.get('page:old'), None)
+        self.assertEqual(disk.prune(), 1)
+
+    def test_disk_store_prunes_when_over_budget(self):
+        disk = DiskStore(self.directory, level=0, max_bytes=1024)
+        disk.set('page:old', 'x' * 600, time.time() - 1)
+        disk.set('page:a', 'y' * 600, time.time() + 60)
+
+        objects = [name for _, _, files in os.walk(os.path.join(self.directory, 'objects')) for name in files]
+        self.assertEqual(len(objects), 1)
+        self.assertEqual(disk.get('page:a'), 'y' * 600)
+        self.assertEqual(disk.prune(), 0)
+
+    def test_tiered_cache_promotes_from_disk(self):
+        disk = DiskStore(self.directory)
+        TieredCache(disk=disk).set('page:a', '<html></html>', 60)
+
+        cache = TieredCache(disk=disk)
+        self.assertEqual(cache.get('page:a'), '<html></html>')
+        self.assertEqual(cache.memory.get('page:a'), '<html></html>')
+
+    def test_cached_keeps_falsy_results(self):
+        set_cache(TieredCache(disk=DiskStore(self.directory)))
+        calls = []
+
+        @cached(60)
+        def empty_links(url):
+            calls.append(url)
+            return []
+
+        self.assertEqual(empty_links('http://example.com'), [])
+        self.assertEqual(empty_links('http://example.com'), [])
+        self.assertEqual(calls, ['http://example.com'])
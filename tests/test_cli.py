@@ -0,0 +1,97 @@
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from StringIO import StringIO
+
+import numpy as np
+
+from scraper.aggregates import TeamCounts
+from scraper import config
+from scraper.cli import main
+from scraper.store import SeasonStore, convert_csvs
+
+
+class TestCli(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.store_dir = os.path.join(self.directory, 'store')
+        convert_csvs([2016, 2017], self.store_dir)
+        self.cache_dir, config.CACHE_DIR = config.CACHE_DIR, os.path.join(self.directory, 'cache')
+
+    def tearDown(self):
+        config.CACHE_DIR = self.cache_dir
+        shutil.rmtree(self.directory)
+
+    def run_cli(self, *argv):
+        stdout, sys.stdout = sys.stdout, StringIO()
+        try:
+            main(list(argv) + ['--store', self.store_dir])
+            return sys.stdout.getvalue()
+        finally:
+            sys.stdout = stdout
+
+    def test_gain(self):
+        rows = json.loads(self.run_cli('gain', '--team', 'gsw', '--seasons', '2017', '--json'))
+        store = SeasonStore(self.store_dir)
+        columns = TeamCounts(store).columns('gsw', [2017])
+        for row in rows:
+            self.assertAlmostEqual(row['gain'], columns['gain'][store.stat_index(row['stat'])])
+        self.assertEqual([row['gain'] for row in rows], sorted((row['gain'] for row in rows), reverse=True))
+        self.assertNotIn('win', [row['stat'] for row in rows])
+
+    def test_importance_is_cached_until_the_store_changes(self):
+        output = self.run_cli('importance', '--seasons', '2016-2017')
+        self.assertEqual(output.splitlines()[0].split(), ['stat', 'win_pct', 'adj_pct', 'won', 'tie_rate'])
+        queries = os.path.join(self.directory, 'cache', 'queries')
+        self.assertEqual(len(os.listdir(queries)), 1)
+        self.assertNotIn('queries', os.listdir(self.store_dir))
+
+        # a cached answer is printed as it is, however stale.
+        path = os.path.join(queries, os.listdir(queries)[0])
+        with open(path) as f:
+            entry = json.load(f)
+        entry['output'] = 'cached'
+        with open(path, 'w') as f:
+            json.dump(entry, f)
+        self.assertEqual(self.run_cli('importance', '--seasons', '2016-2017'), 'cached\n')
+
+        counts = os.path.join(self.store_dir, '2017', 'team_counts.npy')
+        np.save(counts, np.load(counts))
+        os.utime(counts, (0, 0))
+        self.assertEqual(self.run_cli('importance', '--seasons', '2016-2017'), output)
+
+        # without a cache to write to, the output is printed all the same.
+        shutil.rmtree(queries)
+        config.CACHE_DIR = os.path.join(self.store_dir, 'meta.json')
+        self.assertEqual(self.run_cli('importance', '--seasons', '2016-2017'), output)
+
+    def test_usage_errors(self):
+        for argv in (['gain', '--seasons', '2017-2015'], ['gain', '--seasons', 'last'], ['gain', '--team', 'xxx'],
+                     ['importance', '--seasons', '1999'], ['matchup', 'gsw', 'gsw'], ['matchup', '--bins', '0,.6,.4']):
+            stderr, sys.stderr = sys.stderr, StringIO()
+            try:
+                with self.assertRaises(SystemExit) as raised:
+                    self.run_cli(*argv)
+            finally:
+                sys.stderr = stderr
+            self.assertEqual(raised.exception.code, 2, argv)
+
+    def test_export_statslope(self):
+        output = self.run_cli('export', 'statslope', '--out', self.directory)
+        self.assertIn('data.json', output)
+        with open(os.path.join(self.directory, 'data.json')) as f:
+            self.assertEqual(json.load(f)['years'], [2016, 2017])
+
+    def test_rebuild_into_given_directories(self):
+        tables, build = os.path.join(self.directory, 'tables'), os.path.join(self.directory, 'build')
+        os.makedirs(tables)
+        output = self.run_cli('rebuild', '2016', '2017', '--no-scrape', '--processes', '1', '--tables', tables,
+                              '--build', build)
+        self.assertIn('ran', output)
+        self.assertTrue(os.path.exists(os.path.join(tables, 'totals.csv')))
+        self.assertTrue(os.path.exists(os.path.join(build, 'manifest.json')))
+        self.assertEqual(SeasonStore(self.store_dir).seasons, [2016, 2017])
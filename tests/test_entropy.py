@@ -0,0 +1,38 @@
+import os
+import unittest
+
+import numpy as np
+from pandas import read_csv
+
+from entropy import gain, gain_all, gain_table
+
+DATA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data.csv')
+
+
+class TestEntropy(unittest.TestCase):
+
+    def setUp(self):
+        self.frame = read_csv(DATA, index_col=0)
+        self.stats = [column for column in self.frame.columns if column != 'team']
+
+    def test_gain_all_matches_gain(self):
+        records = self.frame.to_dict('records')
+        entropy, gains = gain_all(self.frame[self.stats].values, self.frame['win'].values)
+
+        self.assertEqual(list(gains), [gain(records, stat, 'win') for stat in self.stats])
+        self.assertEqual(len(entropy), len(self.stats))
+
+    def test_ties_are_left_out(self):
+        outcomes = np.array([[1, 0.5], [0, 0.5], [0.5, 0.5], [1, 1]])
+        win = np.array([1, 0, 1, 0])
+        _, gains = gain_all(outcomes, win)
+
+        records = [{'a': a, 'b': b, 'win': w} for (a, b), w in zip(outcomes, win)]
+        self.assertEqual(list(gains), [gain(records, 'a', 'win'), gain(records, 'b', 'win')])
+        self.assertEqual(gains[1], 0.0)
+
+    def test_gain_table_by_team(self):
+        table = gain_table(self.frame, self.stats, by='team')
+        for team, rows in self.frame.groupby('team'):
+            records = rows.to_dict('records')
+            self.assertEqual(list(table.loc[team]), [gain(records, stat, 'win') for stat in self.stats])
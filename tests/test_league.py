@@ -0,0 +1,26 @@
+import unittest
+
+from benchmarks.server import FixtureServer
+from scraper.fetch import Fetcher
+from scraper.teamscrape_refactored import BASE_URL, TeamScraper, winners_for_stat
+
+CLE = BASE_URL + '/boxscores/201610250CLE.html'
+GSW = BASE_URL + '/boxscores/201610250GSW.html'
+
+
+class TestLeague(unittest.TestCase):
+
+    def test_fetches_each_game_once(self):
+        team_links = {'cle': [CLE], 'nyk': [CLE], 'gsw': [GSW], 'sas': [GSW]}
+        teams = ['cle', 'nyk', 'gsw', 'sas']
+        with FixtureServer() as server:
+            fetcher = server.install(Fetcher(rate=0, retries=0, cache=None))
+            league = TeamScraper.get_league_data(winners_for_stat, teams, team_links, fetcher)
+            self.assertEqual(server.requests, 2)
+
+        # both sides of a game are routed to their teams.
+        self.assertEqual(league['cle'][0].team, 'cle')
+        self.assertEqual(league['nyk'][0].team, 'nyk')
+        self.assertEqual(league['cle'][0]['win'] + league['nyk'][0]['win'], 1)
+        self.assertEqual(league['gsw'][0].team, 'gsw')
+        self.assertEqual(league['sas'][0].team, 'sas')
@@ -0,0 +1,68 @@
+import glob
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from scraper.ingest import check_aligned
+from scraper.margins import MarginStore, write_season
+from scraper.parsers import parse_team_totals
+from scraper.records import OutcomeTable
+from scraper.store import WON
+from scraper.teamscrape import IGNORED_CAT, game_outcomes
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures', 'boxscores')
+
+
+class TestMarginStore(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.box_scores = []
+        for path in sorted(glob.glob(os.path.join(FIXTURES, '*.html'))):
+            with open(path) as f:
+                self.box_scores.append(parse_team_totals(f.read(), IGNORED_CAT).items())
+        write_season(2017, self.box_scores, self.directory)
+        self.store = MarginStore(self.directory)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_outcomes_match_scraped_outcomes(self):
+        games = OutcomeTable.from_games(game_outcomes(dict(box_score)) for box_score in self.box_scores)
+        stats = [stat for stat in games.stats if stat != 'win']
+        codes, won = self.store.outcomes(stats)
+        self.assertTrue((codes == games.codes[:, [games.stats.index(stat) for stat in stats]]).all())
+        self.assertTrue((won == (games.column('win') == WON)).all())
+
+        # a stat won by less than the threshold is a tie.
+        margins, _ = self.store.advantages('ast')
+        codes, _ = self.store.outcomes(['ast'], threshold={'ast': 5})
+        self.assertTrue((codes[np.abs(margins) < 5, 0] != WON).all())
+
+    def test_win_probability(self):
+        margins, won = self.store.advantages('tov')
+        curve = self.store.win_probability('tov', thresholds=[-100, 0, 3, 100])
+        self.assertEqual(list(curve['games']), [6, (margins >= 0).sum(), (margins >= 3).sum(), 0])
+        self.assertEqual(curve['wins'][0], 3)
+        self.assertEqual(curve['wins'][1], (won & (margins >= 0)).sum())
+
+        binned = self.store.binned('tov', bins=[-50, 0, 50])
+        self.assertEqual(binned['games'].sum(), 6)
+        self.assertEqual(binned['wins'].sum(), 3)
+
+    def test_append(self):
+        # the games of a season not in the store would be numbered from 0.
+        self.assertRaises(ValueError, write_season, 2016, self.box_scores[:1], self.directory, append=True)
+        write_season(2017, self.box_scores[:1], self.directory, append=True)
+        season = MarginStore(self.directory).season(2017)
+        self.assertEqual(len(season), 8)
+        self.assertTrue((season.totals[6:] == season.totals[:2]).all())
+        self.assertTrue((season.margins[0::2] == -season.margins[1::2]).all())
+
+    def test_ingest_checks_alignment(self):
+        check_aligned(2017, 3, self.directory, None)
+        self.assertRaises(ValueError, check_aligned, 2017, 4, self.directory, None)
+        self.assertRaises(ValueError, check_aligned, 2016, 3, self.directory, None)
@@ -0,0 +1,91 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+from pandas import read_csv
+
+from scraper.aggregates import TeamCounts
+from scraper.config import RAW_GAME_DATA
+from scraper.matchups import MatchupCounts
+from scraper.records import OutcomeTable
+from scraper.store import SeasonStore, StoreWriter, convert_csvs
+
+
+class TestMatchupCounts(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.store = convert_csvs([2016, 2017], os.path.join(self.directory, 'store'))
+        self.index = MatchupCounts(self.store)
+
+        # the games of 2017 as scraped, each row beside its opponent.
+        self.frame = read_csv(RAW_GAME_DATA.format(2017), index_col=0)
+        teams = self.frame['team'].values
+        self.frame['opponent'] = teams[np.arange(len(teams)) ^ 1]
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_pairs_the_sides_of_every_game(self):
+        season = self.store.season(2017)
+        opponents = np.asarray(self.store.teams)[self.index.opponent(2017)]
+        self.assertTrue((opponents == self.frame['opponent'].values[np.asarray(season.row)]).all())
+
+        rows = self.index.rows(2017, 'gsw', 'cle')
+        games = self.frame[(self.frame['team'] == 'gsw') & (self.frame['opponent'] == 'cle')]
+        self.assertEqual(rows.tolist(), games.index.tolist())
+
+    def test_head_to_head_matches_scans_of_games(self):
+        # every opponent together is the team's record.
+        teams = TeamCounts(self.store)
+        self.assertTrue((self.index.counts('gsw') == teams.counts('gsw')).all())
+        self.assertTrue((self.index.counts() == teams.counts()).all())
+
+        games = self.frame[(self.frame['team'] == 'gsw') & (self.frame['opponent'] == 'cle')]
+        table = self.index.head_to_head('gsw', 'cle', [2017])
+        for stat in ('fg', 'ast', 'tov'):
+            self.assertEqual(table.loc[stat, 'rows'], len(games))
+            self.assertEqual(table.loc[stat, 'won'], (games[stat] == 1).sum())
+            self.assertEqual(table.loc[stat, 'won_wins'], ((games[stat] == 1) & (games['win'] == 1)).sum())
+
+        diffs = self.index.importance('gsw', 'cle', [2017])['diffs']
+        self.assertEqual(diffs['base_win_pct'], round(games['win'].mean(), 3))
+        self.assertEqual(diffs['ast']['pct_diff'], round(games['win'][games['ast'] == 1].mean(), 3))
+
+        records = OutcomeTable.from_frame(games.drop('opponent', axis=1))
+        self.assertEqual(len(self.index.games('gsw', 'cle', [2017])), len(games))
+        self.assertTrue((self.index.games('gsw', 'cle', [2017]).codes == records.codes).all())
+
+    def test_by_strength(self):
+        win_pct = self.frame.groupby('team')['win'].mean()
+        strength = win_pct[self.frame['opponent']].values
+        bins = [0, .4, .6, 1]
+        frame = self.index.by_strength(bins=bins, years=[2017], stats=['ast'])
+
+        for (low, high), row in zip(zip(bins[:-1], bins[1:]), frame.itertuples()):
+            games = self.frame[(strength >= low) & ((strength < high) | (high == bins[-1]) & (strength <= high))]
+            self.assertEqual(row.games, len(games))
+            self.assertEqual(row.wins, games['win'].sum())
+            self.assertAlmostEqual(row.ast, games['win'][games['ast'] == 1].mean())
+        self.assertEqual(frame['games'].sum(), len(self.frame))
+
+        team = self.index.by_strength('gsw', bins=bins, years=[2017])
+        self.assertEqual(team['games'].sum(), (self.frame['team'] == 'gsw').sum())
+
+        self.assertRaises(ValueError, self.index.by_strength, bins=[0, .6, .4, 1])
+        self.assertRaises(ValueError, self.index.by_strength, bins=[.5])
+        self.assertRaises(ValueError, self.index.head_to_head, 'gsw', 'gsw')
+
+    def test_counts_follow_appended_rows(self):
+        self.index.get(2017)
+        frame = self.store.season(2017).to_frame().head(4)
+        writer = StoreWriter(self.store.directory)
+        writer.append_season(2017, frame[writer.meta['stats']].values, list(frame['team']))
+        writer.close()
+
+        index = MatchupCounts(SeasonStore(self.store.directory))
+        self.assertEqual(self.index.counts(frame['team'][0], frame['team'][1], [2017])[0, 0] + 1,
+                         index.counts(frame['team'][0], frame['team'][1], [2017])[0, 0])
+        self.assertTrue((index.counts(years=[2017]) == TeamCounts(index.store).counts(years=[2017])).all())
@@ -0,0 +1,75 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from benchmarks.server import FixtureServer
+from scraper.cache import DiskStore, LRUCache, TieredCache
+from scraper.fetch import Fetcher
+from scraper.metrics import Registry, get_metrics
+from scraper.transport import HttpTransport
+
+
+class TestRegistry(unittest.TestCase):
+
+    def test_counters_and_histograms(self):
+        metrics = Registry()
+        metrics.increment('fetch.requests', status=200)
+        metrics.increment('fetch.requests', 2, status=200)
+        metrics.increment('fetch.requests', status=503)
+        for value in (0.002, 0.02, 20.0):
+            metrics.observe('parse.seconds', value, backend='scan')
+
+        self.assertEqual(metrics.counter('fetch.requests', status=200), 3)
+        self.assertEqual(metrics.counter('fetch.requests', status=404), 0)
+        histogram = metrics.histogram('parse.seconds', backend='scan')
+        self.assertEqual((histogram.count, histogram.min, histogram.max), (3, 0.002, 20.0))
+
+        # a worker's snapshot merges into the parent's registry.
+        parent = Registry()
+        parent.increment('fetch.requests', status=200)
+        parent.set_gauge('memory.peak_bytes', 10)
+        metrics.set_gauge('memory.peak_bytes', 5)
+        parent.merge(metrics.snapshot())
+        self.assertEqual(parent.counter('fetch.requests', status=200), 4)
+        self.assertEqual(parent.histogram('parse.seconds', backend='scan').count, 3)
+        self.assertEqual(parent.snapshot()['gauges'][0]['value'], 10)
+
+    def test_prometheus(self):
+        metrics = Registry()
+        metrics.increment('cache.hits', tier='disk')
+        metrics.observe('gain.seconds', 0.003)
+        metrics.observe('gain.seconds', 0.2)
+
+        lines = metrics.to_prometheus().splitlines()
+        self.assertIn('# TYPE datascience_cache_hits_total counter', lines)
+        self.assertIn('datascience_cache_hits_total{tier="disk"} 1', lines)
+        self.assertIn('datascience_gain_seconds_bucket{le="0.005"} 1', lines)
+        self.assertIn('datascience_gain_seconds_bucket{le="+Inf"} 2', lines)
+        self.assertIn('datascience_gain_seconds_count 2', lines)
+
+
+class TestInstrumentation(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        get_metrics().reset()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        get_metrics().reset()
+
+    def test_fetch_and_cache(self):
+        metrics = get_metrics()
+        cache = TieredCache(LRUCache(), DiskStore(self.directory))
+        url = 'http://www.basketball-reference.com/boxscores/201610250CLE.html'
+        with FixtureServer() as server:
+            fetcher = server.install(Fetcher(rate=0, retries=0, cache=cache, transport=HttpTransport()))
+            fetcher.get(url)
+            fetcher.get(url)
+
+        self.assertEqual(metrics.counter('fetch.requests', transport='http', status=200), 1)
+        self.assertEqual(metrics.counter('fetch.bytes', transport='http'), server.bytes_sent)
+        self.assertEqual(metrics.histogram('fetch.latency_seconds', transport='http').count, 1)
+        self.assertEqual(metrics.counter('cache.misses'), 1)
+        self.assertEqual(metrics.counter('cache.hits', tier='memory'), 1)
@@ -0,0 +1,45 @@
+import glob
+import os
+import unittest
+
+from scraper.parsers import PARSERS, bs4_player_rows, parse_box_score, parse_team_totals
+
+BOX_SCORES = sorted(glob.glob(os.path.join(os.path.dirname(__file__), 'fixtures', 'boxscores', '*.html')))
+
+
+class TestParsers(unittest.TestCase):
+
+    def test_backends_match_bs4(self):
+        for path in BOX_SCORES:
+            with open(path) as f:
+                html = f.read().decode('utf-8')
+            expected = parse_team_totals(html, backend='bs4')
+            self.assertEqual(len(expected), 2)
+            for backend in PARSERS:
+                self.assertEqual(parse_team_totals(html, backend=backend), expected, (path, backend))
+
+    def test_reads_basic_and_advanced_totals(self):
+        with open(BOX_SCORES[0]) as f:
+            team_to_stats = parse_team_totals(f.read().decode('utf-8'))
+        for stats in team_to_stats.values():
+            self.assertIn('pts', stats)
+            self.assertIn('efg_pct', stats)
+            self.assertNotIn('plus_minus', stats)
+
+    def test_box_score_reads_players_in_the_same_pass(self):
+        for path in BOX_SCORES:
+            with open(path) as f:
+                html = f.read().decode('utf-8')
+            team_to_stats, team_to_players = parse_box_score(html)
+            self.assertEqual(team_to_stats, parse_team_totals(html))
+            self.assertEqual(team_to_players, bs4_player_rows(html))
+            for backend in PARSERS:
+                self.assertEqual(parse_box_score(html, backend=backend), (team_to_stats, team_to_players))
+
+            for team, players in team_to_players.items():
+                self.assertEqual(sum(stats['pts'] for _, stats in players), team_to_stats[team]['pts'])
+                # basic and advanced rows are merged, minutes are in seconds, and players who did not play are left out.
+                for player, stats in players:
+                    self.assertIn('usg_pct', stats)
+                    self.assertGreater(stats['mp'], 0)
+                    self.assertEqual(stats['mp'], int(stats['mp']))
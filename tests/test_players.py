@@ -0,0 +1,125 @@
+import glob
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from StringIO import StringIO
+
+import numpy as np
+
+from scraper.cli import main
+from scraper.parsers import parse_box_score
+from scraper.players import PlayerStore, write_season
+from scraper.teamscrape import IGNORED_CAT
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures', 'boxscores')
+
+
+class TestPlayerStore(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.box_scores = []
+        self.totals = []
+        for path in sorted(glob.glob(os.path.join(FIXTURES, '*.html'))):
+            with open(path) as f:
+                team_to_stats, team_to_players = parse_box_score(f.read(), IGNORED_CAT)
+            self.totals.append(team_to_stats.items())
+            self.box_scores.append([(team, team_to_players[team]) for team, _ in team_to_stats.items()])
+        write_season(2017, self.box_scores, self.directory)
+        self.store = PlayerStore(self.directory)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_indexes(self):
+        season = self.store.season(2017)
+        self.assertEqual(season.games, 3)
+        for n, box_score in enumerate(self.box_scores):
+            rows = season.game(n)
+            self.assertEqual(rows.stop - rows.start, sum(len(players) for _, players in box_score))
+            self.assertTrue((season.row[rows] // 2 == n).all())
+
+        team, players = self.box_scores[1][0]
+        self.assertEqual([season.players[code] for code in season.player[season.rows(team=team)]],
+                         [player for player, _ in players])
+        player = players[0][0]
+        self.assertEqual(season.column('ast', season.rows(player)).tolist(),
+                         [stats['ast'] for box_score in self.box_scores for _, lines in box_score
+                          for p, stats in lines if p == player])
+        self.assertEqual(len(season.rows(player, team=team)),
+                         sum(1 for box_score in self.box_scores for t, lines in box_score
+                             if t == team and player in dict(lines)))
+        self.assertEqual(len(season.rows(player, team='nobody')), 0)
+        self.assertEqual(len(season.rows('nobody')), 0)
+
+    def test_team_totals_and_results(self):
+        season = self.store.season(2017)
+        points = [stats['pts'] for box_score in self.totals for _, stats in box_score]
+        self.assertEqual(season.team_totals('pts').tolist(), points)
+        self.assertEqual(season.won().tolist(), [points[row] > points[row ^ 1] for row in range(len(points))])
+
+    def test_win_pct_when_leading(self):
+        season = self.store.season(2017)
+        won = season.won()
+        for player in season.players:
+            games = leads = wins = led_wins = 0
+            for n, box_score in enumerate(self.box_scores):
+                for side, (_, players) in enumerate(box_score):
+                    assists = dict((p, stats['ast']) for p, stats in players)
+                    if player not in assists:
+                        continue
+                    games += 1
+                    wins += won[2 * n + side]
+                    if assists[player] == max(assists.values()) and assists[player] > 0:
+                        leads += 1
+                        led_wins += won[2 * n + side]
+
+            result = self.store.win_pct_when_leading(player, 'ast').loc[2017]
+            self.assertEqual((result['games'], result['wins'], result['led'], result['led_wins']),
+                             (games, wins, leads, led_wins))
+
+        # a lead shared with a teammate is not counted when leading alone is asked for.
+        shared = season.leaders('stl')
+        alone = season.leaders('stl', shared=False)
+        self.assertTrue((alone <= shared).all())
+        self.assertTrue((np.bincount(season.row, alone) <= 1).all())
+
+        # nobody leads a stat the whole team had none of.
+        write_season(2016, [[('cle', [('a', {'pts': 10}), ('b', {'pts': 5})]), ('nyk', [('c', {'pts': 8, 'blk': 1})])]],
+                     self.directory)
+        season = PlayerStore(self.directory).season(2016)
+        self.assertEqual(season.leaders('blk').tolist(), [False, False, True])
+        self.assertEqual(season.leaders('pts').tolist(), [True, False, True])
+
+    def test_append(self):
+        # the games of a season not in the store would be numbered from 0.
+        self.assertRaises(ValueError, write_season, 2016, self.box_scores[:1], self.directory, append=True)
+        write_season(2017, self.box_scores[:1], self.directory, append=True)
+        season = PlayerStore(self.directory).season(2017)
+        self.assertEqual(season.games, 4)
+        first, last = season.game(0), season.game(3)
+        self.assertTrue((season.box[first] == season.box[last]).all())
+        self.assertTrue((season.player[first] == season.player[last]).all())
+        self.assertEqual(season.won().tolist()[6:], season.won().tolist()[:2])
+
+    def test_cli(self):
+        player = self.box_scores[0][0][1][0][0]
+        stdout, sys.stdout = sys.stdout, StringIO()
+        try:
+            main(['leads', player, 'ast', '--store', self.directory])
+            output = sys.stdout.getvalue()
+        finally:
+            sys.stdout = stdout
+        lines = output.splitlines()
+        self.assertEqual(lines[0].split(), ['season', 'games', 'win_pct', 'led', 'led_win_pct'])
+        games = self.store.win_pct_when_leading(player, 'ast').loc[2017, 'games']
+        self.assertEqual(lines[1].split()[:2], ['2017', str(games)])
+
+        stderr, sys.stderr = sys.stderr, StringIO()
+        try:
+            self.assertRaises(SystemExit, main, ['leads', player, 'dunks', '--store', self.directory])
+            self.assertRaises(SystemExit, main, ['leads', player, 'ast', '--seasons', '1999', '--store', self.directory])
+        finally:
+            sys.stderr = stderr
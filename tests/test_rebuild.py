@@ -0,0 +1,56 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+from pandas import read_csv
+
+from scraper.config import RAW_GAME_DATA, ROOT_DIR
+from scraper.rebuild import rebuild
+from scraper.store import SeasonStore
+
+YEARS = [2016, 2017]
+
+
+class TestRebuild(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.raw_game_data = os.path.join(self.directory, 'raw_game_data_{0}')
+        for year in YEARS:
+            shutil.copy(RAW_GAME_DATA.format(year), self.raw_game_data.format(year))
+
+        self.tables_dir = os.path.join(self.directory, 'tables')
+        os.makedirs(self.tables_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _rebuild(self, years=YEARS):
+        return rebuild(years, scrape=False, processes=2, build_dir=os.path.join(self.directory, 'build'),
+                       tables_dir=self.tables_dir, store_dir=os.path.join(self.directory, 'store'),
+                       raw_game_data=self.raw_game_data)
+
+    def test_rebuilds_only_what_changed(self):
+        runner = self._rebuild()
+        self.assertEqual(sorted(runner.ran), ['aggregates:2016', 'aggregates:2017', 'frames'])
+
+        expected = read_csv(os.path.join(ROOT_DIR, 'stat_breakdown_2016.csv'), index_col=0)
+        breakdown = read_csv(os.path.join(self.tables_dir, 'stat_breakdown_2016.csv'), index_col=0)
+        self.assertTrue(np.allclose(breakdown[['games', 'pct_of_games', 'pct_of_ties', 'win_pct']].values,
+                                    expected[['games', 'pct_of_games', 'pct_of_ties', 'win_pct']].values))
+
+        self.assertEqual(self._rebuild().ran, [])
+
+        frame = read_csv(self.raw_game_data.format(2017), index_col=0)
+        frame.head(100).to_csv(self.raw_game_data.format(2017))
+        self.assertEqual(sorted(self._rebuild().ran), ['aggregates:2017', 'frames'])
+
+    def test_rebuilding_a_season_keeps_the_others(self):
+        self._rebuild()
+        self._rebuild([2017])
+
+        self.assertEqual(SeasonStore(os.path.join(self.directory, 'store')).seasons, YEARS)
+        zscores = read_csv(os.path.join(self.tables_dir, 'zscores.csv'), index_col=0)
+        self.assertFalse(zscores.isnull().values.any())
@@ -0,0 +1,67 @@
+import os
+import pickle
+import unittest
+
+import numpy as np
+from pandas import read_csv
+
+from entropy import calc_entropy, gain
+from scraper.config import RAW_GAME_DATA
+from scraper.parsers import parse_team_totals
+from scraper.records import GameOutcome, OutcomeTable, Schema
+from scraper.teamscrape import IGNORED_CAT, game_outcomes, to_win_probability
+from scraper.teamscrape_refactored import TeamScraper
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures', 'boxscores')
+
+
+class TestRecords(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.frame = read_csv(RAW_GAME_DATA.format(2017), index_col=0)
+        cls.table = OutcomeTable.from_frame(cls.frame)
+
+    def test_round_trips_raw_game_data(self):
+        frame = self.table.to_frame()
+        self.assertEqual(list(frame.columns), list(self.frame.columns))
+        self.assertTrue((frame.values == self.frame.values).all())
+
+        records = list(self.table)
+        self.assertEqual(records[3].to_dict(), self.frame.drop('team', axis=1).iloc[3].to_dict())
+        self.assertTrue((OutcomeTable.from_records(records).codes == self.table.codes).all())
+
+    def test_game_outcomes(self):
+        with open(os.path.join(FIXTURES, '201610250CLE.html')) as f:
+            raw_team_stats = parse_team_totals(f.read(), IGNORED_CAT)
+        game = game_outcomes(raw_team_stats)
+
+        (t1, s1), (t2, s2) = raw_team_stats.items()
+        self.assertEqual(game[t1]['win'], 1 if s1['pts'] > s2['pts'] else 0)
+        self.assertEqual(game[t1]['tov'], 1 if s1['tov'] < s2['tov'] else 0)
+        for stat in game[t1]:
+            self.assertEqual(game[t1][stat] + game[t2][stat], 1)
+
+    def test_records_share_a_schema(self):
+        records = pickle.loads(pickle.dumps(list(self.table)[:10], pickle.HIGHEST_PROTOCOL))
+        self.assertTrue(all(record.schema is self.table.schema for record in records))
+        self.assertEqual(records, list(self.table)[:10])
+        self.assertIs(Schema.get(self.table.stats), self.table.schema)
+
+    def test_entropy_accepts_tables(self):
+        team = self.table.select(np.asarray(self.table.teams) == 'gsw')
+        dicts = [record.to_dict() for record in team]
+        self.assertEqual(calc_entropy(team, 'win'), calc_entropy(dicts, 'win'))
+        for stat in ('fg', 'ast', 'tov', 'fg_pct'):
+            self.assertEqual(gain(team, stat, 'win'), gain(dicts, stat, 'win'))
+
+    def test_importance_accepts_records(self):
+        records = [record for record in self.table if record.team == 'gsw']
+        importance = TeamScraper('gsw').stat_importance(records)
+        wins = [record for record in records if record['win'] == 1]
+        self.assertEqual(importance['diffs']['base_win_pct'], round(float(len(wins)) / len(records), 3))
+
+        probability = to_win_probability('gsw', records).set_index('stat')
+        fg_won = [record for record in records if record['fg']]
+        self.assertEqual(probability.loc['fg', 't_stat_w'], len(fg_won))
+        self.assertEqual(probability.loc['fg', 'w_wins'], len([record for record in fg_won if record['win']]))
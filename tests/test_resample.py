@@ -0,0 +1,46 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from scraper.resample import _bootstrap_weights, resample_stats, significance_report
+from scraper.store import LOST, WON, convert_csvs
+
+
+class TestResample(unittest.TestCase):
+
+    def test_intervals_and_p_values(self):
+        random = np.random.RandomState(1)
+        won = random.rand(200) < 0.5
+        decisive = np.where(won, WON, LOST)
+        noise = np.where(random.rand(200) < 0.5, WON, LOST)
+        frame = resample_stats(np.column_stack([decisive, noise]), won, ['decisive', 'noise'], 500, seed=0)
+
+        self.assertEqual(frame.loc['decisive', 'win_pct'], 1.0)
+        self.assertLess(frame.loc['decisive', 'p_win_pct'], 0.01)
+        self.assertLess(frame.loc['decisive', 'p_gain'], 0.01)
+        self.assertGreater(frame.loc['noise', 'p_gain'], 0.01)
+        for stat in ('decisive', 'noise'):
+            row = frame.loc[stat]
+            self.assertTrue(row['win_pct_low'] <= row['win_pct'] <= row['win_pct_high'])
+            self.assertTrue(row['gain_low'] <= row['gain'] + 1e-4 and row['gain'] <= row['gain_high'] + 1e-4)
+
+    def test_bootstrap_weights(self):
+        weights = _bootstrap_weights(np.random.RandomState(0), 100, 82)
+        self.assertEqual(weights.shape, (100, 82))
+        self.assertTrue((weights.sum(axis=1) == 82).all())
+
+    def test_report(self):
+        directory = tempfile.mkdtemp()
+        try:
+            store = convert_csvs([2017], os.path.join(directory, 'store'))
+            report = significance_report(store, teams=['gsw', 'nyk'], resamples=200, processes=2)
+            again = significance_report(store, teams=['gsw', 'nyk'], resamples=200, processes=1)
+        finally:
+            shutil.rmtree(directory)
+
+        self.assertEqual(sorted(set(report['team'])), ['gsw', 'league', 'nyk'])
+        self.assertTrue(np.allclose(report['p_gain'].values, again['p_gain'].values))
+        self.assertEqual(len(report), 3 * (len(store.stats) - 1))
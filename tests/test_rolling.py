@@ -0,0 +1,80 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from scraper.rolling import RollingCounts, RollingIndex, backfill, rolling_sums
+from scraper.store import LOST, TIED, WON, convert_csvs
+
+
+class TestRollingCounts(unittest.TestCase):
+
+    def test_slides(self):
+        counts = RollingCounts(3, 2)
+        games = [([WON, LOST], True), ([WON, WON], False), ([TIED, WON], True), ([LOST, WON], True)]
+        for outcomes, won in games:
+            counts.push(outcomes, won)
+        # the first game has left the window.
+        self.assertEqual(list(counts.won), [1, 3])
+        self.assertEqual(list(counts.won_wins), [0, 2])
+        self.assertEqual(counts.wins, 2)
+        self.assertEqual(len(counts), 3)
+        self.assertTrue(np.allclose(counts.win_pct(), [0.0, 2 / 3.0]))
+
+
+class TestRollingSums(unittest.TestCase):
+
+    def test_matches_loop(self):
+        random = np.random.RandomState(0)
+        values = random.randint(0, 2, size=(200, 3))
+        groups = random.randint(0, 4, size=200)
+        order = random.permutation(200)
+        sums, games = rolling_sums(values, groups, order, 5)
+        for i in range(200):
+            before = np.flatnonzero((groups == groups[i]) & (order <= order[i]))
+            window = before[np.argsort(order[before])][-5:]
+            self.assertEqual(games[i], len(window))
+            self.assertEqual(list(sums[i]), list(values[window].sum(axis=0)))
+
+
+class TestRolling(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.mkdtemp()
+        cls.store = convert_csvs([2016, 2017], os.path.join(cls.directory, 'store'))
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.directory)
+
+    def test_backfill_matches_windows(self):
+        series = backfill(self.store, 10)
+        self.assertEqual(len(series), sum(len(season) for season in self.store))
+        # windows restart with the season.
+        self.assertEqual(series.groupby(['season', 'team'])['games'].first().max(), 1)
+
+        index = RollingIndex.from_store(self.store, 2017, 10)
+        stats = index.stats
+        for team in self.store.teams[:5]:
+            last = series[(series['season'] == 2017) & (series['team'] == team)].iloc[-1]
+            self.assertEqual(last['games'], 10)
+            self.assertTrue(np.allclose(last[stats].values.astype(float), index.counts(team).win_pct(), equal_nan=True))
+            self.assertAlmostEqual(last['base_pct'], index.counts(team).base_pct())
+
+        league = backfill(self.store, 10, years=[2017], league=True).iloc[-1]
+        self.assertEqual(league['games'], 20)
+        self.assertTrue(np.allclose(league[stats].values.astype(float), index.league.win_pct(), equal_nan=True))
+
+    def test_add(self):
+        index = RollingIndex.from_store(self.store, 2017, 5)
+        team = self.store.teams[0]
+        before = index.counts(team).won.copy()
+        outcomes = np.full(len(index.stats), WON, dtype=np.int8)
+        for _ in range(5):
+            index.add(team, outcomes, True)
+        self.assertEqual(index.win_pct(team), {stat: 1.0 for stat in index.stats})
+        self.assertEqual(list(index.counts(team).won), [5] * len(index.stats))
+        self.assertFalse((before == 5).all())
@@ -0,0 +1,114 @@
+import glob
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import requests
+
+from scraper.aggregates import TeamCounts
+from scraper.margins import MarginStore, write_season
+from scraper.matchups import MatchupCounts
+from scraper.parsers import parse_team_totals
+from scraper.service import QueryService, ServiceServer
+from scraper.store import convert_csvs
+from scraper.teamscrape import IGNORED_CAT
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures', 'boxscores')
+
+
+class TestService(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.mkdtemp()
+        cls.store = convert_csvs([2016, 2017], os.path.join(cls.directory, 'store'))
+        box_scores = []
+        for path in sorted(glob.glob(os.path.join(FIXTURES, '*.html'))):
+            with open(path) as f:
+                box_scores.append(parse_team_totals(f.read(), IGNORED_CAT).items())
+        write_season(2017, box_scores, os.path.join(cls.directory, 'margins'))
+
+        cls.service = QueryService(cls.store, MarginStore(os.path.join(cls.directory, 'margins')))
+        cls.server = ServiceServer(cls.service).start()
+        cls.session = requests.Session()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+        shutil.rmtree(cls.directory)
+
+    def get(self, path):
+        response = self.session.get(self.server.url + path)
+        return response.status_code, response.json()
+
+    def test_stats(self):
+        team = self.store.teams[0]
+        status, body = self.get('/stats?team={0}&seasons=2017'.format(team))
+        self.assertEqual(status, 200)
+        expected = TeamCounts(self.store).table(team, [2017])
+        self.assertEqual([row['stat'] for row in body['stats']], list(expected.index))
+        for row in body['stats']:
+            self.assertEqual(row['won'], expected.loc[row['stat'], 'won'])
+            self.assertAlmostEqual(row['gain'], expected.loc[row['stat'], 'gain'])
+
+        status, body = self.get('/stats?seasons=2016-2017&stats=fg,ast')
+        self.assertEqual([row['stat'] for row in body['stats']], ['fg', 'ast'])
+        self.assertEqual(body['seasons'], [2016, 2017])
+
+    def test_importance(self):
+        team = self.store.teams[1]
+        status, body = self.get('/importance?team={0}'.format(team))
+        self.assertEqual(status, 200)
+        expected = TeamCounts(self.store).importance(team)
+        self.assertEqual(body['diffs'], json.loads(json.dumps(expected['diffs'])))
+
+    def test_win_probability(self):
+        status, body = self.get('/win_probability?stat=ast&thresholds=0,5&seasons=2017')
+        self.assertEqual(status, 200)
+        expected = self.service.margins.win_probability('ast', [0, 5], [2017])
+        self.assertEqual([row['games'] for row in body['thresholds']], list(expected['games']))
+
+        status, _ = self.get('/win_probability?stat=ast&seasons=2016')
+        self.assertEqual(status, 404)
+
+    def test_matchups(self):
+        status, body = self.get('/head_to_head?team=gsw&opponent=cle&stats=ast,fg')
+        self.assertEqual(status, 200)
+        expected = MatchupCounts(self.store).head_to_head('gsw', 'cle', stats=['ast', 'fg'])
+        self.assertEqual([row['won'] for row in body['stats']], list(expected['won']))
+
+        status, body = self.get('/by_strength?team=gsw&bins=0,.5,1&seasons=2017')
+        self.assertEqual(status, 200)
+        self.assertEqual(sum(row['games'] for row in body['bins']), len(self.store.season(2017).outcomes_for('gsw')))
+        self.assertEqual(self.get('/head_to_head?team=gsw')[0], 400)
+        self.assertEqual(self.get('/by_strength?bins=x')[0], 400)
+        self.assertEqual(self.get('/by_strength?bins=0,.6,.4,1')[0], 400)
+        self.assertEqual(self.get('/head_to_head?team=gsw&opponent=gsw')[0], 400)
+
+    def test_errors(self):
+        self.assertEqual(self.get('/stats?team=xyz')[0], 404)
+        self.assertEqual(self.get('/stats?seasons=last')[0], 400)
+        self.assertEqual(self.get('/stats?seasons=1990')[0], 404)
+        self.assertEqual(self.get('/win_probability')[0], 400)
+        self.assertEqual(self.get('/nothing')[0], 404)
+        self.assertEqual(self.get('/stats?seasons=2017-2016')[0], 400)
+
+    def test_unexpected_errors_and_nan(self):
+        def fail(params):
+            raise KeyError(params['x'])
+
+        self.service.win_probability = fail
+        self.service.head_to_head = lambda params: {'win_pct': float('nan'), 'gain': [float('inf'), 1.5]}
+        try:
+            self.assertEqual(self.get('/win_probability?x=1')[0], 500)
+            self.assertEqual(self.get('/head_to_head?x=1'), (200, {'win_pct': None, 'gain': [None, 1.5]}))
+        finally:
+            del self.service.win_probability, self.service.head_to_head
+
+    def test_cached(self):
+        status, body = self.service.query('teams', {})
+        self.assertEqual(status, 200)
+        self.assertIs(self.service.query('teams', {})[1], body)
+        self.assertEqual(json.loads(body)['seasons'], [2016, 2017])
@@ -0,0 +1,64 @@
+import gzip
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+from pandas import read_csv
+
+from scraper.aggregates import SeasonCounts, write_tables
+from scraper.config import ROOT_DIR, SEASONS
+from scraper.statslope import bundle
+from scraper.store import convert_csvs
+
+
+class TestStatslope(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.mkdtemp()
+        cls.seasons = SeasonCounts(convert_csvs(SEASONS, os.path.join(cls.directory, 'store'))).by_stat()
+        cls.bundle = bundle(cls.seasons)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.directory)
+
+    def test_matches_all_year_data(self):
+        expected = read_csv(os.path.join(ROOT_DIR, 'statslope', 'all_year_data.csv'), index_col=0)
+        self.assertEqual(self.bundle['years'], list(expected.index))
+        for stat, values in zip(self.bundle['stats'], self.bundle['values']):
+            self.assertTrue(np.allclose(values, expected[stat].values))
+
+    def test_sorted_by_last_season(self):
+        last = [values[-1] for values in self.bundle['values']]
+        self.assertEqual(last, sorted(last, reverse=True))
+        self.assertEqual([ranks[-1] for ranks in self.bundle['ranks']], range(1, len(last) + 1))
+
+    def test_ranks_and_slopes(self):
+        values = np.array(self.bundle['values'])
+        ranks = np.array(self.bundle['ranks'])
+        for year in range(len(self.bundle['years'])):
+            self.assertEqual(sorted(ranks[:, year]), range(1, len(values) + 1))
+            self.assertTrue((np.diff(values[np.argsort(ranks[:, year]), year]) <= 0).all())
+
+        years = np.array(self.bundle['years'], dtype=float)
+        expected = ((years - years.mean()) * (values - values.mean(axis=1)[:, None])).sum(axis=1) / \
+            ((years - years.mean()) ** 2).sum()
+        self.assertTrue(np.allclose(self.bundle['slopes'], expected, atol=1e-6))
+
+    def test_written_with_tables(self):
+        tables = os.path.join(self.directory, 'tables')
+        os.makedirs(tables)
+        write_tables(self.seasons, tables)
+
+        path = os.path.join(tables, 'statslope', 'data.json')
+        with open(path) as f:
+            written = json.load(f)
+        self.assertEqual(written, json.loads(json.dumps(self.bundle)))
+        with open(path) as f, gzip.open(path + '.gz') as gz:
+            self.assertEqual(gz.read(), f.read())
+        with open(path) as f, open(os.path.join(tables, 'statslope', 'data.js')) as script:
+            self.assertEqual(script.read(), 'var STATSLOPE_DATA = {0};\n'.format(f.read()))
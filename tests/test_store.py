@@ -0,0 +1,71 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+from pandas import read_csv
+
+from scraper.config import RAW_GAME_DATA
+from scraper.ingest import ingest_season, ingested_links
+from scraper.store import TIED, WON, SeasonStore, StoreWriter, convert_csvs, write_json
+
+
+class TestSeasonStore(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.store = convert_csvs([2016, 2017], self.directory + '/store')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_round_trips_raw_game_data(self):
+        for year in (2016, 2017):
+            frame = read_csv(RAW_GAME_DATA.format(year), index_col=0)
+            stored = self.store.season(year).to_frame()
+            self.assertEqual(list(stored.columns), list(frame.columns))
+            self.assertTrue((stored.values == frame.values).all())
+
+    def test_team_views(self):
+        frame = read_csv(RAW_GAME_DATA.format(2017), index_col=0)
+        season = self.store.season(2017)
+        gsw = frame[frame['team'] == 'gsw']
+
+        outcomes = season.outcomes_for('gsw')
+        self.assertEqual(outcomes.dtype, np.int8)
+        self.assertEqual(len(outcomes), len(gsw))
+        self.assertTrue(np.shares_memory(outcomes, season.outcomes))
+        self.assertEqual((season.column('win', 'gsw') == WON).sum(), gsw['win'].sum())
+        self.assertEqual((season.column('fg', 'gsw') == TIED).sum(), (gsw['fg'] == 0.5).sum())
+
+    def test_team_diffs(self):
+        self.assertEqual(self.store.team_diffs().loc['sac', 'win'], 1.0)
+
+    def test_converted_seasons_are_not_ingested_incrementally(self):
+        # a csv does not record which games it holds.
+        self.assertRaises(ValueError, ingested_links, self.store, 2017)
+        self.assertEqual(ingested_links(self.store, 2018), [])
+        # nothing is fetched to find that out.
+        self.assertRaises(ValueError, ingest_season, 2017, self.store.directory, fetcher=object())
+
+    def test_failed_conversions_leave_the_store(self):
+        directory = self.directory + '/store'
+        self.assertRaises(ValueError, convert_csvs, [], directory)
+        self.assertRaises(IOError, convert_csvs, [2016, 1999], directory)
+        self.assertEqual(SeasonStore(directory).seasons, [2016, 2017])
+        self.assertEqual(sorted(os.listdir(self.directory)), ['store'])
+
+        # seasons ingested incrementally are only replaced when asked to.
+        writer = StoreWriter(directory)
+        writer.write_links(2017, ['http://www.basketball-reference.com/boxscores/201610250CLE.html'])
+        self.assertRaises(ValueError, convert_csvs, [2016], directory)
+        self.assertEqual(convert_csvs([2016], directory, force=True).seasons, [2016])
+
+    def test_write_json(self):
+        path = self.directory + '/value.json'
+        write_json(path, {'b': 1, 'a': [2]}, sort_keys=True)
+        write_json(path, {'b': 2})
+        with open(path) as f:
+            self.assertEqual(f.read(), '{"b": 2}')
+        self.assertEqual(sorted(os.listdir(self.directory)), ['store', 'value.json'])
@@ -0,0 +1,75 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from pandas import read_csv
+from requests.exceptions import HTTPError
+
+from benchmarks.server import FixtureServer, Fixtures
+from scraper.fetch import Fetcher, get_fetcher, set_fetcher
+from scraper.ingest import get_season_links
+from scraper.stream import Checkpoint, stream_season
+
+
+class FlakyFixtures(Fixtures):
+    """
+    Fixtures which answer some paths with a 404 until they are fixed.
+    """
+    def __init__(self):
+        super(FlakyFixtures, self).__init__()
+        self.missing = set()
+
+    def page(self, path):
+        if path in self.missing:
+            return None
+        return super(FlakyFixtures, self).page(path)
+
+
+class TestStreamSeason(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.output = os.path.join(self.directory, 'raw_game_data_2017')
+        self.previous = get_fetcher()
+
+    def tearDown(self):
+        set_fetcher(self.previous)
+        shutil.rmtree(self.directory)
+
+    def test_resumes_from_checkpoint(self):
+        fixtures = FlakyFixtures()
+        with FixtureServer(fixtures=fixtures) as server:
+            # box scores are fetched with the shared fetcher.
+            fetcher = server.install(Fetcher(workers=1, rate=0, retries=0, cache=None))
+            set_fetcher(fetcher)
+            links = get_season_links(2017, fetcher)[:25]
+            fixtures.missing.add(links[15].split('.com', 1)[1])
+
+            with self.assertRaises(HTTPError):
+                stream_season(2017, links, self.output, batch_size=10, build_dir=self.directory)
+            self.assertFalse(os.path.exists(self.output))
+            self.assertEqual(len(read_csv(self.output + '.partial', index_col=0)), 20)
+
+            fixtures.missing.clear()
+            requests = server.requests
+            self.assertEqual(stream_season(2017, links, self.output, batch_size=10, build_dir=self.directory), 15)
+            self.assertEqual(server.requests - requests, 15)
+
+        frame = read_csv(self.output, index_col=0)
+        self.assertEqual(list(frame.index), range(50))
+        self.assertEqual(list(frame.columns), sorted(frame.columns))
+        self.assertTrue((frame['win'].values[0::2] + frame['win'].values[1::2] == 1).all())
+        self.assertFalse(os.path.exists(os.path.join(self.directory, '2017', 'stream.json')))
+
+    def test_ignores_checkpoint_without_partial_file(self):
+        with FixtureServer() as server:
+            fetcher = server.install(Fetcher(workers=1, rate=0, retries=0, cache=None))
+            links = get_season_links(2017, fetcher)[:5]
+            # a run which renamed its partial file to the output, and died before removing its checkpoint.
+            os.makedirs(os.path.join(self.directory, '2017'))
+            Checkpoint(os.path.join(self.directory, '2017', 'stream.json'), links, 5, 1000).save()
+            self.assertEqual(stream_season(2017, links, self.output, fetcher=fetcher, build_dir=self.directory), 5)
+
+        frame = read_csv(self.output, index_col=0)
+        self.assertEqual(list(frame.index), range(10))
@@ -0,0 +1,55 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from scraper.store import LOST, TIED, WON, convert_csvs
+from scraper.tree import _season_data, fit_seasons, fit_store, outcome_counts, split_gains
+
+
+class TestDecisionTree(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.mkdtemp()
+        cls.store = convert_csvs([2016, 2017], os.path.join(cls.directory, 'store'))
+        cls.outcomes, cls.won, cls.stats = _season_data(cls.store, [2016, 2017])
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.directory)
+
+    def test_split_gains(self):
+        counts = outcome_counts(self.outcomes, self.won)
+        column = self.stats.index('fg')
+        for index, outcome in enumerate((LOST, WON, TIED)):
+            branch = self.outcomes[:, column] == outcome
+            self.assertEqual(counts[column, index, 1], (branch & self.won).sum())
+            self.assertEqual(counts[column, index, 0], (branch & ~self.won).sum())
+
+        # a stat which decides every game gains all of the entropy of the result.
+        decided = np.column_stack([np.where(self.won, WON, LOST), self.outcomes[:, :1]])
+        gains = split_gains(outcome_counts(decided, self.won))
+        self.assertAlmostEqual(gains[0], 1.0, places=3)
+        self.assertLess(gains[1], gains[0])
+
+    def test_leaves_match_their_games(self):
+        tree = fit_store(self.store, max_depth=3, min_leaf=30)
+        leaves = tree.leaves()
+        self.assertEqual(sum(games for _, games, _ in leaves), len(self.outcomes))
+
+        for conditions, games, win_pct in leaves:
+            rows = np.ones(len(self.outcomes), dtype=bool)
+            for stat, outcome in conditions:
+                rows &= self.outcomes[:, self.stats.index(stat)] == outcome
+            self.assertEqual(rows.sum(), games)
+            self.assertGreaterEqual(games, 30)
+            self.assertAlmostEqual(self.won[rows].mean(), win_pct)
+            self.assertTrue(np.allclose(tree.predict_proba(self.outcomes[rows]), win_pct))
+
+    def test_fit_seasons_in_parallel(self):
+        trees = fit_seasons(self.store, processes=2, max_depth=2)
+        self.assertEqual(sorted(trees), [2016, 2017])
+        self.assertEqual(str(trees[2017]), str(fit_store(self.store, [2017], max_depth=2)))